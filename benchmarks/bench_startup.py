@@ -0,0 +1,89 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+"""
+Measure the start-up time of the controller with a large number of scheduled
+jobs. Two numbers are reported: the time it takes until the controller service
+is started, i.e., until the web API can be brought up, and the time it takes
+to rehydrate all the scheduled jobs in the background.
+
+Usage: PYTHONPATH=. python benchmarks/bench_startup.py [--jobs 100000]
+"""
+
+import argparse
+import tempfile
+import shutil
+import pickle
+import time
+import os
+
+from scrapy_do.controller import Controller, Project
+from scrapy_do.schedule import Schedule, Job, Status, Actor
+from scrapy_do.config import Config
+from twisted.internet import reactor
+
+
+#-------------------------------------------------------------------------------
+SPECS = ['every 10 minutes', 'every 2 to 3 hours', 'every monday at 12:30',
+         'every hour at 00:15', 'every day at 03:00']
+
+
+#-------------------------------------------------------------------------------
+def populate(project_store, num_jobs):
+    projects = {'bench': Project('bench', 'bench.zip', ['spider'])}
+    with open(os.path.join(project_store, 'metadata.pkl'), 'wb') as f:
+        pickle.dump(projects, f)
+
+    schedule = Schedule(os.path.join(project_store, 'schedule.db'))
+    jobs = [Job(status=Status.SCHEDULED, actor=Actor.USER,
+                schedule=SPECS[i % len(SPECS)], project='bench',
+                spider='spider')
+            for i in range(num_jobs)]
+    schedule.add_jobs(jobs)
+    schedule.db.close()
+
+
+#-------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Controller start-up time')
+    parser.add_argument('--jobs', type=int, default=100000,
+                        help='number of scheduled jobs')
+    args = parser.parse_args()
+
+    project_store = tempfile.mkdtemp()
+    populate(project_store, args.jobs)
+
+    config = Config()
+    config.conf.set('scrapy-do', 'project-store', project_store)
+
+    results = {}
+
+    def run():
+        t0 = time.time()
+        controller = Controller(config)
+        d = controller.start_rehydration()
+        results['ready'] = time.time() - t0
+
+        def done(_):
+            results['rehydrated'] = time.time() - t0
+            results['scheduled'] = len(controller.scheduled_jobs)
+            reactor.stop()
+        d.addCallback(done)
+
+    reactor.callWhenRunning(run)
+    reactor.run()
+    shutil.rmtree(project_store)
+
+    print('Jobs:             {}'.format(args.jobs))
+    print('Service ready:    {:.3f}s'.format(results['ready']))
+    print('Fully rehydrated: {:.3f}s'.format(results['rehydrated']))
+    print('Jobs rehydrated:  {}'.format(results['scheduled']))
+
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+"""
+Measure the cost of pushing a stream of job updates to many connected web UI
+clients. The updates are sent in two ways: the way every connection used to
+handle them, i.e., serializing and framing each message for every client,
+and with the broadcast of the WebSocket factory that serializes and frames
+each message once.
+
+Usage: PYTHONPATH=. python benchmarks/bench_ws_broadcast.py [--clients 100]
+"""
+
+import argparse
+import time
+
+from autobahn.websocket.protocol import WebSocketProtocol
+from scrapy_do.schedule import Job, Status, Actor
+from scrapy_do.websocket import WSFactory, WSProtocol
+from twisted.internet.testing import StringTransport
+from unittest.mock import Mock
+
+
+#-------------------------------------------------------------------------------
+def build_factory(num_clients):
+    controller = Mock()
+    controller.counter_run = 0
+    controller.counter_success = 0
+    controller.counter_failure = 0
+    controller.counter_cancel = 0
+    controller.scheduled_jobs = []
+
+    factory = WSFactory(controller=controller)
+    factory.protocol = WSProtocol
+    transports = []
+    for _ in range(num_clients):
+        protocol = factory.buildProtocol(None)
+        transport = StringTransport()
+        protocol.makeConnection(transport)
+        protocol.state = WebSocketProtocol.STATE_OPEN
+        protocol.websocket_version = 13
+        factory.register(protocol)
+        transports.append(transport)
+    return factory, transports
+
+
+#-------------------------------------------------------------------------------
+def run(factory, transports, batches, per_connection):
+    t0 = time.time()
+    for jobs in batches:
+        if per_connection:
+            for protocol in factory.connections:
+                protocol.send_job_changes(jobs, [])
+                protocol.send_jobs_status()
+        else:
+            for job in jobs:
+                factory.job_changes[job.identifier] = job
+            factory.flush_job_changes()
+    elapsed = time.time() - t0
+
+    sent = sum(len(transport.value()) for transport in transports)
+    for transport in transports:
+        transport.clear()
+    return elapsed, sent
+
+
+#-------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='WebSocket broadcast cost')
+    parser.add_argument('--clients', type=int, default=100,
+                        help='number of connected clients')
+    parser.add_argument('--updates', type=int, default=2000,
+                        help='number of job updates')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='number of job updates per frame')
+    args = parser.parse_args()
+
+    jobs = [Job(status=Status.RUNNING, actor=Actor.SCHEDULER,
+                schedule='every 10 minutes', project='bench',
+                spider='spider', logs={'err': 12345})
+            for _ in range(args.updates)]
+    batches = [jobs[i:i + args.batch]
+               for i in range(0, len(jobs), args.batch)]
+
+    factory, transports = build_factory(args.clients)
+    old_time, old_sent = run(factory, transports, batches, True)
+    new_time, new_sent = run(factory, transports, batches, False)
+
+    print('Clients:          {}'.format(args.clients))
+    print('Job updates:      {} in {} frames'.format(
+        args.updates, len(batches)))
+    print('Per connection:   {:.3f}s, {} bytes'.format(old_time, old_sent))
+    print('Broadcast:        {:.3f}s, {} bytes'.format(new_time, new_sent))
+    print('Speed-up:         {:.1f}x'.format(old_time / new_time))
+
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+"""
+Measure the bytes on the wire of the initial sync of a web UI client, i.e.,
+the list of all the completed jobs, in all the encodings that the clients may
+negotiate: JSON and MessagePack, each with and without the permessage-deflate
+compression.
+
+Usage: PYTHONPATH=. python benchmarks/bench_ws_encoding.py [--jobs 5000]
+"""
+
+import argparse
+import time
+
+from autobahn.websocket.compress import PerMessageDeflate
+from autobahn.websocket.compress import PerMessageDeflateOffer
+from autobahn.websocket.protocol import WebSocketProtocol
+from scrapy_do.schedule import Job, Status, Actor
+from scrapy_do.websocket import WSFactory, WSProtocol, accept_deflate
+from twisted.internet.testing import StringTransport
+from unittest.mock import Mock
+
+
+#-------------------------------------------------------------------------------
+def build_protocol(encoding, compressed):
+    factory = WSFactory(controller=Mock())
+    factory.protocol = WSProtocol
+    protocol = factory.buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    protocol.state = WebSocketProtocol.STATE_OPEN
+    protocol.websocket_version = 13
+    protocol.encoding = encoding
+    if compressed:
+        accept = accept_deflate([PerMessageDeflateOffer()])
+        protocol._perMessageCompress = \
+            PerMessageDeflate.create_from_offer_accept(True, accept)
+    return protocol, transport
+
+
+#-------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='WebSocket encoding size')
+    parser.add_argument('--jobs', type=int, default=5000,
+                        help='number of completed jobs')
+    args = parser.parse_args()
+
+    statuses = [Status.SUCCESSFUL, Status.FAILED, Status.CANCELED]
+    jobs = []
+    for i in range(args.jobs):
+        job = Job(status=statuses[i % 3], actor=Actor.SCHEDULER,
+                  schedule='every {} minutes'.format(i % 60 + 1),
+                  project='project{}'.format(i % 5),
+                  spider='spider{}'.format(i % 20),
+                  description='Crawl number {}'.format(i),
+                  logs={'out': 1234 + i, 'err': 56789 + i},
+                  metrics={'item_scraped_count': i, 'response_count': 2 * i})
+        job.duration = i % 3600
+        jobs.append(job)
+
+    print('Jobs:               {}'.format(args.jobs))
+    baseline = None
+    for encoding in ['json', 'msgpack']:
+        for compressed in [False, True]:
+            protocol, transport = build_protocol(encoding, compressed)
+            t0 = time.time()
+            protocol.send_json({
+                'type': 'JOB_LIST',
+                'status': 'COMPLETED',
+                'jobs': [protocol.process_job(job) for job in jobs]
+            })
+            elapsed = time.time() - t0
+            sent = len(transport.value())
+            if baseline is None:
+                baseline = sent
+            name = encoding + (' + deflate' if compressed else '')
+            print('{:19} {:9} bytes, {:5.1f}% of JSON, {:.3f}s'.format(
+                name + ':', sent, 100. * sent / baseline, elapsed))
+
+
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,15 @@ class ScrapyDoServiceMaker():
         if not interfaces:
             raise ValueError('No valid web interfaces were configured')
 
+        if config.get_float('web', 'ws-batch-window', 0.1) < 0:
+            raise ValueError('The WebSocket batch window cannot be negative')
+
+        if config.get_int('web', 'ws-event-buffer', 1000) <= 0:
+            raise ValueError('The WebSocket event buffer needs to be positive')
+
+        if config.get_int('web', 'ws-queue-limit', 1000) <= 0:
+            raise ValueError('The WebSocket queue limit needs to be positive')
+
         if https:
             key_file = config.get_string('web', 'key')
             cert_file = config.get_string('web', 'cert')
@@ -109,7 +109,8 @@ def list_jobs_arg_setup(subparsers):
     parser.set_defaults(command='list-jobs')
     parser.add_argument('--status', type=str, default='ACTIVE',
                         choices=['ACTIVE', 'COMPLETED', 'SCHEDULED', 'PENDING',
-                                 'RUNNING', 'CANCELED', 'SUCCESSFUL', 'FAILED'],
+                                 'RUNNING', 'CANCELED', 'SUCCESSFUL', 'FAILED',
+                                 'WAITING'],
                         help='job status of the jobs to list')
     parser.add_argument('--job-id', type=str, default=None,
                         help='ID of the job to list')
@@ -159,6 +160,20 @@ def get_log_arg_setup(subparsers):
                         help='job ID')
     parser.add_argument('--log-type', type=str, default='err',
                         choices=['out', 'err'], help='log type')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--tail', type=int, default=None,
+                       help='get only the last N lines')
+    group.add_argument('--since', type=int, default=None,
+                       help='get the log starting at the given byte offset')
+
+
+def get_log_arg_process(args):
+    payload = {}
+    if args.tail is not None:
+        payload['tail'] = args.tail
+    if args.since is not None:
+        payload['since'] = args.since
+    return payload
 
 
 def get_log_url_setup(args):
@@ -169,10 +184,64 @@ def get_log_url_setup(args):
 
 
 get_log_cmd = Command(
-    get_log_arg_setup, lambda x: {}, get_log_url_setup, lambda x: x,
+    get_log_arg_setup, get_log_arg_process, get_log_url_setup, lambda x: x,
     'GET')
 
 
+#-------------------------------------------------------------------------------
+# Search logs
+#-------------------------------------------------------------------------------
+def search_logs_arg_setup(subparsers):
+    parser = subparsers.add_parser('search-logs', help='Search the job logs')
+    parser.set_defaults(command='search-logs')
+    parser.add_argument('--pattern', type=str, default=None,
+                        help='regular expression to look for')
+    parser.add_argument('--level', type=str, default=None,
+                        choices=['WARNING', 'ERROR', 'CRITICAL'],
+                        help='minimum severity of the lines')
+    parser.add_argument('--project', type=str, default=None,
+                        help='project name')
+    parser.add_argument('--spider', type=str, default=None,
+                        help='spider name')
+    parser.add_argument('--since', type=str, default=None,
+                        help='search only the jobs updated after this time')
+    parser.add_argument('--until', type=str, default=None,
+                        help='search only the jobs updated before this time')
+    parser.add_argument('--log-type', type=str, default='both',
+                        choices=['out', 'err', 'both'], help='log type')
+    parser.add_argument('--limit', type=int, default=1000,
+                        help='maximum number of matches')
+
+
+def search_logs_arg_process(args):
+    if args.pattern is None and args.level is None:
+        print('[!] You need to specify a pattern or a level.')
+        sys.exit(1)
+
+    payload = {'log-type': args.log_type, 'limit': args.limit}
+    for arg in ['pattern', 'level', 'project', 'spider', 'since', 'until']:
+        if getattr(args, arg) is not None:
+            payload[arg] = getattr(args, arg)
+    return payload
+
+
+def search_logs_rsp_parse(rsp):
+    data = []
+    for line in rsp.splitlines():
+        if not line.strip():
+            continue
+        match = json.loads(line)
+        data.append([match['identifier'], match['log-type'], match['line'],
+                     match['text']])
+    headers = ['identifier', 'log', 'line', 'text']
+    return {'headers': headers, 'data': data}
+
+
+search_logs_cmd = Command(
+    search_logs_arg_setup, search_logs_arg_process,
+    url_append('/search-logs'), search_logs_rsp_parse, 'GET')
+
+
 #-------------------------------------------------------------------------------
 # Push project
 #-------------------------------------------------------------------------------
@@ -228,6 +297,11 @@ def schedule_job_arg_setup(subparsers):
                         help='description of the job')
     parser.add_argument('--payload', type=str, default='{}',
                         help='payload')
+    parser.add_argument('--depends-on', type=str, nargs='+', default=[],
+                        help='IDs of the jobs that need to finish successfully '
+                             'before this one can run')
+    parser.add_argument('--retry', type=str, default=None,
+                        help='retry policy overriding the server defaults')
 
 
 def schedule_job_arg_process(args):
@@ -246,13 +320,24 @@ def schedule_job_arg_process(args):
         print('[!] Cannot parse the JSON payload: ' + str(e))
         sys.exit(1)
 
-    return {
+    params = {
         'project': args.project,
         'spider': args.spider,
         'when': args.when,
         'description': args.description,
         'payload': payload
     }
+    if args.depends_on:
+        params['dependencies'] = ','.join(args.depends_on)
+
+    if args.retry is not None:
+        try:
+            obj = json.loads(args.retry)
+            params['retry'] = json.dumps(obj)
+        except ValueError as e:
+            print('[!] Cannot parse the JSON retry policy: ' + str(e))
+            sys.exit(1)
+    return params
 
 
 def schedule_job_rsp_parse(rsp):
@@ -266,6 +351,79 @@ schedule_job_cmd = Command(
     url_append('/schedule-job.json'), schedule_job_rsp_parse, 'POST')
 
 
+#-------------------------------------------------------------------------------
+# Schedule jobs
+#-------------------------------------------------------------------------------
+def schedule_jobs_arg_setup(subparsers):
+    parser = subparsers.add_parser('schedule-jobs',
+                                   help='Schedule multiple jobs at once')
+    parser.set_defaults(command='schedule-jobs')
+    parser.add_argument('--from', type=str, default=None, dest='from_file',
+                        help='a JSON lines file describing the jobs, '
+                             'use - for standard input')
+    parser.add_argument('--payload', type=str, default='{}',
+                        help='payload of the jobs that do not define their '
+                             'own')
+
+
+def schedule_jobs_arg_process(args):
+    if args.from_file is None:
+        print('[!] You need to specify the job file.')
+        sys.exit(1)
+
+    payload = '{}'
+    try:
+        obj = json.loads(args.payload)
+        payload = json.dumps(obj, ensure_ascii=False)
+    except ValueError as e:
+        print('[!] Cannot parse the JSON payload: ' + str(e))
+        sys.exit(1)
+
+    try:
+        if args.from_file == '-':
+            lines = sys.stdin.readlines()
+        else:
+            with open(args.from_file, 'r') as f:
+                lines = f.readlines()
+    except Exception as e:
+        print('[!] Unable to read the job file:', exc_repr(e))
+        sys.exit(1)
+
+    jobs = []
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError('Not a JSON object')
+        except ValueError as e:
+            print('[!] Cannot parse line {}: {}'.format(i + 1, str(e)))
+            sys.exit(1)
+        jobs.append(job)
+
+    if not jobs:
+        print('[!] The job file contains no jobs.')
+        sys.exit(1)
+
+    return {
+        'jobs': json.dumps(jobs, ensure_ascii=False),
+        'payload': payload
+    }
+
+
+def schedule_jobs_rsp_parse(rsp):
+    data = [[identifier] for identifier in rsp['identifiers']]
+    headers = ['identifier']
+    return {'headers': headers, 'data': data}
+
+
+schedule_jobs_cmd = Command(
+    schedule_jobs_arg_setup, schedule_jobs_arg_process,
+    url_append('/schedule-jobs.json'), schedule_jobs_rsp_parse, 'POST')
+
+
 #-------------------------------------------------------------------------------
 # Cancel job
 #-------------------------------------------------------------------------------
@@ -319,6 +477,67 @@ remove_project_cmd = Command(
     url_append('/remove-project.json'), remove_project_rsp_parse, 'POST')
 
 
+#-------------------------------------------------------------------------------
+# Watch
+#-------------------------------------------------------------------------------
+def watch_arg_setup(subparsers):
+    parser = subparsers.add_parser('watch', help='Follow the daemon events')
+    parser.set_defaults(command='watch')
+    parser.add_argument('--types', type=str, default=None,
+                        help='comma-separated list of the event types to '
+                             'follow, e.g., JOB_BATCH_UPDATE,JOBS_STATUS')
+    parser.add_argument('--raw', action='store_true',
+                        help='print the events as JSON lines')
+
+
+def watch_arg_process(args):
+    payload = {}
+    if args.types is not None:
+        payload['types'] = args.types
+    return payload
+
+
+def watch_rsp_parse(rsp):
+    event_type, data = rsp
+    if event_type == 'JOB_BATCH_UPDATE':
+        lines = []
+        for job in data['jobs']:
+            lines.append('[job] {} {} {} {}'.format(
+                job['identifier'], job['project'], job['spider'],
+                job['status']))
+        for identifier in data['removed']:
+            lines.append('[job] {} REMOVED'.format(identifier))
+        return '\n'.join(lines) if lines else None
+
+    if event_type == 'JOBS_STATUS':
+        return '[jobs] {} scheduled, {} run, {} successful, {} failed, ' \
+            '{} canceled'.format(
+                data['jobsScheduled'], data['jobsRun'],
+                data['jobsSuccessful'], data['jobsFailed'],
+                data['jobsCanceled'])
+
+    if event_type == 'DAEMON_STATUS':
+        return '[daemon] memory {:.1f} MB, cpu {:.1f}%'.format(
+            data['memoryUsage'], data['cpuUsage'])
+
+    if event_type == 'PROJECTS_STATUS':
+        return '[projects] {} projects, {} spiders'.format(
+            data['projects'], data['spiders'])
+
+    if event_type == 'PROJECT_PUSH':
+        return '[project] {} pushed'.format(data['name'])
+
+    if event_type == 'PROJECT_REMOVE':
+        return '[project] {} removed'.format(data['name'])
+
+    return None
+
+
+watch_cmd = Command(
+    watch_arg_setup, watch_arg_process, url_append('/events'),
+    watch_rsp_parse, 'STREAM')
+
+
 #-------------------------------------------------------------------------------
 # List of commands
 #-------------------------------------------------------------------------------
@@ -328,8 +547,11 @@ commands = {
     'list-spiders': list_spiders_cmd,
     'list-jobs': list_jobs_cmd,
     'get-log': get_log_cmd,
+    'search-logs': search_logs_cmd,
     'push-project': push_project_cmd,
     'schedule-job': schedule_job_cmd,
+    'schedule-jobs': schedule_jobs_cmd,
     'cancel-job': cancel_job_cmd,
-    'remove-project': remove_project_cmd
+    'remove-project': remove_project_cmd,
+    'watch': watch_cmd
 }
@@ -7,6 +7,8 @@
 
 import requests
 import urllib3
+import json
+import time
 
 from scrapy_do.client import ClientException
 from requests.auth import HTTPDigestAuth
@@ -54,3 +56,92 @@ def request(method, url, payload={}, auth=None, ssl_verify=True):
         else:
             raise ClientException(data)
     return data
+
+
+#-------------------------------------------------------------------------------
+def parse_events(lines):
+    """
+    Parse a stream of Server-Sent Events.
+
+    :param lines: an iterable of the decoded lines of the stream
+    :return:      a generator of tuples containing the identifier, the name,
+                  and the data of the events; the identifier is `None` if the
+                  event doesn't carry one
+    """
+    event_id = None
+    event_type = 'message'
+    data = []
+    for line in lines:
+        if not line:
+            if data:
+                yield event_id, event_type, '\n'.join(data)
+            event_id = None
+            event_type = 'message'
+            data = []
+            continue
+
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'id':
+            event_id = value
+        elif field == 'event':
+            event_type = value
+        elif field == 'data':
+            data.append(value)
+
+
+#-------------------------------------------------------------------------------
+def stream(url, payload={}, auth=None, ssl_verify=True, retry=3,
+           max_retries=None):
+    """
+    Follow a stream of Server-Sent Events, reconnecting with the identifier
+    of the last event seen whenever the connection drops.
+
+    :param url:                               url of the stream
+    :param payload:                           parameters of the request
+    :param auth:                              tuple containing the authorization
+                                              information
+    :param ssl_verify:                        SSL verification flag
+    :param retry:                             seconds to wait before
+                                              reconnecting
+    :param max_retries:                       maximum number of consecutive
+                                              failed connection attempts,
+                                              `None` for no limit
+    :raises scrapy_do.client.ClientException: an error
+    :return:                                  a generator of tuples containing
+                                              the name and the parsed JSON
+                                              data of the events
+    """
+    if not ssl_verify:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    if auth is not None:
+        auth = HTTPDigestAuth(*auth)
+
+    last_id = None
+    failures = 0
+    while True:
+        headers = {'Accept': 'text/event-stream'}
+        if last_id is not None:
+            headers['Last-Event-ID'] = last_id
+
+        try:
+            r = requests.get(url, params=payload, auth=auth,
+                             verify=ssl_verify, headers=headers, stream=True)
+            if r.status_code != 200:
+                raise ClientException('{} {}'.format(r.status_code, r.reason))
+            failures = 0
+            lines = r.iter_lines(decode_unicode=True)
+            for event_id, event_type, data in parse_events(lines):
+                if event_id is not None:
+                    last_id = event_id
+                yield event_type, json.loads(data)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError) as e:
+            failures += 1
+            if max_retries is not None and failures > max_retries:
+                raise ClientException(str(e))
+        time.sleep(retry)
@@ -12,7 +12,6 @@ of them.
 
 import configparser
 import tempfile
-import psutil
 import pickle
 import shutil
 import time
@@ -21,8 +20,12 @@ import os
 
 from twisted.application.service import Service
 from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.threads import deferToThread
 from twisted.internet.utils import getProcessValue, getProcessOutputAndValue
-from twisted.internet.task import LoopingCall
+from twisted.internet.task import LoopingCall, TaskDone, TaskFinished
+from twisted.internet.task import TaskStopped
+from twisted.internet.task import cooperate
+from twisted.internet import reactor
 from distutils.spawn import find_executable
 from twisted.logger import Logger
 from collections import namedtuple
@@ -30,25 +33,57 @@ from .schedule import Schedule, Job, Actor, Status
 from schedule import Scheduler
 from datetime import datetime
 from .utils import schedule_job, run_process, twisted_sleep, exc_repr
-from enum import Enum
+from .utils import parse_rate, parse_size, parse_duration, get_object
+from .logs import LogWatcher, LogRetention, compress_log, find_log
+from .logs import COMPRESSION_SUFFIXES, build_log_index, get_metrics
+from .logs import load_log_index, get_log_size
+from .logs import zstandard
+from .metrics import MetricsSampler
+from .events import Event, EventBus
 from glob import glob
 
 
 #-------------------------------------------------------------------------------
 Project = namedtuple('Project', ['name', 'archive', 'spiders'])
-RunningJob = namedtuple('RunningJob', ['process', 'finished_d', 'time_started'])
+RunningJob = namedtuple('RunningJob', ['process', 'finished_d', 'time_started',
+                                       'log_sizes'])
 
 
 #-------------------------------------------------------------------------------
-class Event(Enum):
+RETRY_POLICY_KEYS = {
+    'attempts': int,
+    'backoff-base': (int, float),
+    'backoff-cap': (int, float),
+    'exit-codes': list
+}
+
+
+#-------------------------------------------------------------------------------
+def _validate_retry_policy(policy):
     """
-    Controller even type.
+    Check if the retry policy is a dictionary containing only the known keys
+    with values of appropriate types.
+
+    :raises ValueError: If the policy is not valid
     """
-    DAEMON_STATUS_CHANGE = 1,
-    PROJECT_PUSH = 2,
-    PROJECT_REMOVE = 3,
-    JOB_UPDATE = 4,
-    JOB_REMOVE = 5
+    if not isinstance(policy, dict):
+        raise ValueError('Retry policy needs to be a JSON object')
+
+    for key, value in policy.items():
+        if key not in RETRY_POLICY_KEYS:
+            raise ValueError('Unknown retry policy key: "{}"'.format(key))
+
+        valid = isinstance(value, RETRY_POLICY_KEYS[key])
+        valid = valid and not isinstance(value, bool)
+        if valid and not isinstance(value, list):
+            valid = value >= 0
+        if not valid:
+            msg = 'Invalid value of the retry policy key "{}"'
+            raise ValueError(msg.format(key))
+
+    for code in policy.get('exit-codes', []):
+        if not isinstance(code, int) or isinstance(code, bool):
+            raise ValueError('Retry exit codes need to be integers')
 
 
 #-------------------------------------------------------------------------------
@@ -62,6 +97,38 @@ class Controller(Service):
       * `job-slots` - number of jobs to run in parallel
       * `completed-cap` - number of completed jobs to keep while purging the old
         jobs
+      * `retry-attempts` - number of times a failed job is retried
+      * `retry-backoff-base` - delay in seconds before the first retry; it
+        doubles with every subsequent attempt
+      * `retry-backoff-cap` - maximum delay in seconds before a retry
+      * `retry-exit-codes` - a comma-separated list of the exit codes that
+        qualify for a retry; any non-zero exit code does if empty
+      * `metrics-interval` - time in seconds between the samples of the
+        resource usage of the daemon
+      * `metrics-history` - number of the most recent resource usage samples
+        kept
+
+    The defaults may be overridden for a project or a spider in the
+    `retry-policies` section, where the keys are either project names or
+    `project/spider` pairs and the values are JSON objects containing
+    the `attempts`, `backoff-base`, `backoff-cap`, and `exit-codes` keys.
+
+    The job starts may be rate-limited in the `rate-limits` section. The keys
+    are project names, `project/spider` pairs, or `tag:name` for spider tags,
+    and the values are rate specs handled by :meth:`parse_rate
+    <scrapy_do.utils.parse_rate>`. The tags are assigned to spiders in the
+    `spider-tags` section, where the keys are project names or
+    `project/spider` pairs, and the values are comma-separated lists of tags.
+
+    The events are passed to the listeners by an :class:`EventBus
+    <scrapy_do.events.EventBus>`. Additional listeners, like webhooks or
+    metrics exporters, may be registered in the `event-listeners` section,
+    where the keys are arbitrary names and the values are the fully qualified
+    names of the classes of the listeners. The classes are instantiated with
+    the controller, and the objects are called with the event type and the
+    event data. They may restrict the events they get with an `event_types`
+    attribute holding a list of :class:`Event <scrapy_do.events.Event>`
+    values.
 
     :param config: A :class:`Config <scrapy_do.config.Config>`.
                    contains the following options in the `scrapy-do` section:
@@ -69,6 +136,8 @@ class Controller(Service):
 
     log = Logger()
 
+    REHYDRATION_CHUNK = 1000
+
     #---------------------------------------------------------------------------
     def __init__(self, config):
         #-----------------------------------------------------------------------
@@ -81,25 +150,48 @@ class Controller(Service):
         self.project_store = ps if ps.startswith('/') else ps_abs
         self.job_slots = config.get_int('scrapy-do', 'job-slots')
         self.completed_cap = config.get_int('scrapy-do', 'completed-cap')
+        self.retry_defaults = self._get_retry_defaults(config)
+        self.retry_policies = self._get_retry_policies(config)
+        self.rate_limits = self._get_rate_limits(config)
+        self.spider_tags = self._get_spider_tags(config)
+        self.log_compression = self._get_compression(config,
+                                                     'log-compression')
+        self.feeds = config.get_bool('scrapy-do', 'feeds', False)
+        self.feed_compression = self._get_compression(config,
+                                                      'feed-compression')
+        self.log_size_caps = self._get_log_size_caps(config)
+        log_budget, log_max_age = self._get_log_retention(config)
         self.metadata_path = os.path.join(self.project_store, 'metadata.pkl')
         self.schedule_path = os.path.join(self.project_store, 'schedule.db')
         self.log_dir = os.path.join(self.project_store, 'log-dir')
         self.spider_data_dir = os.path.join(self.project_store, 'spider-data')
+        self.feed_dir = os.path.join(self.spider_data_dir, 'feeds')
         self.running_jobs = {}
         self.scheduled_jobs = {}
+        self.retry_timers = {}
+        self.terminated_jobs = set()
         self.counter_run = 0
         self.counter_success = 0
         self.counter_failure = 0
         self.counter_cancel = 0
+        self.counter_retry = 0
         self.start_time = datetime.now()
-        self.listeners = set()
+        self.event_bus = EventBus()
+        self.log_watcher = LogWatcher()
+        self.log_retention = LogRetention(self.log_dir, log_budget,
+                                          log_max_age, self.feed_dir)
+        self.finalizing_jobs = set()
+        self.metrics = MetricsSampler(
+            config.get_float('scrapy-do', 'metrics-interval', 5.),
+            config.get_int('scrapy-do', 'metrics-history', 120))
         self.mem_usage = None
         self.mem_usage_ts = None
 
         #-----------------------------------------------------------------------
         # Create all the directories
         #-----------------------------------------------------------------------
-        dirs = [self.project_store, self.log_dir, self.spider_data_dir]
+        dirs = [self.project_store, self.log_dir, self.spider_data_dir,
+                self.feed_dir]
         for d in dirs:
             try:
                 os.makedirs(d)
@@ -119,27 +211,9 @@ class Controller(Service):
         #-----------------------------------------------------------------------
         self.schedule = Schedule(self.schedule_path)
         self.scheduler = Scheduler()
-
-        for job in self.schedule.get_jobs(Status.SCHEDULED):
-            self.log.info('Re-scheduling: {}'.format(str(job)))
-            sch_job = schedule_job(self.scheduler, job.schedule)
-            sch_job.do(lambda job: self.schedule_job(job.project, job.spider,
-                                                     'now', Actor.SCHEDULER,
-                                                     job.description,
-                                                     job.payload),
-                       job)
-            self.scheduled_jobs[job.identifier] = sch_job
-
-        #-----------------------------------------------------------------------
-        # If we have any jobs marked as RUNNING in the schedule at this point,
-        # it means that the daemon was killed while the jobs were running. We
-        # mark these jobs as pending, so that they can be restarted as soon
-        # as possible
-        #-----------------------------------------------------------------------
-        for job in self.schedule.get_jobs(Status.RUNNING):
-            self.log.info('Restarting interrupted: {}'.format(str(job)))
-            job.status = Status.PENDING
-            self._update_job(job)
+        self.rehydration_task = None
+        self.rehydration_total = 0
+        self.rehydration_done = 0
 
         #-----------------------------------------------------------------------
         # Set up the service
@@ -148,18 +222,31 @@ class Controller(Service):
         self.scheduler_loop = LoopingCall(self.run_scheduler)
         self.crawlers_loop = LoopingCall(self.run_crawlers)
         self.purger_loop = LoopingCall(self.purge_completed_jobs)
+        self.retention_loop = LoopingCall(self.enforce_log_retention)
         self.event_loop = LoopingCall(self.dispatch_periodic_events)
 
+        #-----------------------------------------------------------------------
+        # Register the event listener plugins
+        #-----------------------------------------------------------------------
+        for _, listener_class_name in config.get_options('event-listeners'):
+            listener = get_object(listener_class_name)(self)
+            self.add_event_listener(listener,
+                                    getattr(listener, 'event_types', None))
+
     #---------------------------------------------------------------------------
     def startService(self):
         """
         Start the twisted related functionality.
         """
         self.log.info('Starting controller')
+        d = self.start_rehydration()
+        d.addErrback(lambda f: f.trap(TaskStopped))
         self.scheduler_loop.start(1.)
         self.crawlers_loop.start(1.)
         self.purger_loop.start(10.)
+        self.retention_loop.start(60.)
         self.event_loop.start(1.)
+        self.metrics.start()
 
     #---------------------------------------------------------------------------
     def stopService(self):
@@ -167,12 +254,318 @@ class Controller(Service):
         Stop the twisted related functionality.
         """
         self.log.info('Stopping controller')
+        if self.rehydration_task is not None:
+            try:
+                self.rehydration_task.stop()
+            except (TaskDone, TaskFinished):
+                pass
         self.scheduler_loop.stop()
         self.crawlers_loop.stop()
         self.purger_loop.stop()
+        self.retention_loop.stop()
         self.event_loop.stop()
+        self.metrics.stop()
+        for timer in self.retry_timers.values():
+            timer.cancel()
+        self.retry_timers = {}
         return self.wait_for_running_jobs(cancel=True)
 
+    #---------------------------------------------------------------------------
+    def _rehydrate(self, blocking=False):
+        """
+        A generator restoring the state of the jobs stored in the schedule.
+        It yields after processing every chunk of jobs so that it can be
+        driven by a cooperator without blocking the reactor.
+
+        :param blocking: Look up the missing log sizes in the calling thread
+                         instead of yielding deferreds firing when they have
+                         been looked up in a worker thread
+        """
+        #-----------------------------------------------------------------------
+        # If we have any jobs marked as RUNNING in the schedule at this point,
+        # it means that the daemon was killed while the jobs were running. We
+        # mark these jobs as pending, so that they can be restarted as soon
+        # as possible. The upstream jobs of the waiting jobs might have also
+        # finished when the daemon was killed.
+        #-----------------------------------------------------------------------
+        for job in self.schedule.get_jobs(Status.RUNNING):
+            self.log.info('Restarting interrupted: {}'.format(str(job)))
+            job.status = Status.PENDING
+            self._update_job(job)
+
+        for job in self.schedule.get_jobs(Status.WAITING):
+            if job.origin is not None and not job.dependencies:
+                elapsed = (datetime.now() - job.timestamp).total_seconds()
+                delay = self._get_retry_delay(job.attempt - 1, job)
+                self._arm_retry_timer(job, max(0, delay - elapsed))
+                continue
+            status = self._check_dependencies(job)
+            if status != Status.WAITING:
+                job.status = status
+                self._update_job(job)
+
+        #-----------------------------------------------------------------------
+        # The jobs completed before the log sizes were recorded in the
+        # schedule need to have them looked up once. Decompressing the logs
+        # may take a while, so it's done in a thread unless we block anyways.
+        #-----------------------------------------------------------------------
+        for job in self.schedule.get_completed_jobs():
+            if job.logs is not None:
+                continue
+            if blocking:
+                sizes = self._read_log_sizes(job.identifier)
+                self._store_log_sizes(sizes, job.identifier)
+                continue
+            d = deferToThread(self._read_log_sizes, job.identifier)
+            d.addCallback(self._store_log_sizes, job.identifier)
+            d.addErrback(lambda f, job=job: self.log.error(
+                'Unable to look up the log sizes of {}: {}'.format(
+                    str(job), exc_repr(f.value))))
+            yield d
+
+        #-----------------------------------------------------------------------
+        # Re-schedule the recurring jobs chunk by chunk. The jobs canceled
+        # in the meantime are not SCHEDULED anymore, so they are skipped.
+        #-----------------------------------------------------------------------
+        self.rehydration_total = self.schedule.count_jobs(Status.SCHEDULED)
+        self.rehydration_done = 0
+        self.log.info('Re-scheduling {} jobs'.format(self.rehydration_total))
+        last_id = None
+        while True:
+            jobs = self.schedule.get_jobs_chunk(Status.SCHEDULED, last_id,
+                                                self.REHYDRATION_CHUNK)
+            if not jobs:
+                break
+            for job in jobs:
+                if job.identifier not in self.scheduled_jobs:
+                    sch_job = schedule_job(self.scheduler, job.schedule)
+                    self._register_scheduled_job(job, sch_job)
+            self.rehydration_done += len(jobs)
+            last_id = jobs[-1].identifier
+            yield
+        self.rehydration_done = self.rehydration_total
+        self.log.info('Re-scheduling done')
+
+    #---------------------------------------------------------------------------
+    def rehydrate(self):
+        """
+        Restore the state of the jobs stored in the schedule synchronously.
+        """
+        for _ in self._rehydrate(blocking=True):
+            pass
+
+    #---------------------------------------------------------------------------
+    def start_rehydration(self):
+        """
+        Restore the state of the jobs stored in the schedule incrementally,
+        yielding to the reactor between the chunks, so that the daemon can
+        serve requests in the meantime. The progress is reported by the
+        `rehydration_done` and `rehydration_total` attributes.
+
+        :return: A deferred triggered when the rehydration is finished
+        """
+        self.rehydration_task = cooperate(self._rehydrate())
+        return self.rehydration_task.whenDone()
+
+    #---------------------------------------------------------------------------
+    def _get_compression(self, config, option):
+        method = config.get_string('scrapy-do', option, 'none')
+        method = method.strip().lower()
+        if method == 'none':
+            return None
+        if method not in COMPRESSION_SUFFIXES:
+            raise ValueError('Unknown {} method: {}'.format(option, method))
+        if method == 'zstd' and zstandard is None:
+            raise ValueError('The zstd {} requires the zstandard '
+                             'module'.format(option))
+        return method
+
+    #---------------------------------------------------------------------------
+    def _get_log_size_caps(self, config):
+        options = [('', config.get_string('scrapy-do', 'log-size-cap', ''))]
+        options += config.get_options('log-size-caps')
+        log_size_caps = {}
+        for key, value in options:
+            if not value.strip():
+                continue
+            try:
+                log_size_caps[key.lower()] = parse_size(value)
+            except ValueError as e:
+                msg = 'Invalid log size cap for "{}": {}'
+                raise ValueError(msg.format(key or 'scrapy-do', str(e)))
+        return log_size_caps
+
+    #---------------------------------------------------------------------------
+    def _get_log_retention(self, config):
+        budget = config.get_string('scrapy-do', 'log-budget', '').strip()
+        max_age = config.get_string('scrapy-do', 'log-max-age', '').strip()
+        try:
+            budget = parse_size(budget) if budget else None
+        except ValueError as e:
+            raise ValueError('Invalid log budget: {}'.format(str(e)))
+        try:
+            max_age = parse_duration(max_age) if max_age else None
+        except ValueError as e:
+            raise ValueError('Invalid log max age: {}'.format(str(e)))
+        return budget or None, max_age or None
+
+    #---------------------------------------------------------------------------
+    def get_log_size_cap(self, project, spider):
+        """
+        Get the maximum number of bytes kept in each of the logs of a spider.
+        The spider cap takes precedence over the project cap, which takes
+        precedence over the default.
+
+        :return: The cap or `None` if the logs are not capped
+        """
+        keys = ['{}/{}'.format(project, spider), project, '']
+        for key in keys:
+            if key.lower() in self.log_size_caps:
+                return self.log_size_caps[key.lower()] or None
+        return None
+
+    #---------------------------------------------------------------------------
+    def _get_retry_defaults(self, config):
+        exit_codes = config.get_string('scrapy-do', 'retry-exit-codes', '')
+        try:
+            exit_codes = [int(x) for x in exit_codes.split(',') if x.strip()]
+        except ValueError:
+            raise ValueError('Retry exit codes need to be integers')
+
+        policy = {
+            'attempts': config.get_int('scrapy-do', 'retry-attempts', 0),
+            'backoff-base': config.get_float('scrapy-do', 'retry-backoff-base',
+                                             30.),
+            'backoff-cap': config.get_float('scrapy-do', 'retry-backoff-cap',
+                                            3600.),
+            'exit-codes': exit_codes
+        }
+        _validate_retry_policy(policy)
+        return policy
+
+    #---------------------------------------------------------------------------
+    def _get_retry_policies(self, config):
+        policies = {}
+        for key, value in config.get_options('retry-policies'):
+            try:
+                policy = json.loads(value)
+                _validate_retry_policy(policy)
+            except ValueError as e:
+                msg = 'Invalid retry policy for "{}": {}'
+                raise ValueError(msg.format(key, str(e)))
+            policies[key.lower()] = policy
+        return policies
+
+    #---------------------------------------------------------------------------
+    def _get_rate_limits(self, config):
+        rate_limits = {}
+        for key, value in config.get_options('rate-limits'):
+            try:
+                rate_limits[key.lower()] = parse_rate(value)
+            except ValueError as e:
+                msg = 'Invalid rate limit for "{}": {}'
+                raise ValueError(msg.format(key, str(e)))
+        return rate_limits
+
+    #---------------------------------------------------------------------------
+    def _get_spider_tags(self, config):
+        spider_tags = {}
+        for key, value in config.get_options('spider-tags'):
+            tags = [x.strip().lower() for x in value.split(',') if x.strip()]
+            spider_tags[key.lower()] = tags
+        return spider_tags
+
+    #---------------------------------------------------------------------------
+    def _get_rate_limiters(self, job):
+        """
+        Get all the token buckets limiting the start rate of the job.
+        """
+        keys = [job.project, '{}/{}'.format(job.project, job.spider)]
+        keys = [key.lower() for key in keys]
+        tags = set()
+        for key in keys:
+            tags.update(self.spider_tags.get(key, []))
+        keys += ['tag:' + tag for tag in sorted(tags)]
+        return [self.rate_limits[key] for key in keys
+                if key in self.rate_limits]
+
+    #---------------------------------------------------------------------------
+    def get_retry_policy(self, job):
+        """
+        Compute the effective retry policy of the job. The defaults are
+        overridden by the project policy, the spider policy, and the policy
+        of the job itself, in that order.
+
+        :param job: A :class:`Job <scrapy_do.schedule.Job>` object
+        :return:    A dictionary with the `attempts`, `backoff-base`,
+                    `backoff-cap`, and `exit-codes` keys
+        """
+        policy = dict(self.retry_defaults)
+        for key in [job.project, '{}/{}'.format(job.project, job.spider)]:
+            policy.update(self.retry_policies.get(key.lower(), {}))
+        policy.update(json.loads(job.retry))
+        return policy
+
+    #---------------------------------------------------------------------------
+    def _get_retry_delay(self, attempt, job):
+        policy = self.get_retry_policy(job)
+        delay = policy['backoff-base'] * 2 ** (attempt - 1)
+        return min(delay, policy['backoff-cap'])
+
+    #---------------------------------------------------------------------------
+    def _arm_retry_timer(self, job, delay):
+        def release(job_id):
+            del self.retry_timers[job_id]
+            job = self.schedule.get_job(job_id)
+            if job.status != Status.WAITING:
+                return
+            self.log.info('Retrying: {}'.format(str(job)))
+            job.status = Status.PENDING
+            self._update_job(job)
+
+        self.retry_timers[job.identifier] = reactor.callLater(
+            delay, release, job.identifier)
+
+    #---------------------------------------------------------------------------
+    def _retry_job(self, job, exit_code):
+        """
+        Schedule a retry of a failed job if its retry policy allows for it.
+        The retry is a new job in the :data:`WAITING
+        <scrapy_do.schedule.Status.WAITING>` state that becomes
+        :data:`PENDING <scrapy_do.schedule.Status.PENDING>` when the backoff
+        delay passes. The jobs waiting for the failed job are re-pointed to
+        the retry.
+
+        :return: The retry job or `None` if the job should not be retried
+        """
+        policy = self.get_retry_policy(job)
+        if job.attempt > policy['attempts']:
+            return None
+
+        if policy['exit-codes'] and exit_code not in policy['exit-codes']:
+            return None
+
+        retry = Job(status=Status.WAITING, actor=Actor.SCHEDULER,
+                    schedule='now', project=job.project, spider=job.spider,
+                    description=job.description, payload=job.payload,
+                    origin=job.origin or job.identifier,
+                    attempt=job.attempt + 1, retry=job.retry)
+
+        delay = self._get_retry_delay(job.attempt, job)
+        self.log.info('Retrying job {} in {} seconds as {}'.format(
+            job.identifier, delay, retry.identifier))
+        self.counter_retry += 1
+        self.schedule.add_job(retry)
+        self.dispatch_event(Event.JOB_UPDATE, retry)
+        self._arm_retry_timer(retry, delay)
+
+        for dependant in self.schedule.get_dependants(job.identifier):
+            dependant.dependencies = [
+                retry.identifier if x == job.identifier else x
+                for x in dependant.dependencies]
+            self.schedule.commit_job(dependant)
+        return retry
+
     #---------------------------------------------------------------------------
     @inlineCallbacks
     def push_project(self, data):
@@ -307,9 +700,87 @@ class Controller(Service):
             raise ValueError('Unknown project ' + project_name)
         return self.projects[project_name].spiders
 
+    #---------------------------------------------------------------------------
+    def _build_job(self, project, spider, when, actor, description, payload,
+                   dependencies=None, retry=None):
+        """
+        Validate the job parameters and build a job object. If the job is
+        not supposed to run immediately, a `schedule.Job` object is built
+        as well, but it's not registered with the scheduler. A job having
+        unfinished dependencies is put in the :data:`WAITING
+        <scrapy_do.schedule.Status.WAITING>` state.
+
+        :return: A tuple containing a :class:`Job <scrapy_do.schedule.Job>`
+                 and a `schedule.Job` or `None`
+        """
+        if project not in self.projects.keys():
+            raise ValueError('Unknown project ' + project)
+
+        if spider not in self.projects[project].spiders:
+            raise ValueError('Unknown spider {}/{}'.format(project, spider))
+
+        if isinstance(payload, str):
+            try:
+                obj = json.loads(payload)
+                payload = json.dumps(obj, ensure_ascii=False)
+            except ValueError as e:
+                msg = str(e)
+                raise ValueError('Payload is not a valid JSON string: ' + msg)
+        else:
+            payload = json.dumps(payload, ensure_ascii=False)
+
+        if retry is None:
+            retry = {}
+        elif isinstance(retry, str):
+            try:
+                retry = json.loads(retry)
+            except ValueError as e:
+                msg = 'Retry policy is not a valid JSON string: ' + str(e)
+                raise ValueError(msg)
+        _validate_retry_policy(retry)
+        retry = json.dumps(retry)
+
+        job = Job(status=Status.PENDING, actor=actor, schedule='now',
+                  project=project, spider=spider, description=description,
+                  payload=payload, retry=retry)
+
+        sch_job = None
+        if when != 'now':
+            if dependencies:
+                raise ValueError('Jobs with dependencies can only be '
+                                 'scheduled to run now')
+            sch_job = schedule_job(self.scheduler, when)
+            job.status = Status.SCHEDULED
+            job.schedule = when
+
+        if dependencies:
+            for identifier in dependencies:
+                upstream = self.schedule.get_job(identifier)
+                if upstream.status == Status.SCHEDULED:
+                    msg = 'Job {} is a recurring job and never finishes'
+                    raise ValueError(msg.format(identifier))
+                if upstream.status in [Status.FAILED, Status.CANCELED]:
+                    msg = 'Job {} did not finish successfully'
+                    raise ValueError(msg.format(identifier))
+                if upstream.status != Status.SUCCESSFUL:
+                    job.status = Status.WAITING
+            job.dependencies = list(dependencies)
+        return job, sch_job
+
+    #---------------------------------------------------------------------------
+    def _register_scheduled_job(self, job, sch_job):
+        sch_job.do(lambda job: self.schedule_job(job.project, job.spider,
+                                                 'now', Actor.SCHEDULER,
+                                                 job.description,
+                                                 job.payload,
+                                                 retry=job.retry),
+                   job)
+        self.scheduled_jobs[job.identifier] = sch_job
+
     #---------------------------------------------------------------------------
     def schedule_job(self, project, spider, when, actor=Actor.USER,
-                     description='', payload='{}'):
+                     description='', payload='{}', dependencies=None,
+                     retry=None):
         """
         Schedule a crawler job.
 
@@ -323,38 +794,191 @@ class Controller(Service):
                             to empty string
         :param payload: A serialized JSON object with user data, defaults to an
                         empty object
+        :param dependencies: A list of identifiers of the jobs that need to
+                             finish successfully before this job can run; only
+                             valid if `when` is `'now'`
+        :param retry:   A retry policy overriding the configured one, either
+                        as a serialized JSON object or a dictionary, see
+                        :meth:`get_retry_policy <Controller.get_retry_policy>`
         :return:        A string identifier of a job
         """
-        if project not in self.projects.keys():
-            raise ValueError('Unknown project ' + project)
-
-        if spider not in self.projects[project].spiders:
-            raise ValueError('Unknown spider {}/{}'.format(project, spider))
-
-        try:
-            obj = json.loads(payload)
-            payload = json.dumps(obj, ensure_ascii=False)
-        except ValueError as e:
-            msg = str(e)
-            raise ValueError('Payload is not a valid JSON string: ' + msg)
-
-        job = Job(status=Status.PENDING, actor=actor, schedule='now',
-                  project=project, spider=spider, description=description,
-                  payload=payload)
-        if when != 'now':
-            sch_job = schedule_job(self.scheduler, when)
-            sch_job.do(lambda: self.schedule_job(project, spider, 'now',
-                                                 Actor.SCHEDULER, description,
-                                                 payload))
-            self.scheduled_jobs[job.identifier] = sch_job
-            job.status = Status.SCHEDULED
-            job.schedule = when
+        job, sch_job = self._build_job(project, spider, when, actor,
+                                       description, payload, dependencies,
+                                       retry)
+        if sch_job is not None:
+            self._register_scheduled_job(job, sch_job)
 
         self.log.info('Scheduling: {}'.format(str(job)))
         self.schedule.add_job(job)
         self.dispatch_event(Event.JOB_UPDATE, job)
         return job.identifier
 
+    #---------------------------------------------------------------------------
+    def schedule_jobs(self, jobs, actor=Actor.USER, payload='{}'):
+        """
+        Schedule multiple crawler jobs at once. All the jobs are validated
+        before any of them is stored, and they are all stored in a single
+        transaction. Only one aggregated event is dispatched for the entire
+        batch.
+
+        The jobs may form a dependency graph. A job may be given a `name`
+        that is local to the batch, and the `dependencies` list of a job
+        may refer both to these names and to the identifiers of the jobs
+        that already exist.
+
+        :param jobs:    A list of dictionaries describing the jobs. Each
+                        dictionary needs to have the `project` and `spider`
+                        keys; the `when`, `description`, `payload`, `retry`,
+                        `name`, and `dependencies` keys are optional. The
+                        payload and the retry policy may be either serialized
+                        JSON objects or deserialized ones.
+        :param actor:   :data:`Actor <scrapy_do.schedule.Actor>` triggering the
+                        event
+        :param payload: A payload shared by all the jobs of the batch that
+                        do not specify their own
+        :return:        A list of string identifiers of the jobs in the same
+                        order as the input
+        :raises ValueError: If any of the jobs is invalid or the dependencies
+                            form a cycle; none of the jobs is scheduled in such
+                            a case
+        """
+        #-----------------------------------------------------------------------
+        # Resolve the batch-local names
+        #-----------------------------------------------------------------------
+        names = {}
+        for i, spec in enumerate(jobs):
+            if not isinstance(spec, dict):
+                raise ValueError('Job #{}: Not a JSON object'.format(i))
+            if 'name' in spec:
+                if spec['name'] in names:
+                    msg = 'Job #{}: Duplicate name "{}"'
+                    raise ValueError(msg.format(i, spec['name']))
+                names[spec['name']] = i
+
+        #-----------------------------------------------------------------------
+        # Validate all the jobs first
+        #-----------------------------------------------------------------------
+        new_jobs = []
+        local_deps = []
+        for i, spec in enumerate(jobs):
+            try:
+                for key in ['project', 'spider']:
+                    if key not in spec:
+                        raise ValueError('Missing key "{}"'.format(key))
+                deps = spec.get('dependencies', [])
+                if not isinstance(deps, list):
+                    raise ValueError('Dependencies need to be a list')
+                local = [names[dep] for dep in deps if dep in names]
+                external = [dep for dep in deps if dep not in names]
+                when = spec.get('when', 'now')
+                if local and when != 'now':
+                    raise ValueError('Jobs with dependencies can only be '
+                                     'scheduled to run now')
+                new_jobs.append(self._build_job(
+                    spec['project'], spec['spider'], when, actor,
+                    spec.get('description', ''), spec.get('payload', payload),
+                    external, spec.get('retry')))
+                local_deps.append(local)
+            except ValueError as e:
+                raise ValueError('Job #{}: {}'.format(i, str(e)))
+
+        if not new_jobs:
+            return []
+
+        #-----------------------------------------------------------------------
+        # Check for cycles and link the jobs within the batch
+        #-----------------------------------------------------------------------
+        in_degree = [len(deps) for deps in local_deps]
+        dependants = [[] for _ in local_deps]
+        for i, deps in enumerate(local_deps):
+            for dep in deps:
+                dependants[dep].append(i)
+
+        ready = [i for i, degree in enumerate(in_degree) if degree == 0]
+        num_sorted = 0
+        while ready:
+            i = ready.pop()
+            num_sorted += 1
+            for dependant in dependants[i]:
+                in_degree[dependant] -= 1
+                if in_degree[dependant] == 0:
+                    ready.append(dependant)
+
+        if num_sorted != len(local_deps):
+            raise ValueError('The job dependencies form a cycle')
+
+        for (job, _), deps in zip(new_jobs, local_deps):
+            if deps:
+                job.dependencies += [new_jobs[dep][0].identifier
+                                     for dep in deps]
+                job.status = Status.WAITING
+
+        #-----------------------------------------------------------------------
+        # Store the jobs and register the scheduled ones with the scheduler
+        #-----------------------------------------------------------------------
+        self.schedule.add_jobs([job for job, _ in new_jobs])
+
+        for job, sch_job in new_jobs:
+            if sch_job is not None:
+                self._register_scheduled_job(job, sch_job)
+
+        self.log.info('Scheduled {} jobs'.format(len(new_jobs)))
+        batch = [job for job, _ in new_jobs]
+        self.dispatch_event(Event.JOB_BATCH_UPDATE, batch)
+        return [job.identifier for job in batch]
+
+    #---------------------------------------------------------------------------
+    def _check_dependencies(self, job):
+        """
+        Figure out what should happen to a waiting job given the current state
+        of its upstream jobs.
+
+        The failures are passed downstream as soon as they happen, so an
+        upstream job that does not exist anymore has been purged after it
+        finished successfully.
+
+        :return: :data:`PENDING <scrapy_do.schedule.Status.PENDING>` if all
+                 the upstream jobs have finished successfully or have been
+                 purged, :data:`CANCELED <scrapy_do.schedule.Status.CANCELED>`
+                 if any of them has failed or has been canceled, and
+                 :data:`WAITING <scrapy_do.schedule.Status.WAITING>` otherwise
+        """
+        status = Status.PENDING
+        for identifier in job.dependencies:
+            try:
+                upstream = self.schedule.get_job(identifier)
+            except ValueError:
+                continue
+            if upstream.status in [Status.FAILED, Status.CANCELED]:
+                return Status.CANCELED
+            if upstream.status != Status.SUCCESSFUL:
+                status = Status.WAITING
+        return status
+
+    #---------------------------------------------------------------------------
+    def _update_dependants(self, job):
+        """
+        Promote the jobs waiting for the given job to :data:`PENDING
+        <scrapy_do.schedule.Status.PENDING>` if all of their dependencies
+        have been met, or cancel them if they cannot be met anymore.
+        """
+        for dependant in self.schedule.get_dependants(job.identifier):
+            status = self._check_dependencies(dependant)
+            if status == Status.WAITING:
+                continue
+
+            if status == Status.PENDING:
+                self.log.info('Dependencies met: {}'.format(str(dependant)))
+            else:
+                self.log.info('Dependencies failed: {}'.format(
+                    str(dependant)))
+                self.counter_cancel += 1
+
+            dependant.status = status
+            self._update_job(dependant)
+            if status == Status.CANCELED:
+                self._update_dependants(dependant)
+
     #---------------------------------------------------------------------------
     def get_jobs(self, job_status):
         """
@@ -378,6 +1002,14 @@ class Controller(Service):
         """
         return self.schedule.get_completed_jobs()
 
+    #---------------------------------------------------------------------------
+    def get_jobs_window(self, statuses, **kwargs):
+        """
+        See :meth:`Schedule.get_jobs_window
+        <scrapy_do.schedule.Schedule.get_jobs_window>`.
+        """
+        return self.schedule.get_jobs_window(statuses, **kwargs)
+
     #---------------------------------------------------------------------------
     def get_job(self, job_id):
         """
@@ -396,13 +1028,61 @@ class Controller(Service):
         path = os.path.join(self.log_dir, job_id)
         logs = []
         for log in ['out', 'err']:
-            log_path = '{}.{}'.format(path, log)
-            if os.path.exists(log_path):
-                logs.append(log_path)
-            else:
-                logs.append(None)
+            logs.append(find_log('{}.{}'.format(path, log)))
         return tuple(logs)
 
+    #---------------------------------------------------------------------------
+    def get_job_feed(self, job_id):
+        """
+        Get the path to the item feed of a job. The feed of a running job
+        is still being written to.
+
+        :return: The path or `None` if the job has no feed
+        :raises ValueError: If the job does not exist
+        """
+        job = self.get_job(job_id)
+        if job.status == Status.RUNNING:
+            feed_path = os.path.join(self.feed_dir, job_id + '.jl')
+            return feed_path if os.path.exists(feed_path) else None
+        if job.feed is None:
+            return None
+        return os.path.join(self.feed_dir, job.feed['file'])
+
+    #---------------------------------------------------------------------------
+    def _read_log_sizes(self, job_id):
+        """
+        Look up the sizes of the logs of a job in the file system. The size
+        of a compressed log is the size of its uncompressed data.
+
+        :return: A dictionary mapping the types of the existing logs to their
+                 sizes
+        """
+        sizes = {}
+        for log_type, log_path in zip(['out', 'err'],
+                                      self.get_job_logs(job_id)):
+            if log_path is None:
+                continue
+            index = load_log_index(log_path)
+            if index is not None:
+                sizes[log_type] = index['size']
+            else:
+                sizes[log_type] = get_log_size(log_path)
+        return sizes
+
+    #---------------------------------------------------------------------------
+    def _store_log_sizes(self, sizes, job_id):
+        """
+        Record the log sizes of a job in the schedule unless the job has
+        been removed or has got its log sizes in the meantime.
+        """
+        try:
+            job = self.schedule.get_job(job_id)
+        except ValueError:
+            return
+        if job.logs is None:
+            job.logs = sizes
+            self.schedule.commit_job(job)
+
     #---------------------------------------------------------------------------
     def run_scheduler(self):
         """
@@ -412,7 +1092,7 @@ class Controller(Service):
 
     #---------------------------------------------------------------------------
     @inlineCallbacks
-    def _run_crawler(self, project, spider, job_id, payload):
+    def _run_crawler(self, project, spider, job_id, payload, log_sizes=None):
         #-----------------------------------------------------------------------
         # Unzip to a temporary directory
         #-----------------------------------------------------------------------
@@ -438,9 +1118,14 @@ class Controller(Service):
         args = ['crawl', spider]
         if payload != '{}':
             args += ['-a', 'payload=' + payload]
+        if self.feeds:
+            args += ['-o', os.path.join(self.feed_dir, job_id + '.jl')]
+        size_cap = self.get_log_size_cap(project, spider)
         process, finished = run_process('scrapy', args, job_id,
                                         self.log_dir, env=env,
-                                        path=temp_proj_dir)
+                                        path=temp_proj_dir, size_cap=size_cap,
+                                        log_sizes=log_sizes,
+                                        on_spill=self.log_watcher.notify)
 
         #-----------------------------------------------------------------------
         # Clean up
@@ -456,24 +1141,37 @@ class Controller(Service):
     def run_crawlers(self):
         """
         Spawn as many crawler processe out of pending jobs as there is free
-        job slots.
+        job slots. The jobs exceeding their rate limits are skipped and stay
+        pending, while the jobs queued behind them may still start.
         """
         jobs = self.schedule.get_jobs(Status.PENDING)
         jobs.reverse()
         while len(self.running_jobs) < self.job_slots and jobs:
-            self.counter_run += 1
+            job = jobs.pop()
+
+            #-------------------------------------------------------------------
+            # Check the rate limits; the tokens are taken only if all of the
+            # limits allow the job to start
+            #-------------------------------------------------------------------
+            limiters = self._get_rate_limiters(job)
+            if any(limiter.available() < 1 for limiter in limiters):
+                continue
+            for limiter in limiters:
+                limiter.consume()
+
             #-------------------------------------------------------------------
             # Run the job
             #-------------------------------------------------------------------
-            job = jobs.pop()
+            self.counter_run += 1
             job.status = Status.RUNNING
             self._update_job(job)
             # Use a placeholder until the process is actually started, so that
             # we do not exceed the quota due to races.
             self.running_jobs[job.identifier] = None
 
+            log_sizes = {}
             d = self._run_crawler(job.project, job.spider, job.identifier,
-                                  job.payload)
+                                  job.payload, log_sizes)
 
             #-------------------------------------------------------------------
             # Error starting the job
@@ -481,18 +1179,22 @@ class Controller(Service):
             def spawn_errback(error, job):
                 self.counter_failure += 1
                 job.status = Status.FAILED
+                job.logs = {}
                 self._update_job(job)
                 self.log.error('Unable to start job {}: {}'.format(
                     job.identifier, exc_repr(error.value)))
                 del self.running_jobs[job.identifier]
+                self._notify_log_watcher(job.identifier)
+                self._update_dependants(job)
 
             #-------------------------------------------------------------------
             # Job started successfully
             #-------------------------------------------------------------------
-            def spawn_callback(value, job):
+            def spawn_callback(value, job, log_sizes):
                 # Put the process object and the finish deferred in the
                 # dictionary
-                running_job = RunningJob(value[0], value[1], datetime.now())
+                running_job = RunningJob(value[0], value[1], datetime.now(),
+                                         log_sizes)
                 self.running_jobs[job.identifier] = running_job
                 self.log.info('Job {} started successfully'.format(
                     job.identifier))
@@ -508,19 +1210,117 @@ class Controller(Service):
                         self.counter_failure += 1
                         job.status = Status.FAILED
 
+                    #-----------------------------------------------------------
+                    # Record the sizes of the logs, so that nobody needs to
+                    # look them up in the file system
+                    #-----------------------------------------------------------
                     rj = self.running_jobs[job.identifier]
                     job.duration = (datetime.now() - rj.time_started).seconds
+                    job.logs = dict(rj.log_sizes)
                     msg = "Job {} exited with code {}".format(job.identifier,
                                                               exit_code)
                     self.log.info(msg)
                     self._update_job(job)
                     del self.running_jobs[job.identifier]
-                    return exit_code
+                    self._notify_log_watcher(job.identifier)
+
+                    #-----------------------------------------------------------
+                    # Jobs killed by a signal are either canceled or
+                    # terminated on shutdown, so they are not retried
+                    #-----------------------------------------------------------
+                    terminated = job.identifier in self.terminated_jobs
+                    self.terminated_jobs.discard(job.identifier)
+                    if exit_code not in [0, None] and not terminated:
+                        self._retry_job(job, exit_code)
+                    self._update_dependants(job)
+
+                    d = self._finalize_output(job)
+                    d.addCallback(lambda _: exit_code)
+                    return d
 
                 value[1].addCallback(finished_callback)
 
             d.addCallbacks(spawn_callback, spawn_errback,
-                           callbackArgs=(job,), errbackArgs=(job,))
+                           callbackArgs=(job, log_sizes), errbackArgs=(job,))
+
+    #---------------------------------------------------------------------------
+    def _notify_log_watcher(self, job_id):
+        #-----------------------------------------------------------------------
+        # Let the log and feed followers know that the job is not running
+        # anymore
+        #-----------------------------------------------------------------------
+        for log_type in ['out', 'err']:
+            log_file = '{}.{}'.format(job_id, log_type)
+            self.log_watcher.notify(os.path.join(self.log_dir, log_file))
+        self.log_watcher.notify(os.path.join(self.feed_dir, job_id + '.jl'))
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def _finalize_output(self, job):
+        """
+        Index the logs of a finished job, extract the metrics of the crawl
+        from them, and compress them and the item feed, if configured to do
+        so, in a thread. The followers of the logs have the uncompressed files
+        open, so they are not affected by the originals being removed.
+
+        :return: A deferred triggered when the output has been processed
+        """
+        #-----------------------------------------------------------------------
+        # The log retention must leave the output alone while it's being
+        # processed
+        #-----------------------------------------------------------------------
+        metrics = {}
+        self.finalizing_jobs.add(job.identifier)
+        for log_type in ['err', 'out']:
+            log_file = '{}.{}'.format(job.identifier, log_type)
+            log_path = os.path.join(self.log_dir, log_file)
+            if not os.path.exists(log_path):
+                continue
+            try:
+                yield deferToThread(build_log_index, log_path)
+                if not metrics:
+                    metrics = yield deferToThread(get_metrics, log_path)
+                if self.log_compression is not None:
+                    yield deferToThread(compress_log, log_path,
+                                        self.log_compression)
+            except Exception as e:
+                self.log.error('Unable to process {}: {}'.format(
+                    log_file, exc_repr(e)))
+
+        #-----------------------------------------------------------------------
+        # Scrapy may leave an empty feed behind if there were no items
+        #-----------------------------------------------------------------------
+        feed = None
+        feed_path = os.path.join(self.feed_dir, job.identifier + '.jl')
+        try:
+            if os.path.exists(feed_path) and os.path.getsize(feed_path) == 0:
+                os.remove(feed_path)
+            elif os.path.exists(feed_path):
+                if self.feed_compression is not None:
+                    feed_path = yield deferToThread(compress_log, feed_path,
+                                                    self.feed_compression)
+                feed = {
+                    'file': os.path.basename(feed_path),
+                    'size': os.path.getsize(feed_path)
+                }
+        except Exception as e:
+            self.log.error('Unable to process {}: {}'.format(
+                os.path.basename(feed_path), exc_repr(e)))
+        self.finalizing_jobs.discard(job.identifier)
+
+        #-----------------------------------------------------------------------
+        # Make sure the job has not been purged in the meantime
+        #-----------------------------------------------------------------------
+        if not metrics and feed is None:
+            return
+        try:
+            self.schedule.get_job(job.identifier)
+        except ValueError:
+            return
+        if metrics:
+            job.metrics = metrics
+        job.feed = feed
+        self._update_job(job)
 
     #---------------------------------------------------------------------------
     @inlineCallbacks
@@ -557,6 +1357,7 @@ class Controller(Service):
         if cancel:
             for job_id in self.running_jobs:
                 rj = self.running_jobs[job_id]
+                self.terminated_jobs.add(job_id)
                 rj.process.signalProcess('TERM')
 
         #-----------------------------------------------------------------------
@@ -588,15 +1389,20 @@ class Controller(Service):
         if job.status == Status.SCHEDULED:
             job.status = Status.CANCELED
             self._update_job(job)
-            self.scheduler.cancel_job(self.scheduled_jobs[job_id])
-            del self.scheduled_jobs[job_id]
+            # The job may not have been rehydrated yet
+            if job_id in self.scheduled_jobs:
+                self.scheduler.cancel_job(self.scheduled_jobs[job_id])
+                del self.scheduled_jobs[job_id]
 
         #-----------------------------------------------------------------------
-        # Pending
+        # Pending or waiting
         #-----------------------------------------------------------------------
-        elif job.status == Status.PENDING:
+        elif job.status in [Status.PENDING, Status.WAITING]:
             job.status = Status.CANCELED
             self._update_job(job)
+            if job_id in self.retry_timers:
+                self.retry_timers[job_id].cancel()
+                del self.retry_timers[job_id]
 
         #-----------------------------------------------------------------------
         # Running
@@ -614,6 +1420,12 @@ class Controller(Service):
             yield rj.finished_d
             self.counter_failure -= 1
             self.counter_cancel += 1
+
+            #-------------------------------------------------------------------
+            # The logs, the metrics, and the feed of the job have been
+            # recorded in the meantime, so they need to be preserved
+            #-------------------------------------------------------------------
+            job = self.schedule.get_job(job_id)
             job.status = Status.CANCELED
             job.duration = (datetime.now() - rj.time_started).seconds
             self._update_job(job)
@@ -624,6 +1436,8 @@ class Controller(Service):
         else:
             raise ValueError('Job {} is not active'.format(job_id))
 
+        self._update_dependants(job)
+
     #---------------------------------------------------------------------------
     def purge_completed_jobs(self):
         """
@@ -637,10 +1451,48 @@ class Controller(Service):
         for job in old_jobs:
             self.dispatch_event(Event.JOB_REMOVE, job.identifier)
             self.schedule.remove_job(job.identifier)
+            suffixes = [''] + list(COMPRESSION_SUFFIXES.values()) + ['.idx']
             for log_type in ['.out', '.err']:
                 log_file = os.path.join(self.log_dir, job.identifier + log_type)
-                if os.path.exists(log_file):
-                    os.remove(log_file)
+                for suffix in suffixes:
+                    if os.path.exists(log_file + suffix):
+                        os.remove(log_file + suffix)
+            if job.feed is not None:
+                feed_path = os.path.join(self.feed_dir, job.feed['file'])
+                if os.path.exists(feed_path):
+                    os.remove(feed_path)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def enforce_log_retention(self):
+        """
+        Evict the logs and the item feeds exceeding the log budget or the max
+        age in a thread. The output of the running jobs and of the jobs whose
+        output is being processed is never evicted. The jobs whose output has
+        been evicted are updated to reflect that.
+
+        :return: A deferred triggered when the eviction pass is done
+        """
+        protected = set(self.running_jobs) | self.finalizing_jobs
+        try:
+            evicted = yield deferToThread(self.log_retention.enforce,
+                                          protected)
+        except Exception as e:
+            self.log.error('Unable to enforce the log retention: {}'.format(
+                exc_repr(e)))
+            return
+
+        if evicted:
+            self.log.info('Evicted the logs of {} jobs'.format(len(evicted)))
+
+        for job_id in evicted:
+            try:
+                job = self.schedule.get_job(job_id)
+            except ValueError:
+                continue
+            job.logs = {}
+            job.feed = None
+            self._update_job(job)
 
     #---------------------------------------------------------------------------
     def remove_project(self, name):
@@ -678,26 +1530,27 @@ class Controller(Service):
         self.schedule.commit_job(job)
 
     #---------------------------------------------------------------------------
-    def add_event_listener(self, listener):
+    def add_event_listener(self, listener, event_types=None):
         """
-        Add an event listener.
+        Add an event listener. See :meth:`EventBus.add_listener
+        <scrapy_do.events.EventBus.add_listener>`.
         """
-        self.listeners.add(listener)
+        self.event_bus.add_listener(listener, event_types)
 
     #---------------------------------------------------------------------------
     def remove_event_listener(self, listener):
         """
         Remove the event listener.
         """
-        self.listeners.remove(listener)
+        self.event_bus.remove_listener(listener)
 
     #---------------------------------------------------------------------------
     def dispatch_event(self, event_type, event_data):
         """
-        Dispatch an event to all the listeners.
+        Queue an event for the delivery to all the listeners interested in
+        it. The listeners get it in a later reactor iteration.
         """
-        for listener in self.listeners:
-            listener(event_type, event_data)
+        self.event_bus.dispatch(event_type, event_data)
 
     #---------------------------------------------------------------------------
     def dispatch_periodic_events(self):
@@ -708,9 +1561,7 @@ class Controller(Service):
         # Daemon status - send the event either every minute or whenever
         # the memory usage crossed a megabyte boundary
         #-----------------------------------------------------------------------
-        mem_usage = psutil.Process(os.getpid()).memory_info().rss
-        mem_usage = float(mem_usage) / 1024. / 1024.
-        mem_usage = int(mem_usage)
+        mem_usage = int(self.metrics.get_snapshot()['memory-usage'])
         now = time.time()
         if self.mem_usage is None or now - self.mem_usage_ts >= 60 or \
                 abs(self.mem_usage - mem_usage) >= 1:
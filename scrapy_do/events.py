@@ -0,0 +1,244 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+"""
+Functionality related to passing the controller events to the listeners.
+"""
+
+import collections
+import time
+
+from twisted.internet import reactor
+from twisted.logger import Logger
+from .utils import exc_repr
+from enum import Enum
+
+
+#-------------------------------------------------------------------------------
+class Event(Enum):
+    """
+    Controller even type.
+    """
+    DAEMON_STATUS_CHANGE = 1,
+    PROJECT_PUSH = 2,
+    PROJECT_REMOVE = 3,
+    JOB_UPDATE = 4,
+    JOB_REMOVE = 5,
+    JOB_BATCH_UPDATE = 6
+
+
+#-------------------------------------------------------------------------------
+def get_listener_name(listener):
+    """
+    Get a human-readable name of a listener callable.
+    """
+    name = getattr(listener, '__qualname__', None)
+    if name is None:
+        name = type(listener).__qualname__
+    module = getattr(listener, '__module__', None)
+    if module is None:
+        module = type(listener).__module__
+    return '{}.{}'.format(module, name)
+
+
+#-------------------------------------------------------------------------------
+class EventListener:
+    """
+    A listener registered with the :class:`EventBus` together with the
+    statistics of the deliveries to it.
+
+    :param callback:    A callable taking the event type and the event data
+    :param event_types: A collection of the :class:`Event` types the listener
+                        wants or `None` for all of them
+    """
+
+    #---------------------------------------------------------------------------
+    def __init__(self, callback, event_types=None):
+        self.callback = callback
+        self.event_types = None
+        if event_types is not None:
+            self.event_types = frozenset(event_types)
+        self.name = get_listener_name(callback)
+        self.events = 0
+        self.errors = 0
+        self.total_time = 0.
+        self.max_time = 0.
+        self.total_latency = 0.
+        self.max_latency = 0.
+
+    #---------------------------------------------------------------------------
+    def wants(self, event_type):
+        """
+        Check if the listener wants the events of the type.
+        """
+        return self.event_types is None or event_type in self.event_types
+
+    #---------------------------------------------------------------------------
+    def record(self, dispatched, started, finished):
+        """
+        Record a delivery.
+
+        :param dispatched: The time when the event has been dispatched
+        :param started:    The time when the listener has been called
+        :param finished:   The time when the listener has returned
+        """
+        elapsed = finished - started
+        latency = finished - dispatched
+        self.events += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    #---------------------------------------------------------------------------
+    def get_stats(self):
+        """
+        Get the statistics of the deliveries: the number of the events
+        delivered and of the ones that the listener has failed to handle, and
+        the mean and maximum times in seconds spent in the listener and
+        elapsed between the dispatch of the events and the listener returning.
+        """
+        events = self.events or 1
+        return {
+            'events': self.events,
+            'errors': self.errors,
+            'mean-time': self.total_time / events,
+            'max-time': self.max_time,
+            'mean-latency': self.total_latency / events,
+            'max-latency': self.max_latency
+        }
+
+
+#-------------------------------------------------------------------------------
+class EventBus:
+    """
+    Pass the controller events to the listeners. The events are queued when
+    they are dispatched and delivered in order in a later reactor iteration,
+    so the code dispatching them is never held up by the listeners. An event
+    is delivered to the listeners that want it and are registered both when
+    it's dispatched and when it's delivered. Every listener is called
+    separately; the exceptions it raises are logged and counted, but don't
+    prevent the other listeners from getting the event. The listeners get the
+    event data as it is at the time of the delivery.
+
+    :param clock: The reactor or a clock providing `callLater`; the global
+                  reactor if `None`
+    """
+
+    log = Logger()
+
+    #---------------------------------------------------------------------------
+    def __init__(self, clock=None):
+        self.clock = clock if clock is not None else reactor
+        self.listeners = collections.OrderedDict()
+        self.pending = collections.deque()
+        self.delivery_call = None
+        self.delivering = False
+        self.dispatched = 0
+
+    #---------------------------------------------------------------------------
+    def add_listener(self, listener, event_types=None):
+        """
+        Add a listener.
+
+        :param listener:    A callable taking the event type and the event
+                            data
+        :param event_types: A collection of the :class:`Event` types the
+                            listener wants or `None` for all of them
+        :raises TypeError:  If any of the event types is not an
+                            :class:`Event`
+        """
+        if event_types is not None:
+            event_types = list(event_types)
+            for event_type in event_types:
+                if not isinstance(event_type, Event):
+                    msg = 'Unknown event type: {}'.format(event_type)
+                    raise TypeError(msg)
+        self.listeners[listener] = EventListener(listener, event_types)
+
+    #---------------------------------------------------------------------------
+    def remove_listener(self, listener):
+        """
+        Remove a listener. It's not sent the events still waiting to be
+        delivered.
+
+        :raises KeyError: If the listener is not registered
+        """
+        del self.listeners[listener]
+
+    #---------------------------------------------------------------------------
+    def dispatch(self, event_type, event_data):
+        """
+        Queue an event for the delivery to the listeners.
+
+        :raises TypeError: If the event type is not an :class:`Event`
+        """
+        if not isinstance(event_type, Event):
+            raise TypeError('Unknown event type: {}'.format(event_type))
+        self.dispatched += 1
+        listeners = [listener for listener in self.listeners.values()
+                     if listener.wants(event_type)]
+        if not listeners:
+            return
+        self.pending.append((event_type, event_data, listeners,
+                             time.perf_counter()))
+        if self.delivery_call is None and not self.delivering:
+            self.delivery_call = self.clock.callLater(0, self.deliver)
+
+    #---------------------------------------------------------------------------
+    def deliver(self):
+        """
+        Deliver all the queued events to the listeners. The events dispatched
+        by the listeners are delivered in the same pass.
+        """
+        if self.delivery_call is not None and self.delivery_call.active():
+            self.delivery_call.cancel()
+        self.delivery_call = None
+        self.delivering = True
+
+        while self.pending:
+            event_type, event_data, listeners, dispatched = \
+                self.pending.popleft()
+            for listener in listeners:
+                if self.listeners.get(listener.callback) is not listener:
+                    continue
+                started = time.perf_counter()
+                try:
+                    listener.callback(event_type, event_data)
+                except Exception as e:
+                    listener.errors += 1
+                    msg = 'Listener {} failed to handle {}: {}'
+                    self.log.error(msg.format(listener.name, event_type.name,
+                                              exc_repr(e)))
+                listener.record(dispatched, started, time.perf_counter())
+        self.delivering = False
+
+    #---------------------------------------------------------------------------
+    def get_stats(self):
+        """
+        Get the statistics of the bus: the number of the events dispatched
+        and still waiting to be delivered, and the delivery statistics of
+        every listener, see :meth:`EventListener.get_stats`, keyed by the
+        listener names.
+        """
+        listeners = collections.defaultdict(list)
+        for listener in self.listeners.values():
+            listeners[listener.name].append(listener.get_stats())
+
+        stats = {}
+        for name, listener_stats in listeners.items():
+            if len(listener_stats) == 1:
+                stats[name] = listener_stats[0]
+                continue
+            for i, listener_stat in enumerate(listener_stats):
+                stats['{}#{}'.format(name, i + 1)] = listener_stat
+
+        return {
+            'dispatched': self.dispatched,
+            'pending': len(self.pending),
+            'listeners': stats
+        }
@@ -0,0 +1,1235 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+"""
+Functionality related to watching and serving the job logs.
+"""
+
+import collections
+import itertools
+import codecs
+import ast
+import shutil
+import gzip
+import json
+import io
+import time
+import os
+import re
+
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.defer import Deferred
+from twisted.internet.task import LoopingCall
+from twisted.python.filepath import FilePath
+from twisted.logger import Logger
+from zope.interface import implementer
+from .utils import CappedLogFile
+
+try:
+    from twisted.internet import inotify
+except ImportError:
+    inotify = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+#-------------------------------------------------------------------------------
+# Severities of the log lines recorded in the log indices, from the lowest
+#-------------------------------------------------------------------------------
+LOG_LEVELS = ['WARNING', 'ERROR', 'CRITICAL']
+LOG_LEVEL_RE = re.compile(r'\] (WARNING|ERROR|CRITICAL): ')
+
+#-------------------------------------------------------------------------------
+# Maximum number of line positions stored in a log index per severity
+#-------------------------------------------------------------------------------
+MAX_INDEX_POSITIONS = 10000
+
+#-------------------------------------------------------------------------------
+# Scrapy stats stored as the job metrics
+#-------------------------------------------------------------------------------
+STATS_MARKER = 'Dumping Scrapy stats:'
+STATS_SCAN_SIZE = 1024 * 1024
+METRIC_KEYS = [
+    'item_scraped_count', 'item_dropped_count', 'downloader/request_count',
+    'downloader/response_count', 'downloader/exception_count',
+    'elapsed_time_seconds', 'finish_reason'
+]
+METRIC_PREFIXES = [
+    'downloader/response_status_count/', 'log_count/', 'spider_exceptions/'
+]
+
+#-------------------------------------------------------------------------------
+# Suffixes of the compressed log files; the names of the compression methods
+# double as the values of the HTTP Content-Encoding header
+#-------------------------------------------------------------------------------
+COMPRESSION_SUFFIXES = collections.OrderedDict([
+    ('gzip', '.gz'),
+    ('zstd', '.zst')
+])
+
+#-------------------------------------------------------------------------------
+# Names of all the files belonging to the logs of a job: the logs themselves,
+# possibly compressed, their indices, the temporary compression output, and
+# the sidecar files holding the tails of the capped logs
+#-------------------------------------------------------------------------------
+LOG_FILE_RE = re.compile(
+    r'^(.+)\.(out|err)(\.gz|\.zst)?(\.idx|\.tmp|\.tail|\.tail\.1)?$')
+FEED_FILE_RE = re.compile(r'^(.+)\.jl(\.gz|\.zst)?(\.tmp)?$')
+
+
+#-------------------------------------------------------------------------------
+class LogWatcher:
+    """
+    Notify the interested parties about the changes to the log files. Every
+    file is watched only once, regardless of the number of parties interested
+    in it. The changes are detected using inotify if it's available and by
+    periodically checking the sizes of all the watched files, in a single loop,
+    otherwise. The owner of the files may also trigger a notification
+    explicitly with :meth:`notify <LogWatcher.notify>`, ie. when the process
+    writing to a file exits.
+
+    :param poll_interval: Interval in seconds between two checks of the file
+                          sizes if inotify is not available
+    :param use_inotify:   Use inotify if it's available
+    """
+
+    log = Logger()
+
+    #---------------------------------------------------------------------------
+    def __init__(self, poll_interval=0.25, use_inotify=True):
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and inotify is not None
+        self.callbacks = {}
+        self.sizes = {}
+        self.notifier = None
+        self.poll_loop = None
+
+    #---------------------------------------------------------------------------
+    def watch(self, path, callback):
+        """
+        Call the callback whenever the file changes.
+
+        :param path:     Path to the file
+        :param callback: A callable taking no arguments
+        """
+        if path not in self.callbacks:
+            self.callbacks[path] = []
+            self._start_watching(path)
+        self.callbacks[path].append(callback)
+
+    #---------------------------------------------------------------------------
+    def unwatch(self, path, callback):
+        """
+        Stop calling the callback when the file changes. The file stops being
+        watched when there are no callbacks left.
+        """
+        callbacks = self.callbacks.get(path, [])
+        if callback not in callbacks:
+            return
+        callbacks.remove(callback)
+        if not callbacks:
+            del self.callbacks[path]
+            self._stop_watching(path)
+
+    #---------------------------------------------------------------------------
+    def notify(self, path):
+        """
+        Call all the callbacks associated with the file.
+        """
+        for callback in list(self.callbacks.get(path, [])):
+            callback()
+
+    #---------------------------------------------------------------------------
+    def _start_watching(self, path):
+        #-----------------------------------------------------------------------
+        # Try inotify first
+        #-----------------------------------------------------------------------
+        if self.use_inotify:
+            try:
+                if self.notifier is None:
+                    self.notifier = inotify.INotify()
+                    self.notifier.startReading()
+                self.notifier.watch(FilePath(path), mask=inotify.IN_MODIFY,
+                                    callbacks=[self._inotify_callback])
+                return
+            except Exception as e:
+                self.log.info('Unable to use inotify, falling back to '
+                              'polling: {}'.format(str(e)))
+                self._stop_notifier()
+                self.use_inotify = False
+
+        #-----------------------------------------------------------------------
+        # Fall back to polling
+        #-----------------------------------------------------------------------
+        self.sizes[path] = self._get_size(path)
+        if self.poll_loop is None:
+            self.poll_loop = LoopingCall(self._poll)
+            self.poll_loop.start(self.poll_interval, now=False)
+
+    #---------------------------------------------------------------------------
+    def _stop_watching(self, path):
+        if self.notifier is not None:
+            try:
+                self.notifier.ignore(FilePath(path))
+            except Exception:
+                pass  # the kernel may have dropped the watch already
+            if not self.callbacks:
+                self._stop_notifier()
+            return
+
+        del self.sizes[path]
+        if not self.callbacks and self.poll_loop is not None:
+            self.poll_loop.stop()
+            self.poll_loop = None
+
+    #---------------------------------------------------------------------------
+    def _stop_notifier(self):
+        if self.notifier is not None:
+            self.notifier.loseConnection()
+            self.notifier = None
+
+    #---------------------------------------------------------------------------
+    def _inotify_callback(self, ignored, filepath, mask):
+        self.notify(filepath.asTextMode().path)
+
+    #---------------------------------------------------------------------------
+    def _get_size(self, path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return None
+
+    #---------------------------------------------------------------------------
+    def _poll(self):
+        for path in list(self.sizes):
+            size = self._get_size(path)
+            if path in self.sizes and size != self.sizes[path]:
+                self.sizes[path] = size
+                self.notify(path)
+
+
+#-------------------------------------------------------------------------------
+class LiveLogFile:
+    """
+    Read the log of a running job from the beginning as it grows. The output
+    of a job past the first half of the cap of a
+    :class:`CappedLogFile <scrapy_do.utils.CappedLogFile>` goes to the
+    rotated sidecar files, and is only appended to the log when the job
+    finishes. Once the head of the log has been read, the reading continues
+    with the sidecar files, so that the reader keeps up with the output. The
+    data rotated out of the sidecar files before it could be read is skipped,
+    so the offsets past the head count the bytes read rather than the bytes
+    written by the job.
+
+    :param path: Path to the log file
+    """
+
+    #---------------------------------------------------------------------------
+    def __init__(self, path):
+        self.path = path
+        self.tail_path = path + CappedLogFile.TAIL_SUFFIX
+        self.rotated_path = self.tail_path + CappedLogFile.ROTATED_SUFFIX
+        self.file = open(path, 'rb')
+        self.offset = 0
+        self.spilled = False
+
+        #: Offset of the first byte of the file that is currently being read
+        self.base = 0
+
+    #---------------------------------------------------------------------------
+    def seek(self, offset, whence=os.SEEK_SET):
+        """
+        Change the position in the head of the log.
+
+        :return: The new offset
+        """
+        self.offset = self.file.seek(offset, whence)
+        return self.offset
+
+    #---------------------------------------------------------------------------
+    def seek_end(self):
+        """
+        Move past all the data written so far without reading it.
+
+        :return: The new offset
+        """
+        while True:
+            size = os.fstat(self.file.fileno()).st_size
+            self.offset = self.base + self.file.seek(size)
+            if not self._next_file():
+                return self.offset
+
+    #---------------------------------------------------------------------------
+    def read(self, size):
+        """
+        Read at most `size` bytes of the data written so far.
+        """
+        while True:
+            data = self.file.read(size)
+            if data:
+                self.offset += len(data)
+                return data
+            if not self._next_file():
+                return b''
+
+    #---------------------------------------------------------------------------
+    def pread(self, size, offset):
+        """
+        Read at most `size` bytes at the offset without changing the position.
+        Only the data of the file that is currently being read is available.
+        """
+        return os.pread(self.file.fileno(), size, offset - self.base)
+
+    #---------------------------------------------------------------------------
+    def _next_file(self):
+        next_file = self._get_next_file()
+        if next_file is None:
+            return False
+        self.file.close()
+        self.file = next_file
+        self.base = self.offset
+        self.spilled = True
+        return True
+
+    #---------------------------------------------------------------------------
+    def _get_next_file(self):
+        #-----------------------------------------------------------------------
+        # The sidecar file exists only until the job finishes, so the log
+        # itself is read to the end if there is none
+        #-----------------------------------------------------------------------
+        tail_inode = self._get_inode(self.tail_path)
+        if tail_inode is None:
+            return None
+        current_inode = os.fstat(self.file.fileno()).st_ino
+        if tail_inode == current_inode:
+            return None
+
+        #-----------------------------------------------------------------------
+        # Read the rotated sidecar file first, unless it's the one that has
+        # just been finished, ie. when the reader lags behind
+        #-----------------------------------------------------------------------
+        path = self.tail_path
+        rotated_inode = self._get_inode(self.rotated_path)
+        if not self.spilled and rotated_inode is not None:
+            path = self.rotated_path
+        elif rotated_inode not in (None, current_inode):
+            path = self.rotated_path
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+    #---------------------------------------------------------------------------
+    def _get_inode(self, path):
+        try:
+            return os.stat(path).st_ino
+        except FileNotFoundError:
+            return None
+
+    #---------------------------------------------------------------------------
+    def close(self):
+        """
+        Close the file.
+        """
+        self.file.close()
+
+
+#-------------------------------------------------------------------------------
+@implementer(IPushProducer)
+class LogFileProducer:
+    """
+    Stream a log file to an HTTP request in chunks of bounded size, respecting
+    the back pressure exerted by the request. If the job writing the log is
+    still running when the end of the file is reached, the producer waits for
+    a notification from the :class:`LogWatcher <LogWatcher>` and continues
+    until the job finishes. An uncompressed log streamed to the end is read
+    with :class:`LiveLogFile <LiveLogFile>`, so that the output past the head
+    of a capped log is streamed as well.
+
+    :param request:    A `twisted.web.server.Request` object
+    :param path:       Path to the log file
+    :param watcher:    A :class:`LogWatcher <LogWatcher>` object
+    :param is_running: A callable returning `True` if the job writing the log
+                       is still running
+    :param start:      Offset to start streaming at
+    :param end:        Offset to stop streaming at, exclusive; the log is
+                       not followed past the end if it's specified
+    :param decompress: Decompress a compressed log on the fly, the offsets
+                       refer to the decompressed data in this case
+    :param log_file:   A file object already positioned at the start, ie. by
+                       :func:`open_log_at` in a thread; the producer opens
+                       the file itself if it's `None`
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    #---------------------------------------------------------------------------
+    def __init__(self, request, path, watcher, is_running, start=0, end=None,
+                 decompress=True, log_file=None):
+        self.request = request
+        self.path = path
+        self.watcher = watcher
+        self.is_running = is_running
+        self.offset = start
+        self.end = end
+        self.decompress = decompress
+        self.file = log_file
+        self.paused = False
+        self.producing = False
+        self.finished = False
+        self.written = 0
+        self.done = Deferred()
+
+    #---------------------------------------------------------------------------
+    def start(self):
+        """
+        Open the file and start streaming.
+
+        :return:        A deferred triggered when the streaming is done
+        :raises OSError: If the file cannot be opened
+        """
+        if self.file is None:
+            self.file = self._open()
+            self.file.seek(self.offset)
+        self.request.registerProducer(self, True)
+        self.request.notifyFinish().addErrback(lambda _: self.stopProducing())
+        self.watcher.watch(self.path, self._changed)
+        self._produce()
+        return self.done
+
+    #---------------------------------------------------------------------------
+    def _open(self):
+        if self.end is None and get_compression(self.path) is None:
+            return LiveLogFile(self.path)
+        if self.decompress:
+            return open_log(self.path)
+        return open(self.path, 'rb')
+
+    #---------------------------------------------------------------------------
+    def _changed(self):
+        if not self.paused:
+            self._produce()
+
+    #---------------------------------------------------------------------------
+    def _produce(self):
+        #-----------------------------------------------------------------------
+        # Writing to the request may pause or resume the producer
+        # synchronously, so make sure the loop is not re-entered
+        #-----------------------------------------------------------------------
+        if self.producing:
+            return
+        self.producing = True
+        try:
+            while not self.paused and not self.finished:
+                size = self.CHUNK_SIZE
+                if self.end is not None:
+                    size = min(size, self.end - self.offset)
+                    if size <= 0:
+                        self._finish()
+                        break
+                data = self.file.read(size)
+                if data:
+                    self.offset += len(data)
+                    self.written += len(data)
+                    self.request.write(data)
+                    continue
+                if self.end is not None or not self.is_running():
+                    self._finish()
+                break
+        except Exception:
+            if not self.written:
+                self.request.setResponseCode(500)
+            self._finish()
+        finally:
+            self.producing = False
+
+    #---------------------------------------------------------------------------
+    def _clean_up(self):
+        self.finished = True
+        self.watcher.unwatch(self.path, self._changed)
+        self.file.close()
+
+    #---------------------------------------------------------------------------
+    def _finish(self):
+        self._clean_up()
+        self.request.unregisterProducer()
+        self.request.finish()
+        self.done.callback(None)
+
+    #---------------------------------------------------------------------------
+    def pauseProducing(self):
+        """
+        Stop producing until resumed, called by the consumer.
+        """
+        self.paused = True
+
+    #---------------------------------------------------------------------------
+    def resumeProducing(self):
+        """
+        Resume producing, called by the consumer.
+        """
+        self.paused = False
+        if not self.finished:
+            self._produce()
+
+    #---------------------------------------------------------------------------
+    def stopProducing(self):
+        """
+        Stop producing for good, ie. when the connection is lost.
+        """
+        if self.finished:
+            return
+        self._clean_up()
+        self.done.callback(None)
+
+
+#-------------------------------------------------------------------------------
+class LogFollower:
+    """
+    Read the log file of a running job as it grows and fan the new data out
+    to all of the subscribers, so that the file is watched and read once
+    regardless of their number. The data is decoded as UTF-8, never splitting
+    a character between two chunks. The log is read with
+    :class:`LiveLogFile <LiveLogFile>`, so the output of a job past the head
+    of a capped log is followed as well. When the job finishes, the
+    subscribers are notified and the follower closes.
+
+    :param path:       Path to the log file
+    :param watcher:    A :class:`LogWatcher <LogWatcher>` object
+    :param is_running: A callable returning `True` if the job writing the log
+                       is still running
+    :param on_close:   A callable taking the follower as a parameter, called
+                       when the follower closes
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    #: Maximum amount of the past data sent to a new subscriber
+    BACKLOG_SIZE = 256 * 1024
+
+    #---------------------------------------------------------------------------
+    def __init__(self, path, watcher, is_running, on_close=None):
+        self.path = path
+        self.watcher = watcher
+        self.is_running = is_running
+        self.on_close = on_close
+        self.subscribers = collections.OrderedDict()
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.closed = False
+        self.file = LiveLogFile(path)
+        self.offset = self.file.seek_end()
+        self.watcher.watch(self.path, self._read)
+
+    #---------------------------------------------------------------------------
+    def subscribe(self, key, on_data, on_end, offset=None):
+        """
+        Start sending the data to a new subscriber. The data written before
+        the subscription, but no more than :data:`BACKLOG_SIZE` bytes of it, is
+        sent right away.
+
+        :param key:     A hashable identifying the subscriber
+        :param on_data: A callable taking the offset of the data and the data
+        :param on_end:  A callable taking no parameters, called when the job
+                        finishes
+        :param offset:  Offset to start at, the latest backlog if `None`
+        :return:        Offset of the first byte sent to the subscriber
+        """
+        end = self.offset - len(self.decoder.getstate()[0])
+        start = 0 if offset is None else offset
+        start = min(max(start, end - self.BACKLOG_SIZE, self.file.base), end)
+        if start < end:
+            data = self.file.pread(end - start, start)
+            on_data(start, data.decode('utf-8', 'replace'))
+
+        self.subscribers[key] = (on_data, on_end)
+        self._read()
+        return start
+
+    #---------------------------------------------------------------------------
+    def unsubscribe(self, key):
+        """
+        Stop sending the data to a subscriber. The follower closes when there
+        are no subscribers left.
+        """
+        self.subscribers.pop(key, None)
+        if not self.subscribers:
+            self._close()
+
+    #---------------------------------------------------------------------------
+    def _read(self):
+        if self.closed:
+            return
+
+        while True:
+            data = self.file.read(self.CHUNK_SIZE)
+            if not data:
+                break
+            start = self.offset - len(self.decoder.getstate()[0])
+            self.offset += len(data)
+            self._send(start, self.decoder.decode(data))
+
+        if self.is_running():
+            return
+
+        start = self.offset - len(self.decoder.getstate()[0])
+        self._send(start, self.decoder.decode(b'', True))
+        for _, on_end in list(self.subscribers.values()):
+            on_end()
+        self._close()
+
+    #---------------------------------------------------------------------------
+    def _send(self, start, text):
+        if not text:
+            return
+        for on_data, _ in list(self.subscribers.values()):
+            on_data(start, text)
+
+    #---------------------------------------------------------------------------
+    def _close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.subscribers.clear()
+        self.watcher.unwatch(self.path, self._read)
+        self.file.close()
+        if self.on_close is not None:
+            self.on_close(self)
+
+
+#-------------------------------------------------------------------------------
+def tail_offset(path, lines, block_size=64 * 1024):
+    """
+    Find the offset at which the last lines of the file start. The file is
+    scanned backwards block by block, so only the tail of the file is read.
+
+    :param path:       Path to the file
+    :param lines:      Number of lines
+    :param block_size: Size of the blocks to read
+    :return:           Offset of the first of the last `lines` lines
+    """
+    if get_compression(path) is not None:
+        return _tail_offset_forward(path, lines, block_size)
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if lines <= 0:
+            return size
+
+        #-----------------------------------------------------------------------
+        # The newline terminating the last line does not start a new one
+        #-----------------------------------------------------------------------
+        end = size
+        if size:
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                end -= 1
+
+        newlines = 0
+        position = end
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            index = len(block)
+            while True:
+                index = block.rfind(b'\n', 0, index)
+                if index == -1:
+                    break
+                newlines += 1
+                if newlines == lines:
+                    return position + index + 1
+        return 0
+
+
+#-------------------------------------------------------------------------------
+def _tail_offset_forward(path, lines, block_size):
+    #---------------------------------------------------------------------------
+    # Compressed streams cannot be read backwards, so remember the offsets of
+    # the last line starts while decompressing the whole thing
+    #---------------------------------------------------------------------------
+    starts = collections.deque([0], maxlen=max(lines, 0) + 1)
+    offset = 0
+    last = b''
+    with open_log(path) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            index = block.find(b'\n')
+            while index != -1:
+                starts.append(offset + index + 1)
+                index = block.find(b'\n', index + 1)
+            offset += len(block)
+            last = block[-1:]
+
+    if lines <= 0:
+        return offset
+
+    #---------------------------------------------------------------------------
+    # The newline terminating the last line does not start a new one
+    #---------------------------------------------------------------------------
+    if last == b'\n':
+        starts.pop()
+    if len(starts) < lines:
+        return 0
+    return starts[-lines]
+
+
+#-------------------------------------------------------------------------------
+def parse_range(header, size):
+    """
+    Parse the value of an HTTP `Range` header. Only single byte ranges are
+    supported.
+
+    :param header: Value of the header, ie. `bytes=0-499`
+    :param size:   Size of the resource
+    :return:       A tuple containing the first offset of the range and
+                   the offset following the last one
+    :raises ValueError: If the range is malformed or cannot be satisfied
+    """
+    match = re.match(r'^bytes=(\d*)-(\d*)$', header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        raise ValueError('Malformed range: {}'.format(header))
+
+    first, last = match.group(1), match.group(2)
+    if first == '':
+        start = max(0, size - int(last))
+        end = size
+    else:
+        start = int(first)
+        end = size if last == '' else min(int(last) + 1, size)
+
+    if start >= size or start >= end:
+        raise ValueError('Unsatisfiable range: {}'.format(header))
+    return start, end
+
+
+#-------------------------------------------------------------------------------
+def accepts_encoding(header, encoding):
+    """
+    Check whether the value of an HTTP `Accept-Encoding` header allows for the
+    given content encoding.
+
+    :param header:   Value of the header or `None`
+    :param encoding: Name of the encoding, ie. `gzip`
+    """
+    if not header:
+        return False
+
+    for item in header.split(','):
+        params = [p.strip() for p in item.split(';')]
+        if params[0].lower() not in [encoding, '*']:
+            continue
+        quality = 1.
+        for param in params[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.
+        if quality > 0:
+            return True
+    return False
+
+
+#-------------------------------------------------------------------------------
+def get_compression(path):
+    """
+    Get the compression method of a log file based on its suffix.
+
+    :param path: Path to the log file
+    :return:     Name of the compression method or `None` if the file is
+                 not compressed
+    """
+    for method, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return method
+    return None
+
+
+#-------------------------------------------------------------------------------
+def find_log(path):
+    """
+    Find a log file that may have been compressed.
+
+    :param path: Path to the uncompressed log file
+    :return:     Path to the uncompressed log file if it exists, a path to
+                 the compressed one otherwise, or `None` if there is none
+    """
+    for suffix in [''] + list(COMPRESSION_SUFFIXES.values()):
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return None
+
+
+#-------------------------------------------------------------------------------
+class ZstdLogReader(io.RawIOBase):
+    """
+    A raw stream of the data of a zstd-compressed log. Unlike the zstandard
+    stream reader, it can be buffered with :class:`io.BufferedReader`, which
+    makes it possible to read the log line by line. The decompressed data can
+    only be seeked forward.
+
+    :param path: Path to the log file
+    """
+
+    #---------------------------------------------------------------------------
+    def __init__(self, path):
+        self.reader = zstandard.open(path, 'rb')
+
+    #---------------------------------------------------------------------------
+    def readable(self):
+        return True
+
+    #---------------------------------------------------------------------------
+    def seekable(self):
+        return True
+
+    #---------------------------------------------------------------------------
+    def readinto(self, buffer):
+        data = self.reader.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    #---------------------------------------------------------------------------
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.reader.seek(offset, whence)
+
+    #---------------------------------------------------------------------------
+    def tell(self):
+        return self.reader.tell()
+
+    #---------------------------------------------------------------------------
+    def close(self):
+        if not self.closed:
+            self.reader.close()
+        super().close()
+
+
+#-------------------------------------------------------------------------------
+def open_log(path):
+    """
+    Open a log file for reading, decompressing it on the fly if necessary.
+
+    :param path: Path to the log file
+    :return:     A binary file object
+    """
+    method = get_compression(path)
+    if method == 'gzip':
+        return gzip.open(path, 'rb')
+    if method == 'zstd':
+        if zstandard is None:
+            raise ValueError('The zstandard module is not available')
+        return io.BufferedReader(ZstdLogReader(path))
+    return open(path, 'rb')
+
+
+#-------------------------------------------------------------------------------
+def open_log_at(path, offset=0, lines=None):
+    """
+    Open a log file for reading, decompressing it on the fly if necessary,
+    and move either to the offset or to the beginning of the last lines.
+    Moving through a compressed log requires decompressing everything up to
+    the position, so this function should be called in a thread in this
+    case. The number of lines of a compressed log is taken from its index if
+    there is one, so that the log does not need to be decompressed twice.
+
+    :param path:   Path to the log file
+    :param offset: Offset to move to
+    :param lines:  Number of the last lines to move to the beginning of; the
+                   offset is ignored if it's specified
+    :return:       A tuple of the file object and the offset
+    """
+    if lines is not None:
+        index = None
+        if get_compression(path) is not None:
+            index = load_log_index(path)
+        if index is None:
+            offset = tail_offset(path, lines)
+            lines = None
+
+    f = open_log(path)
+    try:
+        if lines is None:
+            f.seek(offset)
+            return f, offset
+
+        skip = max(index['lines'] - max(lines, 0), 0)
+        collections.deque(itertools.islice(f, skip), maxlen=0)
+        return f, f.tell()
+    except Exception:
+        f.close()
+        raise
+
+
+#-------------------------------------------------------------------------------
+def get_log_size(path):
+    """
+    Get the size of the log data. The size of a compressed log is taken from
+    its index if there is one, otherwise the log is decompressed.
+
+    :param path: Path to the log file
+    :return:     Size of the log data in bytes
+    """
+    if get_compression(path) is None:
+        return os.path.getsize(path)
+
+    index = load_log_index(path)
+    if index is not None:
+        return index['size']
+
+    size = 0
+    with open_log(path) as f:
+        while True:
+            block = f.read(LogFileProducer.CHUNK_SIZE)
+            if not block:
+                return size
+            size += len(block)
+
+
+#-------------------------------------------------------------------------------
+def compress_log(path, method):
+    """
+    Compress a log file and remove the original. The data is written to
+    a temporary file first, so a partially compressed log is never visible
+    under the final name. This function blocks, so it should be called
+    in a thread.
+
+    :param path:   Path to the log file
+    :param method: Name of the compression method, `gzip` or `zstd`
+    :return:       Path to the compressed log file
+    """
+    if method not in COMPRESSION_SUFFIXES:
+        raise ValueError('Unknown compression method: {}'.format(method))
+
+    compressed_path = path + COMPRESSION_SUFFIXES[method]
+    temp_path = compressed_path + '.tmp'
+    try:
+        with open(path, 'rb') as src:
+            if method == 'gzip':
+                with gzip.open(temp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            else:
+                if zstandard is None:
+                    raise ValueError('The zstandard module is not available')
+                with open(temp_path, 'wb') as dst:
+                    zstandard.ZstdCompressor().copy_stream(src, dst)
+        os.rename(temp_path, compressed_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    os.remove(path)
+    return compressed_path
+
+
+#-------------------------------------------------------------------------------
+def get_index_path(path):
+    """
+    Get the path to the index of a log file, the same for the uncompressed
+    and the compressed log.
+    """
+    method = get_compression(path)
+    if method is not None:
+        path = path[:-len(COMPRESSION_SUFFIXES[method])]
+    return path + '.idx'
+
+
+#-------------------------------------------------------------------------------
+def build_log_index(path):
+    """
+    Build an index of a complete log file and store it next to the log. The
+    index holds the size of the log, the number of lines, as well as the
+    number and the positions of the `WARNING`, `ERROR`, and `CRITICAL` lines.
+    This function blocks, so it should be called in a thread.
+
+    :param path: Path to the log file
+    :return:     The index
+    """
+    levels = {level: {'count': 0, 'lines': []} for level in LOG_LEVELS}
+    offset = 0
+    lineno = 0
+    with open_log(path) as f:
+        for line in f:
+            lineno += 1
+            match = LOG_LEVEL_RE.search(line.decode('utf-8', 'replace'))
+            if match:
+                level = levels[match.group(1)]
+                level['count'] += 1
+                if len(level['lines']) < MAX_INDEX_POSITIONS:
+                    level['lines'].append([lineno, offset])
+            offset += len(line)
+
+    index = {'size': offset, 'lines': lineno, 'levels': levels}
+    with open(get_index_path(path), 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+#-------------------------------------------------------------------------------
+def load_log_index(path):
+    """
+    Load the index of a log file.
+
+    :param path: Path to the log file
+    :return:     The index or `None` if it does not exist or is unreadable
+    """
+    try:
+        with open(get_index_path(path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+#-------------------------------------------------------------------------------
+def search_log(path, pattern=None, level=None, limit=1000):
+    """
+    Find the lines of a log file matching the criteria. If the minimum
+    severity is specified and the log has a complete index, only the lines
+    listed in the index are read. This function blocks, so it should be
+    called in a thread.
+
+    :param path:    Path to the log file
+    :param pattern: A compiled regular expression the lines need to match
+    :param level:   Minimum severity of the lines, one of :data:`LOG_LEVELS`
+    :param limit:   Maximum number of matches to return
+    :return:        A list of dictionaries with the `line` number, the byte
+                    `offset`, and the `text` of the matching lines
+    """
+    matches = []
+    levels = LOG_LEVELS[LOG_LEVELS.index(level):] if level else []
+
+    def check(lineno, offset, line):
+        text = line.decode('utf-8', 'replace').rstrip('\n')
+        if levels:
+            match = LOG_LEVEL_RE.search(text)
+            if not match or match.group(1) not in levels:
+                return
+        if pattern is not None and not pattern.search(text):
+            return
+        matches.append({'line': lineno, 'offset': offset, 'text': text})
+
+    #---------------------------------------------------------------------------
+    # Use the index if possible
+    #---------------------------------------------------------------------------
+    index = load_log_index(path) if levels else None
+    if index is not None:
+        entries = [index['levels'][x] for x in levels]
+        if all(x['count'] == len(x['lines']) for x in entries):
+            positions = sorted([p for x in entries for p in x['lines']])
+            with open_log(path) as f:
+                for lineno, offset in positions:
+                    if len(matches) >= limit:
+                        break
+                    f.seek(offset)
+                    check(lineno, offset, f.readline())
+            return matches
+
+    #---------------------------------------------------------------------------
+    # Scan the whole log otherwise
+    #---------------------------------------------------------------------------
+    offset = 0
+    with open_log(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if len(matches) >= limit:
+                break
+            check(lineno, offset, line)
+            offset += len(line)
+    return matches
+
+
+#-------------------------------------------------------------------------------
+def read_log_tail(path, offset=None, size=LogFollower.BACKLOG_SIZE):
+    """
+    Read the end of a log file, decompressing it if necessary. This function
+    blocks, so it should be called in a thread.
+
+    :param path:   Path to the log file
+    :param offset: Offset to start reading at, the last `size` bytes are read
+                   if it's `None`
+    :param size:   Maximum number of bytes to read
+    :return:       A tuple containing the offset of the data and the data
+    """
+    total = get_log_size(path)
+    start = 0 if offset is None else offset
+    start = min(max(start, total - size, 0), total)
+    with open_log(path) as f:
+        f.seek(start)
+        return start, f.read(total - start)
+
+
+#-------------------------------------------------------------------------------
+def parse_stats_dump(text):
+    """
+    Parse the stats dictionary that Scrapy dumps at the end of a crawl. Only
+    the last dump in the text is taken into account. The values that are not
+    plain literals, like the timestamps, are stored as strings.
+
+    :param text: Contents of the log
+    :return:     A dictionary of stats or `None` if there is no complete dump
+    """
+    position = text.rfind(STATS_MARKER)
+    if position == -1:
+        return None
+
+    #---------------------------------------------------------------------------
+    # Find the dictionary
+    #---------------------------------------------------------------------------
+    lines = text[position + len(STATS_MARKER):].lstrip('\r\n').splitlines()
+    block = []
+    for line in lines:
+        block.append(line)
+        if line.rstrip().endswith('}'):
+            break
+    else:
+        return None
+
+    block = '\n'.join(block)
+    block = re.sub(r'datetime\.\w+\([^)]*\)',
+                   lambda m: repr(m.group(0)), block)
+    try:
+        stats = ast.literal_eval(block)
+    except (ValueError, SyntaxError):
+        return None
+    return stats if isinstance(stats, dict) else None
+
+
+#-------------------------------------------------------------------------------
+def get_metrics(path):
+    """
+    Extract the key metrics of a job, like the number of scraped items and
+    the finish reason, from the stats dumped by Scrapy to the log. Only the
+    end of the log is read. This function blocks, so it should be called in
+    a thread.
+
+    :param path: Path to the log file
+    :return:     A dictionary of metrics, empty if there is no stats dump
+    """
+    _, data = read_log_tail(path, size=STATS_SCAN_SIZE)
+    stats = parse_stats_dump(data.decode('utf-8', 'replace'))
+    if stats is None:
+        return {}
+
+    metrics = {}
+    for key, value in stats.items():
+        if key in METRIC_KEYS or \
+                any(key.startswith(prefix) for prefix in METRIC_PREFIXES):
+            metrics[key] = value
+    return metrics
+
+
+#-------------------------------------------------------------------------------
+class LogRetention:
+    """
+    Keep the logs in a directory within a total byte budget and remove the
+    ones older than the max age. The item feeds of the jobs, if a directory
+    holding them is given, count towards the budget as well. All the files
+    belonging to a job are evicted together, the least recently used jobs
+    first. A job is considered used when any of its files has last been
+    modified or read. At most :data:`BATCH_SIZE <LogRetention.BATCH_SIZE>`
+    jobs are evicted in one pass, so that a large backlog is worked through
+    incrementally.
+
+    The passes block, so they should be run in a thread.
+
+    :param log_dir:  The directory holding the logs
+    :param budget:   Maximum total size of the logs in bytes or `None`
+    :param max_age:  Maximum age of the logs in seconds or `None`
+    :param feed_dir: The directory holding the item feeds or `None`
+    """
+
+    BATCH_SIZE = 100
+
+    #---------------------------------------------------------------------------
+    def __init__(self, log_dir, budget=None, max_age=None, feed_dir=None):
+        self.log_dir = log_dir
+        self.feed_dir = feed_dir
+        self.budget = budget
+        self.max_age = max_age
+        self.usage = 0
+        self.evicted = 0
+
+    #---------------------------------------------------------------------------
+    def scan(self):
+        """
+        Find the log and feed files.
+
+        :return: A dictionary mapping job identifiers to lists holding the
+                 total size of the files of the job, the time they have
+                 last been used, and their paths
+        """
+        dirs = [(self.log_dir, LOG_FILE_RE)]
+        if self.feed_dir is not None:
+            dirs.append((self.feed_dir, FEED_FILE_RE))
+
+        jobs = {}
+        for directory, file_re in dirs:
+            for entry in os.scandir(directory):
+                match = file_re.match(entry.name)
+                if match is None or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                job = jobs.setdefault(match.group(1), [0, 0, []])
+                job[0] += st.st_size
+                job[1] = max(job[1], st.st_mtime, st.st_atime)
+                job[2].append(entry.path)
+        return jobs
+
+    #---------------------------------------------------------------------------
+    def enforce(self, protected=(), now=None):
+        """
+        Run one eviction pass and update the usage figures.
+
+        :param protected: Identifiers of the jobs whose logs must be kept,
+                          like the ones of the running jobs
+        :param now:       The current time as a POSIX timestamp
+        :return:          A list of identifiers of the evicted jobs
+        """
+        if now is None:
+            now = time.time()
+
+        jobs = self.scan()
+        usage = sum(job[0] for job in jobs.values())
+        candidates = sorted(
+            [(job[1], job_id) for job_id, job in jobs.items()
+             if job_id not in protected])
+
+        #-----------------------------------------------------------------------
+        # The candidates are sorted by age, so we are done as soon as we hit
+        # one that is neither expired nor needs to go to fit the budget
+        #-----------------------------------------------------------------------
+        evicted = []
+        for last_used, job_id in candidates:
+            if len(evicted) >= self.BATCH_SIZE:
+                break
+            expired = self.max_age is not None and \
+                now - last_used > self.max_age
+            over_budget = self.budget is not None and usage > self.budget
+            if not expired and not over_budget:
+                break
+
+            size, _, paths = jobs[job_id]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            usage -= size
+            evicted.append(job_id)
+
+        self.usage = usage
+        self.evicted += len(evicted)
+        return evicted
@@ -0,0 +1,127 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+"""
+Functionality related to sampling the resource usage of the daemon.
+"""
+
+import collections
+import psutil
+import time
+import os
+
+from twisted.internet.task import LoopingCall
+
+
+#-------------------------------------------------------------------------------
+class MetricsSampler:
+    """
+    Sample the resource usage of the daemon process and of the host on a fixed
+    cadence, and serve the most recent sample to everyone who asks. The CPU
+    usage figures are measured between two consecutive samples, so they
+    describe the last sampling interval. A short history of the samples is
+    kept for the dashboards.
+
+    Every sample is a dictionary holding:
+
+      * `timestamp` - the UNIX time when the sample has been taken
+      * `memory-usage` - the resident set size of the daemon in megabytes
+      * `cpu-usage` - the CPU usage of the daemon in percent
+      * `threads` - the number of threads of the daemon
+      * `open-files` - the number of file descriptors open by the daemon or
+        `None` if not available on the platform
+      * `host-cpu-usage` - the CPU usage of the host in percent
+      * `host-memory-usage` - the memory usage of the host in percent
+      * `load-average` - the 1, 5, and 15 minute load averages of the host or
+        `None` if not available on the platform
+
+    :param interval:     Time in seconds between the samples
+    :param history_size: Number of the most recent samples kept
+    :raises ValueError:  If any of the parameters is not positive
+    """
+
+    #---------------------------------------------------------------------------
+    def __init__(self, interval=5., history_size=120):
+        if interval <= 0:
+            raise ValueError('The metrics interval needs to be positive')
+        if history_size <= 0:
+            raise ValueError('The metrics history size needs to be positive')
+
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.history = collections.deque(maxlen=history_size)
+        self.snapshot = None
+        self.loop = LoopingCall(self.sample)
+
+        #-----------------------------------------------------------------------
+        # The first measurements of the CPU usage only start the clock
+        #-----------------------------------------------------------------------
+        self.process.cpu_percent(None)
+        psutil.cpu_percent(None)
+
+    #---------------------------------------------------------------------------
+    def start(self):
+        """
+        Start sampling.
+        """
+        self.loop.start(self.interval)
+
+    #---------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop sampling.
+        """
+        if self.loop.running:
+            self.loop.stop()
+
+    #---------------------------------------------------------------------------
+    def sample(self):
+        """
+        Take a sample and record it in the history.
+
+        :return: The sample dictionary
+        """
+        with self.process.oneshot():
+            memory = self.process.memory_info().rss
+            cpu = self.process.cpu_percent(None)
+            threads = self.process.num_threads()
+            open_files = None
+            if hasattr(self.process, 'num_fds'):
+                open_files = self.process.num_fds()
+
+        load_average = None
+        if hasattr(os, 'getloadavg'):
+            load_average = list(os.getloadavg())
+
+        self.snapshot = {
+            'timestamp': time.time(),
+            'memory-usage': float(memory) / 1024. / 1024.,
+            'cpu-usage': cpu,
+            'threads': threads,
+            'open-files': open_files,
+            'host-cpu-usage': psutil.cpu_percent(None),
+            'host-memory-usage': psutil.virtual_memory().percent,
+            'load-average': load_average
+        }
+        self.history.append(self.snapshot)
+        return self.snapshot
+
+    #---------------------------------------------------------------------------
+    def get_snapshot(self):
+        """
+        Get the most recent sample, taking the first one if necessary.
+        """
+        if self.snapshot is None:
+            return self.sample()
+        return self.snapshot
+
+    #---------------------------------------------------------------------------
+    def get_history(self):
+        """
+        Get the list of the most recent samples, the oldest first.
+        """
+        return list(self.history)
@@ -11,6 +11,7 @@ Functionality related to the database of jobs.
 
 import dateutil.parser
 import sqlite3
+import json
 import shutil
 import uuid
 
@@ -30,6 +31,7 @@ class Status(Enum):
     CANCELED = 4
     SUCCESSFUL = 5
     FAILED = 6
+    WAITING = 7
 
 
 #-------------------------------------------------------------------------------
@@ -44,7 +46,10 @@ class Actor(Enum):
 #-------------------------------------------------------------------------------
 class Job:
     """
-    A bin for all the parameters of a job.
+    A bin for all the parameters of a job. The `logs` attribute maps the types
+    of the logs of a finished job to their sizes; it's `None` until the job
+    finishes. The `feed` attribute describes the item feed of a finished job
+    by its file name and size; it's `None` if there is no feed.
     """
 
     status = TimeStamper('_status')
@@ -59,7 +64,8 @@ class Job:
     #---------------------------------------------------------------------------
     def __init__(self, status=None, actor=None, schedule=None,
                  project=None, spider=None, timestamp=None, duration=None,
-                 description='', payload='{}'):
+                 description='', payload='{}', dependencies=None, origin=None,
+                 attempt=1, retry='{}', metrics=None, logs=None, feed=None):
         self.identifier = str(uuid.uuid4())
 
         self._status = status
@@ -71,6 +77,13 @@ class Job:
         self.timestamp = timestamp or datetime.now()
         self._duration = duration
         self._payload = payload
+        self.dependencies = dependencies or []
+        self.origin = origin
+        self.attempt = attempt
+        self.retry = retry
+        self.metrics = metrics or {}
+        self.logs = logs
+        self.feed = feed
 
     #---------------------------------------------------------------------------
     def __str__(self):
@@ -95,20 +108,60 @@ class Job:
             'description': self.description,
             'timestamp': str(self.timestamp),
             'duration': self.duration,
-            'payload': self.payload
+            'payload': self.payload,
+            'dependencies': self.dependencies,
+            'origin': self.origin,
+            'attempt': self.attempt,
+            'retry': self.retry,
+            'metrics': self.metrics,
+            'logs': self.logs,
+            'feed': self.feed
         }
         return d
 
 
+#-------------------------------------------------------------------------------
+def _parse_timestamp(timestamp):
+    #---------------------------------------------------------------------------
+    # The timestamps are stored in the ISO format, so the fast parser should
+    # handle them; dateutil is only a fallback for anything unexpected
+    #---------------------------------------------------------------------------
+    try:
+        return datetime.fromisoformat(timestamp)
+    except ValueError:
+        return dateutil.parser.parse(timestamp)
+
+
 #-------------------------------------------------------------------------------
 def _record_to_job(x):
     job = Job(status=Status(x[1]), actor=Actor(x[2]), schedule=x[3],
-              project=x[4], spider=x[5], timestamp=dateutil.parser.parse(x[6]),
-              duration=x[7], description=x[8], payload=x[9])
+              project=x[4], spider=x[5], timestamp=_parse_timestamp(x[6]),
+              duration=x[7], description=x[8], payload=x[9],
+              dependencies=json.loads(x[10]), origin=x[11], attempt=x[12],
+              retry=x[13], metrics=json.loads(x[14]),
+              logs=json.loads(x[15]) if x[15] is not None else None,
+              feed=json.loads(x[16]) if x[16] is not None else None)
     job.identifier = x[0]
     return job
 
 
+#-------------------------------------------------------------------------------
+_COLUMNS = "(identifier, status, actor, schedule, project, spider, " \
+           "timestamp, duration, description, payload, dependencies, " \
+           "origin, attempt, retry, metrics, logs, feed) " \
+           "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+#-------------------------------------------------------------------------------
+def _job_to_record(job):
+    return (job.identifier, job.status.value, job.actor.value, job.schedule,
+            job.project, job.spider, job.timestamp, job.duration,
+            job.description, job.payload, json.dumps(job.dependencies),
+            job.origin, job.attempt, job.retry, json.dumps(job.metrics),
+            json.dumps(job.logs) if job.logs is not None else None,
+            json.dumps(job.feed) if job.feed is not None else None)
+
+
 #-------------------------------------------------------------------------------
 class Schedule:
     """
@@ -117,7 +170,8 @@ class Schedule:
     :param database: A file name where the database will be stored
     """
 
-    CURRENT_VERSION = 2
+    CURRENT_VERSION = 7
+    SORT_KEYS = ['timestamp', 'duration', 'project', 'spider', 'status']
 
     #---------------------------------------------------------------------------
     def __init__(self, database=None):
@@ -158,6 +212,45 @@ class Schedule:
         self.db.execute(query)
         self.db.commit()
 
+    #---------------------------------------------------------------------------
+    def _upgrade_v2_to_v3(self):
+        query = 'ALTER TABLE schedule ADD dependencies VARCHAR(4096) '
+        query += 'DEFAULT "[]" NOT NULL;'
+        self.db.execute(query)
+        self.db.commit()
+
+    #---------------------------------------------------------------------------
+    def _upgrade_v3_to_v4(self):
+        query = 'ALTER TABLE schedule ADD origin VARCHAR(36);'
+        self.db.execute(query)
+
+        query = 'ALTER TABLE schedule ADD attempt INTEGER DEFAULT 1 NOT NULL;'
+        self.db.execute(query)
+
+        query = 'ALTER TABLE schedule ADD retry VARCHAR(1024) DEFAULT "{}" '
+        query += 'NOT NULL;'
+        self.db.execute(query)
+        self.db.commit()
+
+    #---------------------------------------------------------------------------
+    def _upgrade_v4_to_v5(self):
+        query = 'ALTER TABLE schedule ADD metrics VARCHAR(4096) DEFAULT "{}" '
+        query += 'NOT NULL;'
+        self.db.execute(query)
+        self.db.commit()
+
+    #---------------------------------------------------------------------------
+    def _upgrade_v5_to_v6(self):
+        query = 'ALTER TABLE schedule ADD logs VARCHAR(256);'
+        self.db.execute(query)
+        self.db.commit()
+
+    #---------------------------------------------------------------------------
+    def _upgrade_v6_to_v7(self):
+        query = 'ALTER TABLE schedule ADD feed VARCHAR(256);'
+        self.db.execute(query)
+        self.db.commit()
+
     #---------------------------------------------------------------------------
     def _open_database(self, version):
         bak_file = self.database + '.bak.'
@@ -165,6 +258,11 @@ class Schedule:
         shutil.copyfile(self.database, bak_file)
         upgraders = {}
         upgraders[1] = self._upgrade_v1_to_v2
+        upgraders[2] = self._upgrade_v2_to_v3
+        upgraders[3] = self._upgrade_v3_to_v4
+        upgraders[4] = self._upgrade_v4_to_v5
+        upgraders[5] = self._upgrade_v5_to_v6
+        upgraders[6] = self._upgrade_v6_to_v7
         for v in range(version, self.CURRENT_VERSION):
             upgraders[v]()
 
@@ -193,7 +291,14 @@ class Schedule:
                 "timestamp DATETIME NOT NULL, " \
                 "duration INTEGER," \
                 "description VARCHAR(512) NOT NULL," \
-                "payload VARCHAR(4096) NOT NULL" \
+                "payload VARCHAR(4096) NOT NULL," \
+                "dependencies VARCHAR(4096) NOT NULL," \
+                "origin VARCHAR(36)," \
+                "attempt INTEGER NOT NULL," \
+                "retry VARCHAR(1024) NOT NULL," \
+                "metrics VARCHAR(4096) NOT NULL," \
+                "logs VARCHAR(256)," \
+                "feed VARCHAR(256)" \
                 ")"
         self.db.execute(query)
         self.db.commit()
@@ -219,15 +324,45 @@ class Schedule:
         response = self.db.execute(query, (job_status.value, ))
         return [_record_to_job(rec) for rec in response]
 
+    #---------------------------------------------------------------------------
+    def get_jobs_chunk(self, job_status, after=None, limit=1000):
+        """
+        Retrieve a chunk of jobs with a given status ordered by their
+        identifiers. Pass the identifier of the last job of the previous
+        chunk as `after` to get the next chunk.
+
+        :param job_status: One of :class:`statuses <Status>`
+        :param after:      Identifier of the last job of the previous chunk or
+                           `None` to get the first chunk
+        :param limit:      Maximum number of jobs in the chunk
+        """
+        query = "SELECT * FROM schedule WHERE status=? AND identifier>? " \
+                "ORDER BY identifier ASC LIMIT ?"
+        response = self.db.execute(query, (job_status.value, after or '',
+                                           limit))
+        return [_record_to_job(rec) for rec in response]
+
+    #---------------------------------------------------------------------------
+    def count_jobs(self, job_status):
+        """
+        Count the jobs with a given status
+
+        :param job_status: One of :class:`statuses <Status>`
+        """
+        query = "SELECT COUNT(*) FROM schedule WHERE status=?"
+        response = self.db.execute(query, (job_status.value, ))
+        return response.fetchone()[0]
+
     #---------------------------------------------------------------------------
     def get_active_jobs(self):
         """
         Retrieve all the active jobs. Ie. all the jobs whose status is one of
         the following: :data:`SCHEDULED <Status.SCHEDULED>`,
-        :data:`PENDING <Status.PENDING>`, or :data:`RUNNING <Status.RUNNING>`.
+        :data:`PENDING <Status.PENDING>`, :data:`RUNNING <Status.RUNNING>`,
+        or :data:`WAITING <Status.WAITING>`.
         """
         query = "SELECT * FROM schedule WHERE " \
-                "status=1 OR status=2 OR status=3 "\
+                "status=1 OR status=2 OR status=3 OR status=7 "\
                 "ORDER BY timestamp DESC"
         response = self.db.execute(query)
         return [_record_to_job(rec) for rec in response]
@@ -245,6 +380,57 @@ class Schedule:
         response = self.db.execute(query)
         return [_record_to_job(rec) for rec in response]
 
+    #---------------------------------------------------------------------------
+    def get_jobs_window(self, statuses, offset=0, limit=100, sort='timestamp',
+                        descending=True, project=None, spider=None,
+                        projects=None):
+        """
+        Retrieve a page of the jobs with the given statuses.
+
+        :param statuses:   A list of :class:`statuses <Status>`
+        :param offset:     The number of jobs to skip
+        :param limit:      The maximum number of jobs in the page
+        :param sort:       The column to sort the jobs by, one of
+                           :data:`SORT_KEYS <Schedule.SORT_KEYS>`
+        :param descending: Sort the jobs in the descending order
+        :param project:    Only take the jobs of this project into account
+        :param spider:     Only take the jobs of this spider into account
+        :param projects:   Only take the jobs of these projects into account
+        :return:           A tuple containing the list of jobs in the page and
+                           the total number of jobs matching the filters
+        :raises ValueError: If the sort key is unknown
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError('Unknown sort key: {}.'.format(sort))
+
+        conditions = ['status IN ({})'.format(', '.join('?' * len(statuses)))]
+        params = [status.value for status in statuses]
+        if project is not None:
+            conditions.append('project=?')
+            params.append(project)
+        if spider is not None:
+            conditions.append('spider=?')
+            params.append(spider)
+        if projects is not None:
+            projects = list(projects)
+            conditions.append('project IN ({})'.format(
+                ', '.join('?' * len(projects))))
+            params += projects
+        where = ' AND '.join(conditions)
+
+        query = "SELECT COUNT(*) FROM schedule WHERE " + where
+        total = self.db.execute(query, params).fetchone()[0]
+
+        #-----------------------------------------------------------------------
+        # Break the ties with the identifier so that the pages are stable
+        #-----------------------------------------------------------------------
+        order = 'DESC' if descending else 'ASC'
+        query = "SELECT * FROM schedule WHERE {} " \
+                "ORDER BY {} {}, identifier {} LIMIT ? OFFSET ?"
+        query = query.format(where, sort, order, order)
+        response = self.db.execute(query, params + [limit, offset])
+        return [_record_to_job(rec) for rec in response], total
+
     #---------------------------------------------------------------------------
     def get_scheduled_jobs(self, project):
         """
@@ -256,6 +442,32 @@ class Schedule:
         response = self.db.execute(query, (project, ))
         return [_record_to_job(rec) for rec in response]
 
+    #---------------------------------------------------------------------------
+    def get_dependants(self, identifier):
+        """
+        Retrieve all the :data:`WAITING <Status.WAITING>` jobs depending on
+        the job with the given identifier.
+
+        :param identifier: A string identifier of the upstream job
+        """
+        query = "SELECT * FROM schedule WHERE " \
+                "status=7 AND dependencies LIKE ? " \
+                "ORDER BY timestamp DESC"
+        response = self.db.execute(query, ('%"{}"%'.format(identifier), ))
+        jobs = [_record_to_job(rec) for rec in response]
+        return [job for job in jobs if identifier in job.dependencies]
+
+    #---------------------------------------------------------------------------
+    def get_attempts(self, origin):
+        """
+        Retrieve all the retry attempts of a job.
+
+        :param origin: A string identifier of the job that was retried
+        """
+        query = "SELECT * FROM schedule WHERE origin=? ORDER BY attempt ASC"
+        response = self.db.execute(query, (origin, ))
+        return [_record_to_job(rec) for rec in response]
+
     #---------------------------------------------------------------------------
     def get_job(self, identifier):
         """
@@ -277,16 +489,23 @@ class Schedule:
 
         :param job: A :class:`Job <Job>` object
         """
-        query = "INSERT INTO schedule" \
-                "(identifier, status, actor, schedule, project, spider, " \
-                "timestamp, duration, description, payload) " \
-                "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        self.db.execute(query, (job.identifier, job.status.value,
-                                job.actor.value, job.schedule, job.project,
-                                job.spider, job.timestamp, job.duration,
-                                job.description, job.payload))
+        query = "INSERT INTO schedule" + _COLUMNS
+        self.db.execute(query, _job_to_record(job))
         self.db.commit()
 
+    #---------------------------------------------------------------------------
+    def add_jobs(self, jobs):
+        """
+        Add multiple jobs to the database in a single transaction. Either all
+        of the jobs are stored or none of them is.
+
+        :param jobs: A list of :class:`Job <Job>` objects
+        """
+        query = "INSERT INTO schedule" + _COLUMNS
+        records = [_job_to_record(job) for job in jobs]
+        with self.db:
+            self.db.executemany(query, records)
+
     #---------------------------------------------------------------------------
     def commit_job(self, job):
         """
@@ -294,14 +513,8 @@ class Schedule:
 
         :param job: A :class:`Job <Job>` object
         """
-        query = "REPLACE INTO schedule" \
-                "(identifier, status, actor, schedule, project, spider, " \
-                "timestamp, duration, description, payload) " \
-                "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        self.db.execute(query, (job.identifier, job.status.value,
-                                job.actor.value, job.schedule, job.project,
-                                job.spider, job.timestamp, job.duration,
-                                job.description, job.payload))
+        query = "REPLACE INTO schedule" + _COLUMNS
+        self.db.execute(query, _job_to_record(job))
         self.db.commit()
 
     #---------------------------------------------------------------------------
@@ -85,8 +85,18 @@ class TimeStamper:
         return setattr(obj, self.attr_name, value)
 
 
+#-------------------------------------------------------------------------------
+_directive_maps = {}
+
+
 #-------------------------------------------------------------------------------
 def _build_directive_map(job):
+    #---------------------------------------------------------------------------
+    # The map depends only on the class of the job, so it's computed once
+    #---------------------------------------------------------------------------
+    if job.__class__ in _directive_maps:
+        return _directive_maps[job.__class__]
+
     #---------------------------------------------------------------------------
     # A list of valid directives
     #---------------------------------------------------------------------------
@@ -113,6 +123,7 @@ def _build_directive_map(job):
     for d in directive_names:
         directive_map[d] = get_attr(job, d)
 
+    _directive_maps[job.__class__] = directive_map
     return directive_map
 
 
@@ -257,6 +268,160 @@ def twisted_sleep(time):
     return task.deferLater(reactor, time, lambda: None)
 
 
+#-------------------------------------------------------------------------------
+class CappedLogFile:
+    """
+    A log file that does not grow beyond a given number of bytes. The first
+    half of the allowance is written to the file immediately, while the most
+    recent output filling the second half is appended to the file, after a
+    truncation marker if anything has been skipped, when the file is closed.
+
+    The tail is spilled to a sidecar file next to the log, so that it does not
+    take any memory. When the sidecar file fills the second half of the
+    allowance, it's rotated, ie. renamed so that it gets the
+    :data:`ROTATED_SUFFIX <CappedLogFile.ROTATED_SUFFIX>` appended, replacing
+    the one rotated previously, and a new one is started. The tail, and thus
+    the disk space taken by the sidecar files, never exceeds the whole
+    allowance. The sidecar files are removed when the log file is closed.
+
+    :param path:     Path to the file
+    :param cap:      Maximum number of bytes of output to keep
+    :param on_spill: A callable taking the path to the file, called whenever
+                     the output is spilled to the sidecar file
+    """
+
+    #: Suffix of the sidecar file holding the tail
+    TAIL_SUFFIX = '.tail'
+
+    #: Suffix appended to the sidecar file when it's rotated
+    ROTATED_SUFFIX = '.1'
+
+    CHUNK_SIZE = 64 * 1024
+
+    #---------------------------------------------------------------------------
+    def __init__(self, path, cap, on_spill=None):
+        self.path = path
+        self.head_cap = cap // 2
+        self.tail_cap = cap - self.head_cap
+        self.on_spill = on_spill
+        self.head_size = 0
+        self.tail_size = 0
+        self.rotated_size = 0
+        self.skipped = 0
+        self.tail_path = path + self.TAIL_SUFFIX
+        self.rotated_path = self.tail_path + self.ROTATED_SUFFIX
+        self.tail_fd = None
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        self.fd = os.open(path, flags, 0o644)
+
+        #-----------------------------------------------------------------------
+        # The sidecar files may be left over by a daemon that was killed
+        #-----------------------------------------------------------------------
+        self._remove_sidecars()
+
+    #---------------------------------------------------------------------------
+    def write(self, data):
+        """
+        Write the data to the file or to the sidecar file.
+        """
+        #-----------------------------------------------------------------------
+        # Fill the head
+        #-----------------------------------------------------------------------
+        if self.head_size < self.head_cap:
+            head = data[:self.head_cap - self.head_size]
+            os.write(self.fd, head)
+            self.head_size += len(head)
+            data = data[len(head):]
+
+        if not data or not self.tail_cap:
+            self.skipped += len(data)
+            return
+
+        #-----------------------------------------------------------------------
+        # Spill the tail. Only the last allowance of a large chunk of data can
+        # be kept, and so it's the only part that is written.
+        #-----------------------------------------------------------------------
+        if len(data) > self.tail_cap:
+            self.skipped += len(data) - self.tail_cap
+            data = data[-self.tail_cap:]
+
+        while data:
+            if self.tail_fd is None:
+                flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+                self.tail_fd = os.open(self.tail_path, flags, 0o644)
+            elif self.tail_size == self.tail_cap:
+                self._rotate()
+            chunk = data[:self.tail_cap - self.tail_size]
+            os.write(self.tail_fd, chunk)
+            self.tail_size += len(chunk)
+            data = data[len(chunk):]
+
+        if self.on_spill is not None:
+            self.on_spill(self.path)
+
+    #---------------------------------------------------------------------------
+    def _rotate(self):
+        os.close(self.tail_fd)
+        os.replace(self.tail_path, self.rotated_path)
+        self.skipped += self.rotated_size
+        self.rotated_size = self.tail_size
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        self.tail_fd = os.open(self.tail_path, flags, 0o644)
+        self.tail_size = 0
+
+    #---------------------------------------------------------------------------
+    def _remove_sidecars(self):
+        for path in [self.tail_path, self.rotated_path]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    #---------------------------------------------------------------------------
+    def _copy_tail(self, path, offset, size):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            while size:
+                chunk = os.pread(fd, min(size, self.CHUNK_SIZE), offset)
+                if not chunk:
+                    break
+                os.write(self.fd, chunk)
+                offset += len(chunk)
+                size -= len(chunk)
+        finally:
+            os.close(fd)
+
+    #---------------------------------------------------------------------------
+    def close(self):
+        """
+        Append the tail to the file, remove the sidecar files, and close the
+        file.
+
+        :return: The number of bytes of output stored in the file
+        """
+        #-----------------------------------------------------------------------
+        # Only the part of the rotated sidecar file that fits in the allowance
+        # together with the current one is kept
+        #-----------------------------------------------------------------------
+        rotated_kept = min(self.rotated_size, self.tail_cap - self.tail_size)
+        skipped = self.skipped + self.rotated_size - rotated_kept
+        if skipped:
+            marker = '\n[scrapy-do] {} bytes of output truncated\n'
+            os.write(self.fd, marker.format(skipped).encode('utf-8'))
+
+        if self.tail_fd is not None:
+            os.close(self.tail_fd)
+            self.tail_fd = None
+            if rotated_kept:
+                self._copy_tail(self.rotated_path,
+                                self.rotated_size - rotated_kept, rotated_kept)
+            self._copy_tail(self.tail_path, 0, self.tail_size)
+            self._remove_sidecars()
+
+        os.close(self.fd)
+        return self.head_size + rotated_kept + self.tail_size
+
+
 #-------------------------------------------------------------------------------
 class LoggedProcessProtocol(ProcessProtocol):
     """
@@ -267,40 +432,109 @@ class LoggedProcessProtocol(ProcessProtocol):
     exit it is deleted. The :data:`finished <LoggedProcessProtocol.finished>`
     deferred is triggered upon process exit and called with it's exit code.
 
-    :param job_name: Name of the job
-    :param log_dir:  A directory to put the log files in
+    If the size cap is specified, the output is captured through pipes and
+    written by :class:`CappedLogFile <CappedLogFile>` objects instead of
+    being passed to the files directly by the process.
+
+    The sizes of the log files that are kept are recorded in the
+    :data:`log_sizes <LoggedProcessProtocol.log_sizes>` dictionary, keyed by
+    the log type, before the deferred is triggered.
+
+    :param job_name:  Name of the job
+    :param log_dir:   A directory to put the log files in
+    :param size_cap:  Maximum number of bytes kept in each of the log files
+    :param log_sizes: A dictionary to record the log sizes in
+    :param on_spill:  A callable passed to the
+                      :class:`CappedLogFile <CappedLogFile>` objects
     """
 
     #---------------------------------------------------------------------------
-    def __init__(self, job_name, log_dir):
+    def __init__(self, job_name, log_dir, size_cap=None, log_sizes=None,
+                 on_spill=None):
         self.finished = Deferred()
+        self.log_sizes = log_sizes if log_sizes is not None else {}
         self.out_path = os.path.join(log_dir, job_name + '.out')
         self.err_path = os.path.join(log_dir, job_name + '.err')
+        self.size_cap = size_cap
+
+        if size_cap:
+            self.files = {
+                1: CappedLogFile(self.out_path, size_cap, on_spill),
+                2: CappedLogFile(self.err_path, size_cap, on_spill)
+            }
+            return
+
         flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
         self.out_fd = os.open(self.out_path, flags, 0o644)
         self.err_fd = os.open(self.err_path, flags, 0o644)
         os.set_inheritable(self.out_fd, True)
         os.set_inheritable(self.err_fd, True)
 
+    #---------------------------------------------------------------------------
+    def get_child_fds(self):
+        """
+        Get the child file descriptor mapping to be passed to
+        `reactor.spawnProcess`.
+        """
+        if self.size_cap:
+            return {1: 'r', 2: 'r'}
+        return {1: self.out_fd, 2: self.err_fd}
+
+    #---------------------------------------------------------------------------
+    def childDataReceived(self, child_fd, data):
+        """
+        Callback called by `twisted` when the process writes to a pipe.
+        """
+        self.files[child_fd].write(data)
+
     #---------------------------------------------------------------------------
     def processExited(self, status):
         """
         Callback called by `twisted` upon process exit.
         """
+        #-----------------------------------------------------------------------
+        # The pipes may still hold some data, so the captured output is
+        # handled when they are closed
+        #-----------------------------------------------------------------------
+        if self.size_cap:
+            return
+
         out_size = os.fstat(self.out_fd).st_size
         err_size = os.fstat(self.err_fd).st_size
         os.close(self.out_fd)
         os.close(self.err_fd)
+        self._finish(out_size, err_size, status)
+
+    #---------------------------------------------------------------------------
+    def processEnded(self, status):
+        """
+        Callback called by `twisted` when the process has exited and all of
+        the pipes have been closed.
+        """
+        if not self.size_cap:
+            return
+
+        out_size = self.files[1].close()
+        err_size = self.files[2].close()
+        self._finish(out_size, err_size, status)
+
+    #---------------------------------------------------------------------------
+    def _finish(self, out_size, err_size, status):
         if out_size == 0:
             os.remove(self.out_path)
+        else:
+            self.log_sizes['out'] = out_size
         if err_size == 0:
             os.remove(self.err_path)
+        else:
+            self.log_sizes['err'] = err_size
 
         self.finished.callback(status.value.exitCode)
 
 
 #-------------------------------------------------------------------------------
-def run_process(cmd, args, job_name, log_dir, env=None, path=None):
+def run_process(cmd, args, job_name, log_dir, env=None, path=None,
+                size_cap=None, log_sizes=None, on_spill=None):
     """
     Run a process using :class:`LoggedProcessProtocol <LoggedProcessProtocol>`
 
@@ -311,6 +545,13 @@ def run_process(cmd, args, job_name, log_dir, env=None, path=None):
     :param log_dir:  Directory where the log files will be stored
     :param env:      A dictionary with environment variables and their values
     :param path:     Program's working directory
+    :param size_cap: Maximum number of bytes kept in each of the log files;
+                     the output is not capped if it's `None` or zero
+    :param log_sizes: A dictionary filled with the sizes of the log files
+                      that have been kept upon program exit
+    :param on_spill: A callable taking the path to a capped log file, called
+                     whenever the output past the first half of the cap is
+                     written
 
     :return:         A tuple of an `IProcessTransport` object as returned
                      by twisted's `reactor.spawnProcess` and a deferred
@@ -319,9 +560,10 @@ def run_process(cmd, args, job_name, log_dir, env=None, path=None):
     """
     cmd = find_executable(cmd)
     args = [cmd] + args
-    pp = LoggedProcessProtocol(job_name, log_dir)
+    pp = LoggedProcessProtocol(job_name, log_dir, size_cap, log_sizes,
+                               on_spill)
     p = reactor.spawnProcess(pp, cmd, args, env=env, path=path,
-                             childFDs={1: pp.out_fd, 2: pp.err_fd})
+                             childFDs=pp.get_child_fds())
     return p, pp.finished
 
 
@@ -526,3 +768,105 @@ def decode_addresses(addrs):
             addresses.append((match.group('IPv6'), int(match.group('portv6'))))
 
     return addresses
+
+
+#-------------------------------------------------------------------------------
+class TokenBucket:
+    """
+    A token bucket rate limiter. The bucket holds at most `capacity` tokens and
+    is refilled at the rate of `rate` tokens per second. An action may proceed
+    only if there is a token to take from the bucket.
+
+    :param rate:     Number of tokens added to the bucket per second
+    :param capacity: Maximum number of tokens in the bucket, ie. the size of
+                     the burst allowed
+    :param clock:    A function returning the current time in seconds
+    """
+
+    #---------------------------------------------------------------------------
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.timestamp = clock()
+
+    #---------------------------------------------------------------------------
+    def available(self):
+        """
+        Refill the bucket and return the number of tokens available.
+        """
+        now = self.clock()
+        self.tokens += (now - self.timestamp) * self.rate
+        self.tokens = min(self.tokens, self.capacity)
+        self.timestamp = now
+        return self.tokens
+
+    #---------------------------------------------------------------------------
+    def consume(self, tokens=1):
+        """
+        Take the tokens from the bucket if there are enough of them.
+
+        :return: `True` if the tokens were taken, `False` otherwise
+        """
+        if self.available() < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+#-------------------------------------------------------------------------------
+def parse_rate(spec):
+    """
+    Parse a rate spec like `10/minute` and turn it into a :class:`TokenBucket
+    <TokenBucket>`. The valid units are `second`, `minute`, and `hour`. The
+    number of actions is also the size of the allowed burst.
+
+    :raises ValueError: If the spec is not valid
+    """
+    units = {'second': 1, 'minute': 60, 'hour': 3600}
+    spec_split = [x.strip() for x in spec.split('/')]
+    if len(spec_split) != 2 or spec_split[1] not in units:
+        raise ValueError('Rate spec needs to look like "10/minute"')
+
+    try:
+        count = int(spec_split[0])
+    except ValueError:
+        raise ValueError('Rate spec needs to start with an integer')
+
+    if count <= 0:
+        raise ValueError('Rate spec needs to allow at least one action')
+
+    return TokenBucket(float(count) / units[spec_split[1]], count)
+
+
+#-------------------------------------------------------------------------------
+def parse_size(spec):
+    """
+    Parse a size spec like `100M` and turn it into a number of bytes. The
+    valid suffixes are `K`, `M`, `G`, and `T`, optionally followed by `B` or
+    `iB`; the multiples are the powers of 1024.
+
+    :raises ValueError: If the spec is not valid
+    """
+    match = re.match(r'^(\d+)\s*([kmgt]?)(i?b)?$', spec.strip().lower())
+    if not match:
+        raise ValueError('Size spec needs to look like "100M"')
+    exponent = ' kmgt'.index(match.group(2) or ' ')
+    return int(match.group(1)) * 1024 ** exponent
+
+
+#-------------------------------------------------------------------------------
+def parse_duration(spec):
+    """
+    Parse a duration spec like `30d` and turn it into a number of seconds.
+    The valid suffixes are `s`, `m`, `h`, `d`, and `w`; a number without a
+    suffix is a number of seconds.
+
+    :raises ValueError: If the spec is not valid
+    """
+    units = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    match = re.match(r'^(\d+)\s*([smhdw]?)$', spec.strip().lower())
+    if not match:
+        raise ValueError('Duration spec needs to look like "30d"')
+    return int(match.group(1)) * units[match.group(2)]
@@ -8,30 +8,42 @@
 import os
 import json
 import time
-import psutil
 import socket
 import urllib
 import os.path
 import mimetypes
+import re
 
 from autobahn.twisted.resource import WebSocketResource
 from dateutil.relativedelta import relativedelta
-from twisted.internet.defer import inlineCallbacks
+from dateutil import parser as date_parser
+from twisted.internet.defer import inlineCallbacks, maybeDeferred
+from twisted.internet.defer import DeferredSemaphore, gatherResults
+from twisted.internet.threads import deferToThread
 from twisted.cred.checkers import FilePasswordDB
 from twisted.web.resource import IResource
 from twisted.cred.portal import IRealm, Portal
 from twisted.web.server import NOT_DONE_YET
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.task import LoopingCall
 from twisted.web.guard import HTTPAuthSessionWrapper, DigestCredentialFactory
 from scrapy_do.utils import get_object
 from zope.interface import implementer
 from twisted.web import resource
-from .websocket import WSFactory, WSProtocol
+from twisted.logger import Logger
+from .websocket import WSFactory, WSProtocol, OutboundQueue
+from .websocket import daemon_status_msg, projects_status_msg, jobs_status_msg
 from .schedule import Status as JobStatus
 from scrapy_do import __version__
+from collections import namedtuple
 from datetime import datetime
 from pkgutil import get_data
 from .utils import arg_require_all, arg_require_any, pprint_relativedelta
-from .utils import twisted_sleep
+from .utils import exc_repr
+from .logs import LogFileProducer, tail_offset, parse_range, find_log
+from .logs import open_log_at
+from .logs import get_compression, get_log_size, accepts_encoding
+from .logs import search_log, LOG_LEVELS
 
 
 #-------------------------------------------------------------------------------
@@ -55,8 +67,17 @@ class WebApp(resource.Resource):
         #-----------------------------------------------------------------------
         # Set up the websocket
         #-----------------------------------------------------------------------
-        ws_factory = WSFactory(controller=self.controller)
+        batch_window = config.get_float('web', 'ws-batch-window', 0.1)
+        event_buffer_size = config.get_int('web', 'ws-event-buffer', 1000)
+        queue_limit = config.get_int('web', 'ws-queue-limit', 1000)
+        compression = config.get_bool('web', 'ws-compression', True)
+        ws_factory = WSFactory(controller=self.controller,
+                               batch_window=batch_window,
+                               event_buffer_size=event_buffer_size,
+                               queue_limit=queue_limit,
+                               compression=compression)
         ws_factory.protocol = WSProtocol
+        self.ws_factory = ws_factory
         ws_resource = WebSocketResource(ws_factory)
         self.putChild(b'ws', ws_resource)
 
@@ -171,16 +192,19 @@ class Status(JsonResource):
 
     #---------------------------------------------------------------------------
     def render_GET(self, request):
-        p = psutil.Process(os.getpid())
         controller = self.parent.controller
+        metrics = controller.metrics.get_snapshot()
+        ws_factory = self.parent.ws_factory
         uptime = relativedelta(datetime.now(), controller.start_time)
         all_spiders = \
             [spider
              for _, prj in controller.projects.items()
              for spider in prj.spiders]
         resp = {
-            'memory-usage': float(p.memory_info().rss) / 1024. / 1024.,
-            'cpu-usage': p.cpu_percent(),
+            'memory-usage': metrics['memory-usage'],
+            'cpu-usage': metrics['cpu-usage'],
+            'host-cpu-usage': metrics['host-cpu-usage'],
+            'host-memory-usage': metrics['host-memory-usage'],
             'time': str(datetime.now()),
             'timezone': "{}; {}".format(time.tzname[0], time.tzname[1]),
             'hostname': socket.gethostname(),
@@ -189,14 +213,36 @@ class Status(JsonResource):
             'jobs-successful': controller.counter_success,
             'jobs-failed': controller.counter_failure,
             'jobs-canceled': controller.counter_cancel,
+            'jobs-retried': controller.counter_retry,
             'jobs-scheduled': len(controller.scheduled_jobs),
+            'jobs-rehydrated': '{}/{}'.format(controller.rehydration_done,
+                                              controller.rehydration_total),
             'projects': len(controller.projects),
             'spiders': len(all_spiders),
+            'log-usage': controller.log_retention.usage,
+            'log-budget': controller.log_retention.budget,
+            'logs-evicted': controller.log_retention.evicted,
+            'ws-queue-depths': ws_factory.get_queue_depths(),
+            'ws-clients-dropped': ws_factory.clients_dropped,
+            'event-bus': controller.event_bus.get_stats(),
             'daemon-version': __version__,
         }
         return resp
 
 
+#-------------------------------------------------------------------------------
+class Metrics(JsonResource):
+
+    #---------------------------------------------------------------------------
+    def render_GET(self, request):
+        metrics = self.parent.controller.metrics
+        return {
+            'interval': metrics.interval,
+            'current': metrics.get_snapshot(),
+            'history': metrics.get_history()
+        }
+
+
 #-------------------------------------------------------------------------------
 class PushProject(JsonResource):
 
@@ -274,12 +320,48 @@ class ScheduleJob(JsonResource):
         if b'payload' in request.args:
             payload = request.args[b'payload'][0].decode('utf-8')
 
+        retry = None
+        if b'retry' in request.args:
+            retry = request.args[b'retry'][0].decode('utf-8')
+
+        dependencies = None
+        if b'dependencies' in request.args:
+            dependencies = request.args[b'dependencies'][0].decode('utf-8')
+            dependencies = [x.strip() for x in dependencies.split(',')
+                            if x.strip()]
+
         job_id = self.parent.controller.schedule_job(project, spider, when,
                                                      description=description,
-                                                     payload=payload)
+                                                     payload=payload,
+                                                     dependencies=dependencies,
+                                                     retry=retry)
         return {'identifier': job_id}
 
 
+#-------------------------------------------------------------------------------
+class ScheduleJobs(JsonResource):
+
+    #---------------------------------------------------------------------------
+    def render_POST(self, request):
+        arg_require_all(request.args, [b'jobs'])
+        jobs = request.args[b'jobs'][0].decode('utf-8')
+
+        try:
+            jobs = json.loads(jobs)
+        except ValueError as e:
+            raise ValueError('Jobs are not a valid JSON string: ' + str(e))
+
+        if not isinstance(jobs, list):
+            raise ValueError('Jobs need to be a JSON list')
+
+        payload = '{}'
+        if b'payload' in request.args:
+            payload = request.args[b'payload'][0].decode('utf-8')
+
+        job_ids = self.parent.controller.schedule_jobs(jobs, payload=payload)
+        return {'identifiers': job_ids}
+
+
 #-------------------------------------------------------------------------------
 class ListJobs(JsonResource):
 
@@ -336,6 +418,14 @@ class CancelJob(JsonResource):
         return NOT_DONE_YET
 
 
+#-------------------------------------------------------------------------------
+# The part of a log to send: the offsets, the size of the log data, the file
+# positioned at the start if it has been opened, and the error message if the
+# requested byte range cannot be satisfied
+#-------------------------------------------------------------------------------
+LogWindow = namedtuple('LogWindow', ['start', 'end', 'size', 'file', 'error'])
+
+
 #-------------------------------------------------------------------------------
 class GetLogFile(resource.Resource):
 
@@ -348,42 +438,131 @@ class GetLogFile(resource.Resource):
 
     #---------------------------------------------------------------------------
     def render_GET(self, request):
-        @inlineCallbacks
-        def do_async():
-            request.setHeader('Content-Type', 'text/plain')
-            request.setHeader('Access-Control-Allow-Origin', '*')
-            controller = self.parent.parent.controller
-            filename = os.path.basename(urllib.parse.unquote(request.path))
-            filepath = os.path.join(controller.log_dir, filename)
-            job_id = os.path.splitext(filename)[0]
+        request.setHeader('Content-Type', 'text/plain')
+        request.setHeader('Access-Control-Allow-Origin', '*')
+        controller = self.parent.parent.controller
+        filename = os.path.basename(urllib.parse.unquote(request.path))
+        job_id = os.path.splitext(filename)[0]
+        filepath = find_log(os.path.join(controller.log_dir, filename))
 
-            try:
-                f = open(filepath, "rb")
-            except Exception:
-                request.setResponseCode(404)
-                request.write('File not found'.encode('utf-8'))
-                request.finish()
-                return
+        request.setHeader('Accept-Ranges', 'bytes')
+
+        if filepath is None:
+            self._not_found(request)
+            return NOT_DONE_YET
+
+        def is_running():
+            return job_id in controller.running_jobs
+
+        #-----------------------------------------------------------------------
+        # Send the compressed log as is if the client can handle it
+        #-----------------------------------------------------------------------
+        encoding = get_compression(filepath)
+        partial = request.getHeader('range') is not None or \
+            b'tail' in request.args or b'since' in request.args
+        accept_encoding = request.getHeader('accept-encoding')
+        if encoding is not None and not partial and \
+                accepts_encoding(accept_encoding, encoding):
+            request.setHeader('Content-Encoding', encoding)
+            self._send(request, filepath, is_running, 0, None, False)
+            return NOT_DONE_YET
 
-            while True:
-                try:
-                    data = f.read()
-                    if len(data) == 0:
-                        if job_id in controller.running_jobs:
-                            yield twisted_sleep(0.25)
-                            continue
-                        else:
-                            break
-                    request.write(data)
-                except Exception:
-                    request.setResponseCode(500)
-                    break
-            f.close()
+        #-----------------------------------------------------------------------
+        # Figure out which part of the log to send; the compressed logs need
+        # to be decompressed for that, so they are opened and positioned in a
+        # thread, which must not touch the request
+        #-----------------------------------------------------------------------
+        range_header = request.getHeader('range')
+        try:
+            lines = self._get_int_arg(request, b'tail')
+            since = self._get_int_arg(request, b'since')
+        except ValueError as e:
+            request.setResponseCode(400)
+            request.write(str(e).encode('utf-8'))
             request.finish()
+            return NOT_DONE_YET
 
-        do_async()
+        if encoding is None:
+            d = maybeDeferred(self._get_window, filepath, range_header, lines,
+                              since, False)
+        else:
+            d = deferToThread(self._get_window, filepath, range_header, lines,
+                              since, True)
+
+        def send(window):
+            if window.error is not None:
+                request.setResponseCode(416)
+                request.setHeader('Content-Range',
+                                  'bytes */{}'.format(window.size))
+                request.write(window.error.encode('utf-8'))
+                request.finish()
+                return
+
+            if range_header is not None:
+                request.setResponseCode(206)
+                request.setHeader('Content-Range', 'bytes {}-{}/{}'.format(
+                    window.start, window.end - 1, window.size))
+                request.setHeader('Content-Length',
+                                  str(window.end - window.start))
+            request.setHeader('X-Log-Offset', str(window.start))
+            self._send(request, filepath, is_running, window.start,
+                       window.end, True, window.file)
+
+        d.addCallbacks(send, lambda _: self._not_found(request))
         return NOT_DONE_YET
 
+    #---------------------------------------------------------------------------
+    def _get_int_arg(self, request, name):
+        if name not in request.args:
+            return None
+        return int(request.args[name][0].decode('utf-8'))
+
+    #---------------------------------------------------------------------------
+    def _get_window(self, filepath, range_header, lines, since, open_file):
+        #-----------------------------------------------------------------------
+        # A byte range is a snapshot of the file, while the remaining options
+        # follow running jobs
+        #-----------------------------------------------------------------------
+        size = get_log_size(filepath)
+        start, end = 0, None
+        if range_header is not None:
+            try:
+                start, end = parse_range(range_header, size)
+            except ValueError as e:
+                return LogWindow(None, None, size, None, str(e))
+        elif since is not None:
+            start = min(max(since, 0), size)
+
+        if not open_file:
+            if range_header is None and lines is not None:
+                start = tail_offset(filepath, lines)
+            return LogWindow(start, end, size, None, None)
+
+        if range_header is not None:
+            lines = None
+        log_file, start = open_log_at(filepath, start, lines)
+        return LogWindow(start, end, size, log_file, None)
+
+    #---------------------------------------------------------------------------
+    def _send(self, request, filepath, is_running, start, end, decompress,
+              log_file=None):
+        controller = self.parent.parent.controller
+        producer = LogFileProducer(request, filepath, controller.log_watcher,
+                                   is_running, start, end, decompress,
+                                   log_file)
+        try:
+            producer.start()
+        except Exception:
+            if log_file is not None:
+                log_file.close()
+            self._not_found(request)
+
+    #---------------------------------------------------------------------------
+    def _not_found(self, request):
+        request.setResponseCode(404)
+        request.write('File not found'.encode('utf-8'))
+        request.finish()
+
 
 #-------------------------------------------------------------------------------
 class GetLog(resource.Resource):
@@ -400,6 +579,439 @@ class GetLog(resource.Resource):
         return GetLogFile(self)
 
 
+#-------------------------------------------------------------------------------
+class GetFeedFile(GetLogFile):
+
+    CONTENT_TYPES = {
+        None: 'application/x-ndjson',
+        'gzip': 'application/gzip',
+        'zstd': 'application/zstd'
+    }
+
+    #---------------------------------------------------------------------------
+    def render_GET(self, request):
+        request.setHeader('Access-Control-Allow-Origin', '*')
+        request.setHeader('Accept-Ranges', 'bytes')
+        controller = self.parent.parent.controller
+        filename = os.path.basename(urllib.parse.unquote(request.path))
+        job_id = filename.split('.')[0]
+        try:
+            filepath = controller.get_job_feed(job_id)
+        except ValueError:
+            filepath = None
+
+        if filepath is None:
+            self._not_found(request)
+            return NOT_DONE_YET
+
+        def is_running():
+            return job_id in controller.running_jobs
+
+        #-----------------------------------------------------------------------
+        # The feed is sent as stored, so the byte ranges refer to the possibly
+        # compressed file
+        #-----------------------------------------------------------------------
+        content_type = self.CONTENT_TYPES[get_compression(filepath)]
+        disposition = 'attachment; filename="{}"'.format(
+            os.path.basename(filepath))
+        request.setHeader('Content-Type', content_type)
+        request.setHeader('Content-Disposition', disposition)
+
+        start, end = 0, None
+        range_header = request.getHeader('range')
+        if range_header is not None:
+            size = os.path.getsize(filepath)
+            try:
+                start, end = parse_range(range_header, size)
+            except ValueError as e:
+                request.setResponseCode(416)
+                request.setHeader('Content-Range', 'bytes */{}'.format(size))
+                request.write(str(e).encode('utf-8'))
+                request.finish()
+                return NOT_DONE_YET
+            request.setResponseCode(206)
+            request.setHeader('Content-Range', 'bytes {}-{}/{}'.format(
+                start, end - 1, size))
+            request.setHeader('Content-Length', str(end - start))
+
+        self._send(request, filepath, is_running, start, end, False)
+        return NOT_DONE_YET
+
+
+#-------------------------------------------------------------------------------
+class GetFeed(resource.Resource):
+
+    isLeaf = False
+
+    #---------------------------------------------------------------------------
+    def __init__(self, parent):
+        super(GetFeed, self).__init__()
+        self.parent = parent
+
+    #---------------------------------------------------------------------------
+    def getChild(self, name, request):
+        return GetFeedFile(self)
+
+
+#-------------------------------------------------------------------------------
+class SearchLogs(JsonResource):
+
+    log = Logger()
+
+    #: Maximum number of logs searched concurrently
+    CONCURRENCY = 4
+
+    #---------------------------------------------------------------------------
+    def _get_arg(self, request, name, default=None):
+        if name not in request.args:
+            return default
+        return request.args[name][0].decode('utf-8')
+
+    #---------------------------------------------------------------------------
+    def render_GET(self, request):
+        arg_require_any(request.args, [b'pattern', b'level'])
+
+        #-----------------------------------------------------------------------
+        # Process the arguments
+        #-----------------------------------------------------------------------
+        pattern = self._get_arg(request, b'pattern')
+        if pattern is not None:
+            try:
+                pattern = re.compile(pattern)
+            except re.error as e:
+                raise ValueError('Invalid pattern: {}'.format(str(e)))
+
+        level = self._get_arg(request, b'level')
+        if level is not None:
+            level = level.upper()
+            if level not in LOG_LEVELS:
+                raise ValueError('Level needs to be one of: {}'.format(
+                    ', '.join(LOG_LEVELS)))
+
+        log_type = self._get_arg(request, b'log-type', 'both')
+        if log_type not in ['out', 'err', 'both']:
+            raise ValueError('Log type needs to be one of: out, err, both')
+        log_types = ['out', 'err'] if log_type == 'both' else [log_type]
+
+        limit = int(self._get_arg(request, b'limit', '1000'))
+        project = self._get_arg(request, b'project')
+        spider = self._get_arg(request, b'spider')
+        since = self._get_arg(request, b'since')
+        until = self._get_arg(request, b'until')
+        since = date_parser.parse(since) if since is not None else None
+        until = date_parser.parse(until) if until is not None else None
+
+        #-----------------------------------------------------------------------
+        # Find the logs to search
+        #-----------------------------------------------------------------------
+        controller = self.parent.controller
+        jobs = controller.get_jobs(JobStatus.RUNNING) + \
+            controller.get_completed_jobs()
+        targets = []
+        for job in jobs:
+            if project is not None and job.project != project:
+                continue
+            if spider is not None and job.spider != spider:
+                continue
+            if since is not None and job.timestamp < since:
+                continue
+            if until is not None and job.timestamp > until:
+                continue
+            logs = dict(zip(['out', 'err'],
+                            controller.get_job_logs(job.identifier)))
+            for t in log_types:
+                if logs[t] is not None:
+                    targets.append((job, t, logs[t]))
+
+        #-----------------------------------------------------------------------
+        # Search the logs in the thread pool and stream the matches as they
+        # come, one JSON object per line
+        #-----------------------------------------------------------------------
+        request.setHeader('Content-Type', 'application/x-ndjson')
+        request.setHeader('Access-Control-Allow-Origin', '*')
+        state = {'remaining': limit, 'finished': False}
+
+        def stop(_):
+            state['finished'] = True
+        request.notifyFinish().addBoth(stop)
+
+        def write(matches, job, log_type):
+            for match in matches[:state['remaining']]:
+                data = {
+                    'identifier': job.identifier,
+                    'project': job.project,
+                    'spider': job.spider,
+                    'log-type': log_type,
+                    **match
+                }
+                data = json.dumps(data, ensure_ascii=False) + '\n'
+                request.write(data.encode('utf-8'))
+                state['remaining'] -= 1
+
+        def search(job, log_type, path):
+            if state['finished'] or state['remaining'] <= 0:
+                return
+            d = deferToThread(search_log, path, pattern, level,
+                              state['remaining'])
+
+            def written(matches):
+                if not state['finished']:
+                    write(matches, job, log_type)
+            d.addCallback(written)
+            d.addErrback(lambda f: self.log.error(
+                'Unable to search {}: {}'.format(path, exc_repr(f.value))))
+            return d
+
+        semaphore = DeferredSemaphore(self.CONCURRENCY)
+        d = gatherResults([semaphore.run(search, *t) for t in targets])
+
+        def finish(_):
+            if not state['finished']:
+                request.finish()
+        d.addBoth(finish)
+        return NOT_DONE_YET
+
+
+#-------------------------------------------------------------------------------
+def sse_event(msg, event_id=None):
+    """
+    Format a message dictionary as a Server-Sent Event named after the type
+    of the message.
+
+    :param msg:      The message dictionary
+    :param event_id: The identifier of the event, if any
+    :return:         The bytes to be written to the stream
+    """
+    data = ''
+    if event_id is not None:
+        data += 'id: {}\n'.format(event_id)
+    data += 'event: {}\n'.format(msg['type'])
+    data += 'data: {}\n\n'.format(json.dumps(msg, ensure_ascii=False))
+    return data.encode('utf-8')
+
+
+#-------------------------------------------------------------------------------
+class EventStream(resource.Resource):
+    """
+    Stream the messages pushed to the web UI clients as Server-Sent Events.
+    The events carry the identifiers of the numbered messages, so that the
+    clients reconnecting with the `Last-Event-ID` header, or the
+    `last-event-id` argument, are sent only the messages they have missed,
+    as long as the server still has them. Otherwise, the clients are sent the
+    current status summaries first. In both cases, a `SYNC` event tells the
+    client where it stands. The `types` argument may restrict the stream to
+    a comma-separated list of message types. The events are written by an
+    :class:`EventStreamProducer`, so the slow clients are handled like the
+    WebSocket ones.
+    """
+
+    isLeaf = True
+
+    #: Interval in seconds between the comments keeping the connection alive
+    KEEPALIVE = 15
+
+    #: Time in milliseconds that the clients should wait before reconnecting
+    RETRY = 3000
+
+    #---------------------------------------------------------------------------
+    def __init__(self, parent):
+        super(EventStream, self).__init__()
+        self.parent = parent
+
+    #---------------------------------------------------------------------------
+    def _get_last_event_id(self, request):
+        last_id = request.getHeader('Last-Event-ID')
+        if last_id is None and b'last-event-id' in request.args:
+            last_id = request.args[b'last-event-id'][0].decode('utf-8')
+        if last_id is None:
+            return None
+        try:
+            epoch, seq = last_id.split(':')
+            return epoch, int(seq)
+        except ValueError:
+            return None
+
+    #---------------------------------------------------------------------------
+    def render_GET(self, request):
+        ws_factory = self.parent.ws_factory
+        controller = self.parent.controller
+
+        types = None
+        if b'types' in request.args:
+            types = request.args[b'types'][0].decode('utf-8').split(',')
+            types = set(msg_type.strip() for msg_type in types)
+
+        request.setHeader('Content-Type', 'text/event-stream; charset=utf-8')
+        request.setHeader('Cache-Control', 'no-cache')
+        request.setHeader('X-Accel-Buffering', 'no')
+        request.setHeader('Access-Control-Allow-Origin', '*')
+        producer = EventStreamProducer(request, ws_factory, types,
+                                       self.KEEPALIVE)
+        producer.start()
+        producer.send('retry: {}\n\n'.format(self.RETRY).encode('utf-8'))
+
+        #-----------------------------------------------------------------------
+        # Bring the client up to date
+        #-----------------------------------------------------------------------
+        missed = None
+        last_id = self._get_last_event_id(request)
+        if last_id is not None:
+            missed = ws_factory.get_missed_messages(*last_id)
+
+        if missed is None:
+            for msg in [daemon_status_msg(controller),
+                        projects_status_msg(controller),
+                        jobs_status_msg(controller)]:
+                if types is None or msg['type'] in types:
+                    producer.send(sse_event(msg), msg['type'])
+        else:
+            for msg in missed:
+                producer.write(msg)
+
+        msg = {
+            'type': 'SYNC',
+            'epoch': ws_factory.epoch,
+            'seq': ws_factory.seq,
+            'full': missed is None
+        }
+        producer.send(sse_event(msg, '{}:{}'.format(ws_factory.epoch,
+                                                    ws_factory.seq)))
+
+        #-----------------------------------------------------------------------
+        # Follow the new messages until the client goes away
+        #-----------------------------------------------------------------------
+        producer.follow()
+        return NOT_DONE_YET
+
+
+#-------------------------------------------------------------------------------
+@implementer(IPushProducer)
+class EventStreamProducer:
+    """
+    Write the Server-Sent Events to an HTTP request, respecting the back
+    pressure exerted by the request. The events for a client that doesn't
+    keep up are held in an :class:`OutboundQueue
+    <scrapy_do.websocket.OutboundQueue>`, just like the messages for the
+    WebSocket clients, so only the newest status summary of every type is
+    kept. A client whose queue grows beyond the limit of the WebSocket
+    factory is dropped; it's brought up to date when it reconnects.
+
+    :param request:    A `twisted.web.server.Request` object
+    :param ws_factory: The :class:`WSFactory <scrapy_do.websocket.WSFactory>`
+                       broadcasting the messages
+    :param types:      A set of the message types to send or `None` for all
+                       of them
+    :param keepalive:  Interval in seconds between the keepalive comments
+    """
+
+    log = Logger()
+
+    #---------------------------------------------------------------------------
+    def __init__(self, request, ws_factory, types=None, keepalive=15):
+        self.request = request
+        self.ws_factory = ws_factory
+        self.types = types
+        self.keepalive = LoopingCall(self._keepalive)
+        self.keepalive_interval = keepalive
+        self.outbound = OutboundQueue()
+        self.paused = False
+        self.finished = False
+
+    #---------------------------------------------------------------------------
+    def start(self):
+        """
+        Register with the request.
+        """
+        self.request.registerProducer(self, True)
+        self.request.notifyFinish().addBoth(lambda _: self._stop())
+
+    #---------------------------------------------------------------------------
+    def follow(self):
+        """
+        Start sending the broadcast messages and the keepalive comments.
+        """
+        if self.finished:
+            return
+        self.ws_factory.add_stream(self.write)
+        self.keepalive.start(self.keepalive_interval, now=False)
+
+    #---------------------------------------------------------------------------
+    def write(self, msg):
+        """
+        Send a numbered message as an event if the client wants it.
+        """
+        if self.types is None or msg['type'] in self.types:
+            event_id = '{}:{}'.format(self.ws_factory.epoch, msg['seq'])
+            self.send(sse_event(msg, event_id), msg['type'])
+
+    #---------------------------------------------------------------------------
+    def send(self, data, msg_type=None):
+        """
+        Write the data to the request or queue it if the client doesn't keep
+        up.
+        """
+        if self.finished:
+            return
+        if not self.paused:
+            self.request.write(data)
+            return
+        self.outbound.add_message(data, msg_type)
+        self._check_outbound()
+
+    #---------------------------------------------------------------------------
+    def _keepalive(self):
+        if not self.paused:
+            self.request.write(b': keepalive\n\n')
+
+    #---------------------------------------------------------------------------
+    def _check_outbound(self):
+        if len(self.outbound) <= self.ws_factory.queue_limit:
+            return
+        msg = 'Dropping event stream client {} with {} messages queued.'
+        self.log.info(msg.format(self.request.getClientAddress(),
+                                 len(self.outbound)))
+        self.ws_factory.clients_dropped += 1
+        self._stop()
+        self.request.transport.abortConnection()
+
+    #---------------------------------------------------------------------------
+    def _stop(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.outbound = OutboundQueue()
+        self.ws_factory.remove_stream(self.write)
+        if self.keepalive.running:
+            self.keepalive.stop()
+
+    #---------------------------------------------------------------------------
+    def pauseProducing(self):
+        """
+        The client doesn't keep up, start queuing the events.
+        """
+        self.paused = True
+
+    #---------------------------------------------------------------------------
+    def resumeProducing(self):
+        """
+        The client has caught up, send it the queued events.
+        """
+        self.paused = False
+        outbound = self.outbound
+        self.outbound = OutboundQueue()
+        for data in outbound.messages:
+            self.send(data)
+        for msg_type, data in outbound.statuses.items():
+            self.send(data, msg_type)
+
+    #---------------------------------------------------------------------------
+    def stopProducing(self):
+        """
+        The connection is going away.
+        """
+        self._stop()
+
+
 #-------------------------------------------------------------------------------
 class RemoveProject(JsonResource):
 
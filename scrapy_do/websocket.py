@@ -5,10 +5,10 @@
 # Licensed under the 3-Clause BSD License, see the LICENSE file for details.
 #-------------------------------------------------------------------------------
 
+import collections
 import functools
 import calendar
 import socket
-import psutil
 import base64
 import time
 import json
@@ -16,26 +16,559 @@ import os
 
 from autobahn.twisted.websocket import WebSocketServerProtocol
 from autobahn.twisted.websocket import WebSocketServerFactory
+from autobahn.websocket.compress import PerMessageDeflateOffer
+from autobahn.websocket.compress import PerMessageDeflateOfferAccept
 from dateutil.relativedelta import relativedelta
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet import reactor
 from scrapy_do.controller import Event as ControllerEvent
 from twisted.logger import Logger
 from scrapy_do import __version__
 from datetime import datetime
 from tzlocal import get_localzone
+from twisted.internet.threads import deferToThread
+from .schedule import Schedule, Status
 from .utils import pprint_relativedelta
+from .logs import LogFollower, find_log, read_log_tail
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+#-------------------------------------------------------------------------------
+# The WebSocket subprotocols selecting the encoding of the messages sent over
+# to the clients; the clients not asking for any get JSON
+#-------------------------------------------------------------------------------
+SUBPROTOCOLS = {
+    'scrapy-do.json': 'json',
+    'scrapy-do.msgpack': 'msgpack'
+}
+
+
+#-------------------------------------------------------------------------------
+def compact_message(msg):
+    """
+    Make the job lists of a message compact by listing the field names once
+    and sending every job as an array of field values.
+    """
+    jobs = msg.get('jobs')
+    if not isinstance(jobs, list) or not jobs:
+        return msg
+    fields = list(jobs[0])
+    compact = dict(msg)
+    compact['jobs'] = {
+        'fields': fields,
+        'rows': [[job.get(field) for field in fields] for job in jobs]
+    }
+    return compact
+
+
+#-------------------------------------------------------------------------------
+def encode_message(msg, encoding='json'):
+    """
+    Serialize a message dictionary to the bytes sent over to the clients.
+
+    :param msg:      The message dictionary
+    :param encoding: `json` or `msgpack`; the MessagePack messages carry the
+                     job lists in the compact form, see
+                     :func:`compact_message`
+    """
+    if encoding == 'msgpack':
+        return msgpack.packb(compact_message(msg), use_bin_type=True)
+    data = json.dumps(msg, ensure_ascii=False) + '\n'
+    return data.encode('utf-8')
+
+
+#-------------------------------------------------------------------------------
+def accept_deflate(offers):
+    """
+    Accept the first permessage-deflate compression offer of a client.
+    """
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            return PerMessageDeflateOfferAccept(offer)
+    return None
+
+
+#-------------------------------------------------------------------------------
+def job_to_dict(job):
+    """
+    Convert a job to a dictionary in a form convenient for the client.
+    """
+    #---------------------------------------------------------------------------
+    # The logs of the running jobs are being written to; the logs of the
+    # finished jobs are recorded in the job, so there is no need to look at
+    # the file system
+    #---------------------------------------------------------------------------
+    job_dict = job.to_dict()
+    job_dict['timestamp'] = time.mktime(job.timestamp.timetuple())
+    if job.status == Status.RUNNING:
+        job_dict['outLog'] = True
+        job_dict['errLog'] = True
+    else:
+        logs = job.logs or {}
+        job_dict['outLog'] = 'out' in logs
+        job_dict['errLog'] = 'err' in logs
+    return job_dict
+
+
+#-------------------------------------------------------------------------------
+JOB_LISTS = {
+    'ACTIVE': [Status.SCHEDULED, Status.PENDING, Status.RUNNING,
+               Status.WAITING],
+    'COMPLETED': [Status.SUCCESSFUL, Status.FAILED, Status.CANCELED]
+}
+
+
+#-------------------------------------------------------------------------------
+def job_list_name(job):
+    """
+    Get the name of the job list that the job belongs to.
+    """
+    for name, statuses in JOB_LISTS.items():
+        if job.status in statuses:
+            return name
+    return None
+
+
+#-------------------------------------------------------------------------------
+class JobWindow:
+    """
+    A page of one of the job lists that a client is looking at.
+
+    :param job_list:   The name of the list, `ACTIVE` or `COMPLETED`
+    :param offset:     The number of jobs to skip
+    :param limit:      The maximum number of jobs in the page
+    :param sort:       The sort key, see :data:`Schedule.SORT_KEYS
+                       <scrapy_do.schedule.Schedule.SORT_KEYS>`
+    :param descending: Sort the jobs in the descending order
+    :param project:    Only show the jobs of this project
+    :param spider:     Only show the jobs of this spider
+    :raises ValueError: If any of the parameters is invalid
+    """
+
+    MAX_LIMIT = 1000
+
+    #---------------------------------------------------------------------------
+    def __init__(self, job_list, offset=0, limit=100, sort='timestamp',
+                 descending=True, project=None, spider=None):
+        if job_list not in JOB_LISTS:
+            raise ValueError('Unknown job list: {}.'.format(job_list))
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError('The offset needs to be a non-negative integer.')
+        if not isinstance(limit, int) or limit <= 0 or \
+           limit > self.MAX_LIMIT:
+            msg = 'The limit needs to be an integer between 1 and {}.'
+            raise ValueError(msg.format(self.MAX_LIMIT))
+        if sort not in Schedule.SORT_KEYS:
+            raise ValueError('Unknown sort key: {}.'.format(sort))
+
+        self.job_list = job_list
+        self.offset = offset
+        self.limit = limit
+        self.sort = sort
+        self.descending = bool(descending)
+        self.project = project
+        self.spider = spider
+        self.subscription = None
+        self.page = ()
+        self.ids = set()
+        self.total = 0
+
+    #---------------------------------------------------------------------------
+    @property
+    def key(self):
+        """
+        A tuple identifying the content of the window.
+        """
+        subscription = None
+        if self.subscription is not None:
+            subscription = self.subscription.key
+        return (self.job_list, self.offset, self.limit, self.sort,
+                self.descending, self.project, self.spider, subscription)
+
+    #---------------------------------------------------------------------------
+    def matches(self, job):
+        """
+        Check if the job belongs to the list and passes the filters.
+        """
+        if job.status not in JOB_LISTS[self.job_list]:
+            return False
+        if self.project is not None and job.project != self.project:
+            return False
+        if self.spider is not None and job.spider != self.spider:
+            return False
+        if self.subscription is not None and \
+           not self.subscription.matches(job):
+            return False
+        return True
+
+    #---------------------------------------------------------------------------
+    def query(self, controller):
+        """
+        Query the controller for the content of the window.
+
+        :return: The job list message to be sent to the client
+        """
+        statuses = JOB_LISTS[self.job_list]
+        projects = None
+        if self.subscription is not None:
+            statuses = [status for status in statuses
+                        if self.subscription.matches_status(status)]
+            projects = self.subscription.projects
+
+        jobs, total = [], 0
+        if statuses:
+            jobs, total = controller.get_jobs_window(
+                statuses, offset=self.offset, limit=self.limit,
+                sort=self.sort, descending=self.descending,
+                project=self.project, spider=self.spider, projects=projects)
+        msg = {
+            'type': 'JOB_LIST',
+            'status': self.job_list,
+            'jobs': [job_to_dict(job) for job in jobs],
+            'offset': self.offset,
+            'limit': self.limit,
+            'total': total
+        }
+        return msg
+
+    #---------------------------------------------------------------------------
+    def fetch(self, controller):
+        """
+        Query the controller for the content of the window and remember it
+        as sent to the client.
+
+        :return: The job list message to be sent to the client
+        """
+        msg = self.query(controller)
+        self.update(msg)
+        return msg
+
+    #---------------------------------------------------------------------------
+    def is_current(self, msg):
+        """
+        Check if the job list message lists the same jobs, in the same order,
+        and the same count as the one sent to the client the last time.
+        """
+        page = tuple(job['identifier'] for job in msg['jobs'])
+        return page == self.page and msg['total'] == self.total
+
+    #---------------------------------------------------------------------------
+    def update(self, msg):
+        """
+        Remember what the client has been sent in a job list message.
+        """
+        self.page = tuple(job['identifier'] for job in msg['jobs'])
+        self.ids = set(self.page)
+        self.total = msg['total']
+
+
+#-------------------------------------------------------------------------------
+class Subscription:
+    """
+    The subset of the events that a client wants to be told about.
+
+    :param projects:      The names of the projects whose job and project
+                          events the client wants, `None` for all
+    :param statuses:      The names of the statuses of the jobs the client
+                          wants, `None` for all
+    :param counters_only: The client wants only the status summaries
+    :raises ValueError: If any of the parameters is invalid
+    """
+
+    #---------------------------------------------------------------------------
+    def __init__(self, projects=None, statuses=None, counters_only=False):
+        if projects is not None:
+            if not isinstance(projects, list) or \
+               not all(isinstance(project, str) for project in projects):
+                raise ValueError('Projects need to be a list of names.')
+            projects = frozenset(projects)
+
+        if statuses is not None:
+            if not isinstance(statuses, list):
+                raise ValueError('Statuses need to be a list of names.')
+            try:
+                statuses = frozenset(Status[status] for status in statuses)
+            except (KeyError, TypeError):
+                raise ValueError('Unknown status in: {}.'.format(statuses))
+
+        self.projects = projects
+        self.statuses = statuses
+        self.counters_only = bool(counters_only)
+
+    #---------------------------------------------------------------------------
+    @property
+    def key(self):
+        """
+        A tuple identifying the subscription.
+        """
+        projects = None
+        if self.projects is not None:
+            projects = tuple(sorted(self.projects))
+        statuses = None
+        if self.statuses is not None:
+            statuses = tuple(sorted(status.value for status in self.statuses))
+        return (projects, statuses, self.counters_only)
+
+    #---------------------------------------------------------------------------
+    @property
+    def is_everything(self):
+        """
+        Check if the subscription lets all the events through.
+        """
+        return self.projects is None and self.statuses is None and \
+            not self.counters_only
+
+    #---------------------------------------------------------------------------
+    def job_routes(self):
+        """
+        Get the keys of the job event index that the subscription is filed
+        under. The keys are `(project, status)` tuples, where `None` matches
+        any project or any status.
+        """
+        if self.counters_only:
+            return []
+        projects = [None] if self.projects is None else self.projects
+        statuses = [None] if self.statuses is None else self.statuses
+        return [(project, status) for project in projects
+                for status in statuses]
+
+    #---------------------------------------------------------------------------
+    def project_routes(self):
+        """
+        Get the keys of the project event index that the subscription is
+        filed under. `None` matches any project.
+        """
+        if self.counters_only:
+            return []
+        return [None] if self.projects is None else list(self.projects)
+
+    #---------------------------------------------------------------------------
+    def matches_status(self, status):
+        """
+        Check if the jobs with the status pass the subscription.
+        """
+        if self.counters_only:
+            return False
+        return self.statuses is None or status in self.statuses
+
+    #---------------------------------------------------------------------------
+    def matches_project(self, project):
+        """
+        Check if the events of the project pass the subscription.
+        """
+        if self.counters_only:
+            return False
+        return self.projects is None or project in self.projects
+
+    #---------------------------------------------------------------------------
+    def matches(self, job):
+        """
+        Check if the job passes the subscription.
+        """
+        return self.matches_status(job.status) and \
+            self.matches_project(job.project)
+
+
+#-------------------------------------------------------------------------------
+def daemon_status_msg(controller):
+    """
+    Build the daemon status message.
+    """
+    metrics = controller.metrics.get_snapshot()
+    uptime = relativedelta(datetime.now(), controller.start_time)
+    uptime = pprint_relativedelta(uptime)
+    uptime = ' '.join(uptime.split()[:-1])
+    if not uptime:
+        uptime = '0m'
+    return {
+        'type': 'DAEMON_STATUS',
+        'memoryUsage': int(metrics['memory-usage']),
+        'cpuUsage': metrics['cpu-usage'],
+        'time': int(calendar.timegm(time.gmtime())),
+        'timezone': str(get_localzone()),
+        'hostname': socket.gethostname(),
+        'uptime': uptime,
+        'daemonVersion': __version__,
+    }
+
+
+#-------------------------------------------------------------------------------
+def projects_status_msg(controller):
+    """
+    Build the summary of projects message.
+    """
+    all_spiders = [
+        spider
+        for prj in controller.projects.values()
+        for spider in prj.spiders
+    ]
+    return {
+        'type': 'PROJECTS_STATUS',
+        'projects': len(controller.projects),
+        'spiders': len(all_spiders),
+    }
+
+
+#-------------------------------------------------------------------------------
+def jobs_status_msg(controller):
+    """
+    Build the summary of jobs message.
+    """
+    return {
+        'type': 'JOBS_STATUS',
+        'jobsRun': controller.counter_run,
+        'jobsSuccessful': controller.counter_success,
+        'jobsFailed': controller.counter_failure,
+        'jobsCanceled': controller.counter_cancel,
+        'jobsScheduled': len(controller.scheduled_jobs),
+    }
+
+
+#-------------------------------------------------------------------------------
+def project_push_msg(prj):
+    """
+    Build the message notifying about a project being pushed.
+    """
+    return {
+        'type': 'PROJECT_PUSH',
+        'name': prj.name,
+        'spiders': prj.spiders
+    }
+
+
+#-------------------------------------------------------------------------------
+def project_remove_msg(name):
+    """
+    Build the message notifying about a project being removed.
+    """
+    return {
+        'type': 'PROJECT_REMOVE',
+        'name': name
+    }
+
+
+#-------------------------------------------------------------------------------
+def job_changes_msg(jobs, removed):
+    """
+    Build the message notifying about a batch of jobs being updated and
+    removed.
+    """
+    return {
+        'type': 'JOB_BATCH_UPDATE',
+        'jobs': [job_to_dict(job) for job in jobs],
+        'removed': removed
+    }
+
+
+#-------------------------------------------------------------------------------
+class OutboundQueue:
+    """
+    The messages waiting to be sent to a client that doesn't keep up. Only
+    the newest state of every job and the newest status message of every
+    type are kept; the remaining messages are kept in order.
+    """
+
+    COALESCED_TYPES = ['DAEMON_STATUS', 'PROJECTS_STATUS', 'JOBS_STATUS']
+
+    #---------------------------------------------------------------------------
+    def __init__(self):
+        self.messages = []
+        self.job_changes = collections.OrderedDict()
+        self.statuses = collections.OrderedDict()
+
+    #---------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.messages) + len(self.job_changes) + \
+            len(self.statuses)
+
+    #---------------------------------------------------------------------------
+    def add_message(self, prepared, msg_type=None):
+        """
+        Queue a prepared message.
+        """
+        if msg_type in self.COALESCED_TYPES:
+            self.statuses.pop(msg_type, None)
+            self.statuses[msg_type] = prepared
+        else:
+            self.messages.append(prepared)
+
+    #---------------------------------------------------------------------------
+    def add_job_changes(self, jobs, removed):
+        """
+        Queue a batch of job changes; the removals are marked with None.
+        """
+        for job in jobs:
+            self.job_changes.pop(job.identifier, None)
+            self.job_changes[job.identifier] = job
+        for job_id in removed:
+            self.job_changes.pop(job_id, None)
+            self.job_changes[job_id] = None
 
 
 #-------------------------------------------------------------------------------
 class WSFactory(WebSocketServerFactory):
     """
-    Server factory producing configured WSProtocol objects.
+    Server factory producing configured WSProtocol objects. The factory
+    listens to the controller events on behalf of all the open connections.
+    The job events are gathered over the batch window, collapsed per job, and
+    sent to every client as one batch followed by one job status summary.
+    The remaining events are passed to the connections right away. Every
+    message is serialized once and sent to all the connections as a prepared
+    message.
+
+    The broadcast messages are numbered and the most recent ones are kept in
+    a ring buffer, so that a reconnecting client can be sent only the ones it
+    has missed. The sequence numbers are only meaningful within an epoch that
+    identifies the factory instance; they start over when the daemon
+    restarts.
+
+    The connections whose clients don't keep up queue the messages instead
+    of writing them out; the ones whose queues grow beyond the limit are
+    dropped.
+
+    The clients may negotiate the permessage-deflate compression and, using
+    a subprotocol, the encoding of the messages; see :data:`SUBPROTOCOLS`.
+    The messages are serialized once per encoding.
+
+    Other consumers of the numbered messages, like the Server-Sent Events
+    streams, may register for them with :meth:`add_stream`.
+
+    The clients may subscribe to a subset of the events. The subscribed
+    connections are filed in indices keyed by project and job status, so that
+    the job and project events are routed only to the connections that want
+    them. The factory also keeps track of which subscribed connections have
+    been sent which jobs, so that they can be told when a job stops matching
+    their subscriptions.
     """
 
     #---------------------------------------------------------------------------
     def __init__(self, *args, **kwargs):
         self.controller = kwargs.pop('controller')
+        self.batch_window = kwargs.pop('batch_window', 0.1)
+        event_buffer_size = kwargs.pop('event_buffer_size', 1000)
+        self.queue_limit = kwargs.pop('queue_limit', 1000)
+        compression = kwargs.pop('compression', True)
+        self.clients_dropped = 0
+        self.log_followers = {}
+        self.connections = set()
+        self.streams = set()
+        self.unsubscribed = set()
+        self.job_routes = collections.defaultdict(set)
+        self.project_routes = collections.defaultdict(set)
+        self.job_subscribers = {}
+        self.job_changes = collections.OrderedDict()
+        self.flush_call = None
+        self.epoch = '{:x}'.format(int(time.time() * 1000))
+        self.seq = 0
+        self.events = collections.deque(maxlen=event_buffer_size)
         super(WSFactory, self).__init__(*args, **kwargs)
+        if compression:
+            self.setProtocolOptions(perMessageCompressionAccept=accept_deflate)
+        self.controller.add_event_listener(self.on_controller_event)
 
     #---------------------------------------------------------------------------
     def buildProtocol(self, addr):
@@ -43,6 +576,374 @@ class WSFactory(WebSocketServerFactory):
         protocol.controller = self.controller
         return protocol
 
+    #---------------------------------------------------------------------------
+    def get_log_follower(self, job_id, log_type):
+        """
+        Get the follower of a log of a running job shared by all the
+        connections, creating it if necessary.
+
+        :return: A :class:`LogFollower <scrapy_do.logs.LogFollower>` object
+        :raises OSError: If the log file cannot be opened
+        """
+        path = os.path.join(self.controller.log_dir,
+                            '{}.{}'.format(job_id, log_type))
+        if path in self.log_followers:
+            return self.log_followers[path]
+
+        def is_running():
+            return job_id in self.controller.running_jobs
+
+        def on_close(follower):
+            if self.log_followers.get(path) is follower:
+                del self.log_followers[path]
+
+        follower = LogFollower(path, self.controller.log_watcher, is_running,
+                               on_close)
+        self.log_followers[path] = follower
+        return follower
+
+    #---------------------------------------------------------------------------
+    def register(self, protocol):
+        """
+        Start passing the controller events to an open connection.
+        """
+        self.connections.add(protocol)
+        if protocol.subscription is None:
+            self.unsubscribed.add(protocol)
+
+    #---------------------------------------------------------------------------
+    def unregister(self, protocol):
+        """
+        Stop passing the controller events to a connection.
+        """
+        self.connections.discard(protocol)
+        self.unsubscribed.discard(protocol)
+        self._unroute(protocol)
+
+    #---------------------------------------------------------------------------
+    def add_stream(self, stream):
+        """
+        Start passing the broadcast messages to a callable. It's called with
+        the message dictionary, which it must not modify, after the message
+        has been numbered.
+        """
+        self.streams.add(stream)
+
+    #---------------------------------------------------------------------------
+    def remove_stream(self, stream):
+        """
+        Stop passing the broadcast messages to a callable.
+        """
+        self.streams.discard(stream)
+
+    #---------------------------------------------------------------------------
+    def subscribe(self, protocol, subscription):
+        """
+        Change the subscription of a connection.
+
+        :param protocol:     The connection
+        :param subscription: A :class:`Subscription` or `None` for all the
+                             events
+        """
+        self._unroute(protocol)
+        if subscription is not None and subscription.is_everything:
+            subscription = None
+        protocol.subscription = subscription
+        if subscription is None:
+            self.unsubscribed.add(protocol)
+            return
+
+        self.unsubscribed.discard(protocol)
+        for key in subscription.job_routes():
+            self.job_routes[key].add(protocol)
+        for key in subscription.project_routes():
+            self.project_routes[key].add(protocol)
+
+    #---------------------------------------------------------------------------
+    def _unroute(self, protocol):
+        if protocol.subscription is not None:
+            for key in protocol.subscription.job_routes():
+                self.job_routes[key].discard(protocol)
+                if not self.job_routes[key]:
+                    del self.job_routes[key]
+            for key in protocol.subscription.project_routes():
+                self.project_routes[key].discard(protocol)
+                if not self.project_routes[key]:
+                    del self.project_routes[key]
+
+        for job_id in protocol.known_jobs:
+            subscribers = self.job_subscribers.get(job_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(protocol)
+            if not subscribers:
+                del self.job_subscribers[job_id]
+        protocol.known_jobs = set()
+
+    #---------------------------------------------------------------------------
+    def note_jobs(self, protocol, job_ids):
+        """
+        Remember that a subscribed connection has been sent the jobs.
+        """
+        if protocol.subscription is None:
+            return
+        for job_id in job_ids:
+            self.job_subscribers.setdefault(job_id, set()).add(protocol)
+            protocol.known_jobs.add(job_id)
+
+    #---------------------------------------------------------------------------
+    def route_job_changes(self, jobs, removed):
+        """
+        Find the subscribed connections that need to be told about the job
+        changes.
+
+        :return: A dictionary mapping the connections to tuples of the lists
+                 of the updated jobs and of the identifiers of the removed
+                 jobs to be sent to them; the jobs that stopped matching the
+                 subscription of a connection count as removed
+        """
+        routed = collections.defaultdict(lambda: ([], []))
+        for job in jobs:
+            recipients = set()
+            for key in [(job.project, job.status), (job.project, None),
+                        (None, job.status), (None, None)]:
+                recipients.update(self.job_routes.get(key, ()))
+            known = self.job_subscribers.pop(job.identifier, set())
+            for protocol in recipients:
+                routed[protocol][0].append(job)
+                protocol.known_jobs.add(job.identifier)
+            for protocol in known - recipients:
+                routed[protocol][1].append(job.identifier)
+                protocol.known_jobs.discard(job.identifier)
+            if recipients:
+                self.job_subscribers[job.identifier] = recipients
+
+        for job_id in removed:
+            for protocol in self.job_subscribers.pop(job_id, ()):
+                routed[protocol][1].append(job_id)
+                protocol.known_jobs.discard(job_id)
+        return routed
+
+    #---------------------------------------------------------------------------
+    def get_project_recipients(self, name):
+        """
+        Get the connections that need to be told about the events of the
+        project.
+        """
+        recipients = set(self.unsubscribed)
+        recipients.update(self.project_routes.get(name, ()))
+        recipients.update(self.project_routes.get(None, ()))
+        return list(recipients)
+
+    #---------------------------------------------------------------------------
+    def prepare(self, msg, encoding='json'):
+        """
+        Serialize and frame a message in the given encoding.
+        """
+        return self.prepareMessage(encode_message(msg, encoding),
+                                   encoding != 'json')
+
+    #---------------------------------------------------------------------------
+    def get_queue_depths(self):
+        """
+        Get the number of messages waiting to be sent to each of the clients.
+
+        :return: A dictionary mapping the addresses of the clients to the
+                 depths of their queues
+        """
+        return {protocol.peer: len(protocol.outbound)
+                for protocol in self.connections}
+
+    #---------------------------------------------------------------------------
+    def get_missed_events(self, epoch, seq, skip=(), encoding='json'):
+        """
+        Get the messages broadcast after the given one.
+
+        :param epoch:    The epoch of the last message seen by the client
+        :param seq:      The sequence number of the last message seen by the
+                         client
+        :param skip:     The types of the messages to leave out
+        :param encoding: The encoding of the messages
+        :return:         A list of prepared messages or `None` if the client
+                         cannot be brought up to date with them, because the
+                         epoch has changed or the buffer has rolled over
+        """
+        events = self._get_missed(epoch, seq, skip)
+        if events is None:
+            return None
+        missed = []
+        for _, _, msg, prepared in events:
+            if encoding not in prepared:
+                prepared[encoding] = self.prepare(msg, encoding)
+            missed.append(prepared[encoding])
+        return missed
+
+    #---------------------------------------------------------------------------
+    def get_missed_messages(self, epoch, seq, skip=()):
+        """
+        Get the message dictionaries broadcast after the given one. See
+        :meth:`get_missed_events`.
+        """
+        events = self._get_missed(epoch, seq, skip)
+        if events is None:
+            return None
+        return [msg for _, _, msg, _ in events]
+
+    #---------------------------------------------------------------------------
+    def _get_missed(self, epoch, seq, skip):
+        if epoch != self.epoch or seq < 0 or seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.events or self.events[0][0] > seq + 1:
+            return None
+        return [event for event in self.events
+                if event[0] > seq and event[1] not in skip]
+
+    #---------------------------------------------------------------------------
+    def on_controller_event(self, event_type, event_data):
+        """
+        Gather the job events and pass the remaining ones to the connections.
+        """
+        if event_type == ControllerEvent.JOB_UPDATE:
+            self._add_job_change(event_data.identifier, event_data)
+        elif event_type == ControllerEvent.JOB_REMOVE:
+            self._add_job_change(event_data, None)
+        elif event_type == ControllerEvent.JOB_BATCH_UPDATE:
+            for job in event_data:
+                self._add_job_change(job.identifier, job)
+        elif event_type == ControllerEvent.DAEMON_STATUS_CHANGE:
+            self.broadcast(daemon_status_msg(self.controller))
+        elif event_type == ControllerEvent.PROJECT_PUSH:
+            self.broadcast(project_push_msg(event_data),
+                           self.get_project_recipients(event_data.name))
+            self.broadcast(projects_status_msg(self.controller))
+        elif event_type == ControllerEvent.PROJECT_REMOVE:
+            self.broadcast(project_remove_msg(event_data),
+                           self.get_project_recipients(event_data))
+            self.broadcast(projects_status_msg(self.controller))
+
+    #---------------------------------------------------------------------------
+    def _add_job_change(self, job_id, job):
+        #-----------------------------------------------------------------------
+        # Only the last change of every job matters; the removals are marked
+        # with None
+        #-----------------------------------------------------------------------
+        self.job_changes.pop(job_id, None)
+        self.job_changes[job_id] = job
+        if self.flush_call is None:
+            self.flush_call = reactor.callLater(self.batch_window,
+                                                self.flush_job_changes)
+
+    #---------------------------------------------------------------------------
+    def flush_job_changes(self):
+        """
+        Send the gathered job changes to all the connections.
+        """
+        self.flush_call = None
+        changes = self.job_changes
+        self.job_changes = collections.OrderedDict()
+        if not changes:
+            return
+
+        jobs = [job for job in changes.values() if job is not None]
+        removed = [job_id for job_id, job in changes.items() if job is None]
+
+        #-----------------------------------------------------------------------
+        # The connections that see all the jobs in full get the same batch,
+        # the others get what has been routed to them
+        #-----------------------------------------------------------------------
+        targets = [(protocol, jobs, removed)
+                   for protocol in self.unsubscribed]
+        routed = self.route_job_changes(jobs, removed)
+        targets += [(protocol, protocol_jobs, protocol_removed)
+                    for protocol, (protocol_jobs, protocol_removed)
+                    in routed.items() if protocol in self.connections]
+
+        firehose = []
+        filtered = {}
+        for protocol, protocol_jobs, protocol_removed in targets:
+            if protocol.paused:
+                protocol.queue_job_changes(protocol_jobs, protocol_removed)
+            elif protocol.subscription is None and not protocol.job_windows:
+                firehose.append(protocol)
+            else:
+                filtered[protocol] = (protocol_jobs, protocol_removed)
+
+        self.broadcast(job_changes_msg(jobs, removed), firehose)
+        self.send_filtered_job_changes(filtered)
+        self.broadcast(jobs_status_msg(self.controller))
+
+    #---------------------------------------------------------------------------
+    def send_filtered_job_changes(self, changes):
+        """
+        Send the job changes to the connections that don't see all the jobs in
+        full. A connection looking at windows of the job lists is only told
+        about the jobs in its windows and in the lists it sees in full, and
+        it's sent a fresh page of every window whose content or count has
+        changed. The messages and the pages are shared by the connections
+        looking at the same things.
+
+        :param changes: A dictionary mapping the connections to tuples of the
+                        lists of the updated jobs and of the identifiers of
+                        the removed jobs
+        """
+        batches = {}
+        pages = {}
+        for protocol, (jobs, removed) in changes.items():
+            if protocol.job_windows:
+                sent, sent_removed, stale = protocol.filter_job_changes(
+                    jobs, removed)
+            else:
+                sent, sent_removed, stale = jobs, removed, []
+
+            encoding = protocol.encoding
+            messages = []
+            if sent or sent_removed:
+                key = (encoding, tuple(job.identifier for job in sent),
+                       tuple(sent_removed))
+                if key not in batches:
+                    msg = job_changes_msg(sent, sent_removed)
+                    batches[key] = self.prepare(msg, encoding)
+                messages.append(batches[key])
+
+            for window in stale:
+                if window.key not in pages:
+                    pages[window.key] = (window.query(self.controller), {})
+                msg, prepared = pages[window.key]
+                if window.is_current(msg):
+                    continue
+                window.update(msg)
+                self.note_jobs(protocol, window.ids)
+                if encoding not in prepared:
+                    prepared[encoding] = self.prepare(msg, encoding)
+                messages.append(prepared[encoding])
+
+            for prepared in messages:
+                protocol.send_prepared(prepared)
+
+    #---------------------------------------------------------------------------
+    def broadcast(self, msg, connections=None):
+        """
+        Send a message to all the connections, or the given ones. The message
+        is numbered, serialized, and framed once per encoding, no matter how
+        many connections there are, and kept in the event buffer. It's also
+        passed to all the streams.
+        """
+        if connections is None:
+            connections = list(self.connections)
+        self.seq += 1
+        msg['seq'] = self.seq
+        prepared = {}
+        self.events.append((self.seq, msg['type'], msg, prepared))
+        for protocol in connections:
+            if protocol.encoding not in prepared:
+                prepared[protocol.encoding] = self.prepare(msg,
+                                                           protocol.encoding)
+            protocol.send_prepared(prepared[protocol.encoding], msg['type'])
+        for stream in list(self.streams):
+            stream(msg)
+
 
 #-------------------------------------------------------------------------------
 class WSProtocol(WebSocketServerProtocol):
@@ -61,21 +962,183 @@ class WSProtocol(WebSocketServerProtocol):
         self.actionHandlers['PROJECT_PUSH'] = self.project_push
         self.actionHandlers['JOB_CANCEL'] = self.job_cancel
         self.actionHandlers['JOB_SCHEDULE'] = self.job_schedule
+        self.actionHandlers['JOBS_SCHEDULE'] = self.jobs_schedule
+        self.actionHandlers['LOG_SUBSCRIBE'] = self.log_subscribe
+        self.actionHandlers['LOG_UNSUBSCRIBE'] = self.log_unsubscribe
+        self.actionHandlers['JOB_WINDOW'] = self.job_window
+        self.actionHandlers['SUBSCRIBE'] = self.subscribe
+        self.log_subscriptions = {}
+        self.job_windows = {}
+        self.resume_from = None
+        self.paused = False
+        self.outbound = OutboundQueue()
+        self.encoding = 'json'
+        self.subscription = None
+        self.known_jobs = set()
+
+    #---------------------------------------------------------------------------
+    def onConnect(self, request):
+        """
+        A client is connecting; see if it wants to resume from the last
+        message it has seen, passed as `since=epoch:seq` in the query string,
+        and if it wants to see only the first page of the completed jobs,
+        passed as `window=limit`. Pick the first of the subprotocols offered
+        by the client that the daemon supports.
+        """
+
+        since = request.params.get('since')
+        if since:
+            try:
+                epoch, seq = since[0].split(':')
+                self.resume_from = (epoch, int(seq))
+            except ValueError:
+                self.wslog.debug('Invalid resume point: {}.'.format(since[0]))
+
+        window = request.params.get('window')
+        if window:
+            try:
+                self.job_windows['COMPLETED'] = JobWindow('COMPLETED',
+                                                          limit=int(window[0]))
+            except ValueError:
+                self.wslog.debug('Invalid window: {}.'.format(window[0]))
+
+        for subprotocol in request.protocols:
+            encoding = SUBPROTOCOLS.get(subprotocol)
+            if encoding is None or (encoding == 'msgpack' and msgpack is None):
+                continue
+            self.encoding = encoding
+            return subprotocol
+        return None
 
     #---------------------------------------------------------------------------
     def onOpen(self):
         """
         A connection has ben opened, so send the initial daemon state to the
-        client.
+        client, or only the messages it has missed if it's resuming. The
+        client is told where it stands with a SYNC message.
+
+        The job changes are not broadcast to the clients looking at job
+        windows, so these are sent their job lists anew when they resume.
         """
 
-        self.send_daemon_status()
-        self.send_projects_status()
-        self.send_jobs_status()
-        self.send_project_list()
-        self.send_job_list('ACTIVE')
-        self.send_job_list('COMPLETED')
-        self.controller.add_event_listener(self.on_controller_event)
+        missed = None
+        if self.resume_from is not None:
+            skip = ('JOB_BATCH_UPDATE',) if self.job_windows else ()
+            missed = self.factory.get_missed_events(*self.resume_from,
+                                                    skip=skip,
+                                                    encoding=self.encoding)
+
+        if missed is None:
+            self.send_daemon_status()
+            self.send_projects_status()
+            self.send_jobs_status()
+            self.send_project_list()
+        else:
+            for prepared in missed:
+                self.sendPreparedMessage(prepared)
+
+        if missed is None or self.job_windows:
+            for job_list in JOB_LISTS:
+                if job_list in self.job_windows:
+                    self.send_json(self.job_windows[job_list].fetch(
+                        self.controller))
+                else:
+                    self.send_job_list(job_list)
+
+        msg = {
+            'type': 'SYNC',
+            'epoch': self.factory.epoch,
+            'seq': self.factory.seq,
+            'full': missed is None
+        }
+        self.send_json(msg)
+        self.factory.register(self)
+
+        #-----------------------------------------------------------------------
+        # Let the transport tell us when the client doesn't keep up. The HTTP
+        # channel that the connection has been upgraded from may still be
+        # registered as its producer.
+        #-----------------------------------------------------------------------
+        if self.transport is not None:
+            try:
+                self.transport.unregisterProducer()
+            except RuntimeError:
+                pass
+            self.transport.registerProducer(self, True)
+
+    #---------------------------------------------------------------------------
+    def pauseProducing(self):
+        """
+        The client doesn't keep up, start queuing the messages.
+        """
+        self.paused = True
+
+    #---------------------------------------------------------------------------
+    def resumeProducing(self):
+        """
+        The client has caught up, send it the queued messages.
+        """
+        self.paused = False
+        outbound = self.outbound
+        self.outbound = OutboundQueue()
+
+        for prepared in outbound.messages:
+            self.send_prepared(prepared)
+
+        if outbound.job_changes:
+            changes = outbound.job_changes
+            jobs = [job for job in changes.values() if job is not None]
+            removed = [job_id for job_id, job in changes.items()
+                       if job is None]
+            if self.paused:
+                self.queue_job_changes(jobs, removed)
+            else:
+                self.factory.send_filtered_job_changes({self: (jobs,
+                                                               removed)})
+
+        for msg_type, prepared in outbound.statuses.items():
+            self.send_prepared(prepared, msg_type)
+
+    #---------------------------------------------------------------------------
+    def stopProducing(self):
+        """
+        The connection is going away.
+        """
+        self.outbound = OutboundQueue()
+
+    #---------------------------------------------------------------------------
+    def send_prepared(self, prepared, msg_type=None):
+        """
+        Send a prepared message to the client or queue it if the client
+        doesn't keep up.
+        """
+        if not self.paused:
+            self.sendPreparedMessage(prepared)
+            return
+        self.outbound.add_message(prepared, msg_type)
+        self.check_outbound()
+
+    #---------------------------------------------------------------------------
+    def queue_job_changes(self, jobs, removed):
+        """
+        Queue a batch of job changes for a client that doesn't keep up.
+        """
+        self.outbound.add_job_changes(jobs, removed)
+        self.check_outbound()
+
+    #---------------------------------------------------------------------------
+    def check_outbound(self):
+        """
+        Drop the connection if the client is too far behind.
+        """
+        if len(self.outbound) <= self.factory.queue_limit:
+            return
+        msg = 'Dropping client {} with {} messages queued.'
+        self.wslog.info(msg.format(self.peer, len(self.outbound)))
+        self.outbound = OutboundQueue()
+        self.factory.clients_dropped += 1
+        self.factory.unregister(self)
+        self.dropConnection(abort=True)
 
     #---------------------------------------------------------------------------
     def onMessage(self, payload, isBinary):
@@ -127,17 +1190,25 @@ class WSProtocol(WebSocketServerProtocol):
         The connection has been closed, clean up the state.
         """
 
-        self.controller.remove_event_listener(self.on_controller_event)
+        self.factory.unregister(self)
+        for follower in list(self.log_subscriptions.values()):
+            if follower is not None:
+                follower.unsubscribe(self)
+        self.log_subscriptions = {}
 
     #---------------------------------------------------------------------------
     def send_json(self, msg):
         """
-        Convert a message dictionary to JSON and send it over to a client.
+        Serialize a message dictionary in the encoding of the connection and
+        send it over to a client.
         """
 
-        data = json.dumps(msg, ensure_ascii=False) + '\n'
-        data = data.encode('utf-8')
-        self.sendMessage(data)
+        if self.paused:
+            prepared = self.factory.prepare(msg, self.encoding)
+            self.send_prepared(prepared, msg.get('type'))
+            return
+        self.sendMessage(encode_message(msg, self.encoding),
+                         self.encoding != 'json')
 
     #---------------------------------------------------------------------------
     def send_response(self, msg_id, data={}):
@@ -175,23 +1246,7 @@ class WSProtocol(WebSocketServerProtocol):
         Send the daemon status to the client.
         """
 
-        p = psutil.Process(os.getpid())
-        uptime = relativedelta(datetime.now(), self.controller.start_time)
-        uptime = pprint_relativedelta(uptime)
-        uptime = ' '.join(uptime.split()[:-1])
-        if not uptime:
-            uptime = '0m'
-        msg = {
-            'type': 'DAEMON_STATUS',
-            'memoryUsage': int(float(p.memory_info().rss) / 1024. / 1024.),
-            'cpuUsage': p.cpu_percent(),
-            'time': int(calendar.timegm(time.gmtime())),
-            'timezone': str(get_localzone()),
-            'hostname': socket.gethostname(),
-            'uptime': uptime,
-            'daemonVersion': __version__,
-        }
-        self.send_json(msg)
+        self.send_json(daemon_status_msg(self.controller))
 
     #---------------------------------------------------------------------------
     def send_projects_status(self):
@@ -199,19 +1254,7 @@ class WSProtocol(WebSocketServerProtocol):
         Send the summary of projects to the client.
         """
 
-        controller = self.controller
-        all_spiders = [
-            spider
-            for prj in controller.projects.values()
-            for spider in prj.spiders
-        ]
-
-        msg = {
-            'type': 'PROJECTS_STATUS',
-            'projects': len(controller.projects),
-            'spiders': len(all_spiders),
-        }
-        self.send_json(msg)
+        self.send_json(projects_status_msg(self.controller))
 
     #---------------------------------------------------------------------------
     def send_jobs_status(self):
@@ -219,15 +1262,7 @@ class WSProtocol(WebSocketServerProtocol):
         Send the summary of jobs to the client.
         """
 
-        msg = {
-            'type': 'JOBS_STATUS',
-            'jobsRun': self.controller.counter_run,
-            'jobsSuccessful': self.controller.counter_success,
-            'jobsFailed': self.controller.counter_failure,
-            'jobsCanceled': self.controller.counter_cancel,
-            'jobsScheduled': len(self.controller.scheduled_jobs),
-        }
-        self.send_json(msg)
+        self.send_json(jobs_status_msg(self.controller))
 
     #---------------------------------------------------------------------------
     def send_project_list(self):
@@ -236,6 +1271,9 @@ class WSProtocol(WebSocketServerProtocol):
         """
 
         projects = self.controller.get_projects()
+        if self.subscription is not None:
+            projects = [project for project in projects
+                        if self.subscription.matches_project(project)]
         projects = functools.reduce(lambda acc, x: acc + [{
             'name': x,
             'spiders': self.controller.get_spiders(x)
@@ -247,48 +1285,14 @@ class WSProtocol(WebSocketServerProtocol):
         }
         self.send_json(msg)
 
-    #---------------------------------------------------------------------------
-    def send_project_push(self, prj):
-        """
-        Notify the client about a project being pushed.
-        """
-
-        msg = {
-            'type': 'PROJECT_PUSH',
-            'name': prj.name,
-            'spiders': prj.spiders
-        }
-        self.send_json(msg)
-
-    #---------------------------------------------------------------------------
-    def send_project_remove(self, name):
-        """
-        Notify the client about a project being removed.
-        """
-
-        msg = {
-            'type': 'PROJECT_REMOVE',
-            'name': name
-        }
-        self.send_json(msg)
-
     #---------------------------------------------------------------------------
     def process_job(self, job):
         """
         Process a dictionary describing a job and convert it to a form more
-        convenient for the client.
+        convenient for the client. See :func:`job_to_dict <job_to_dict>`.
         """
 
-        job_dict = job.to_dict()
-        logs = self.controller.get_job_logs(job.identifier)
-        job_dict['timestamp'] = time.mktime(job.timestamp.timetuple())
-        job_dict['outLog'] = False
-        job_dict['errLog'] = False
-        if logs[0] is not None:
-            job_dict['outLog'] = True
-        if logs[1] is not None:
-            job_dict['errLog'] = True
-        return job_dict
+        return job_to_dict(job)
 
     #---------------------------------------------------------------------------
     def send_job_list(self, status):
@@ -302,6 +1306,10 @@ class WSProtocol(WebSocketServerProtocol):
         elif status == 'COMPLETED':
             jobs = self.controller.get_completed_jobs()
 
+        if self.subscription is not None:
+            jobs = [job for job in jobs if self.subscription.matches(job)]
+            self.factory.note_jobs(self, [job.identifier for job in jobs])
+
         msg = {
             'type': 'JOB_LIST',
             'status': status,
@@ -310,50 +1318,89 @@ class WSProtocol(WebSocketServerProtocol):
         self.send_json(msg)
 
     #---------------------------------------------------------------------------
-    def send_job_update(self, job):
+    def filter_job_changes(self, jobs, removed):
         """
-        Notify the client about the job properties being updated.
+        Select the job changes that matter to a client looking at job windows.
+
+        :param jobs:    The updated jobs
+        :param removed: The identifiers of the removed jobs
+        :return:        A tuple containing the updated jobs and the
+                        identifiers of the removed jobs to be sent, and the
+                        list of the windows that may need to be refreshed
         """
 
-        msg = {
-            'type': 'JOB_UPDATE',
-            'job': self.process_job(job)
-        }
-        self.send_json(msg)
+        sent = []
+        sent_removed = []
+        stale = []
+
+        def mark(window):
+            if window not in stale:
+                stale.append(window)
+
+        for job in jobs:
+            window = self.job_windows.get(job_list_name(job))
+            for other in self.job_windows.values():
+                if other is not window and job.identifier in other.ids:
+                    mark(other)
+
+            if window is None or job.identifier in window.ids:
+                sent.append(job)
+                continue
+
+            #-------------------------------------------------------------------
+            # The job may have just left a list that the client sees in full,
+            # so it needs to be taken off it
+            #-------------------------------------------------------------------
+            if len(self.job_windows) < len(JOB_LISTS):
+                sent_removed.append(job.identifier)
+            if window.matches(job):
+                mark(window)
+
+        for job_id in removed:
+            windows = [window for window in self.job_windows.values()
+                       if job_id in window.ids]
+            for window in windows:
+                mark(window)
+            if not windows and len(self.job_windows) < len(JOB_LISTS):
+                sent_removed.append(job_id)
+
+        return sent, sent_removed, stale
 
     #---------------------------------------------------------------------------
-    def send_job_remove(self, jobId):
+    def send_job_changes(self, jobs, removed):
         """
-        Notify the client about a job being removed.
+        Notify the client about a batch of jobs being updated and removed.
+        """
+
+        self.send_json(job_changes_msg(jobs, removed))
+
+    #---------------------------------------------------------------------------
+    def send_log_data(self, job_id, log_type, offset, data):
+        """
+        Send a chunk of a log to the client.
         """
 
         msg = {
-            'type': 'JOB_REMOVE',
-            'jobId': jobId,
+            'type': 'LOG_DATA',
+            'jobId': job_id,
+            'logType': log_type,
+            'offset': offset,
+            'data': data
         }
         self.send_json(msg)
 
     #---------------------------------------------------------------------------
-    def on_controller_event(self, event_type, event_data):
+    def send_log_end(self, job_id, log_type):
         """
-        Handle controller events and dispatch appropriate messages to the
-        client.
+        Notify the client that a log will not grow anymore.
         """
 
-        if event_type == ControllerEvent.DAEMON_STATUS_CHANGE:
-            self.send_daemon_status()
-        elif event_type == ControllerEvent.PROJECT_PUSH:
-            self.send_project_push(event_data)
-            self.send_projects_status()
-        elif event_type == ControllerEvent.PROJECT_REMOVE:
-            self.send_project_remove(event_data)
-            self.send_projects_status()
-        elif event_type == ControllerEvent.JOB_UPDATE:
-            self.send_job_update(event_data)
-            self.send_jobs_status()
-        elif event_type == ControllerEvent.JOB_REMOVE:
-            self.send_job_remove(event_data)
-            self.send_jobs_status()
+        msg = {
+            'type': 'LOG_END',
+            'jobId': job_id,
+            'logType': log_type
+        }
+        self.send_json(msg)
 
     #---------------------------------------------------------------------------
     def project_remove(self, data):
@@ -429,15 +1476,208 @@ class WSProtocol(WebSocketServerProtocol):
         if 'payload' in data:
             payload = data['payload']
 
+        retry = None
+        if 'retry' in data:
+            retry = data['retry']
+
+        dependencies = None
+        if 'dependencies' in data:
+            dependencies = data['dependencies']
+            if not isinstance(dependencies, list):
+                msg = 'Dependencies need to be a list.'
+                self.send_error_response(data['id'], msg)
+                return
+
         try:
             jobId = self.controller.schedule_job(data['project'],
                                                  data['spider'],
                                                  data['schedule'],
                                                  description=description,
-                                                 payload=payload)
+                                                 payload=payload,
+                                                 dependencies=dependencies,
+                                                 retry=retry)
             msg = {
                 'jobId': jobId
             }
             self.send_response(data['id'], msg)
         except Exception as e:
             self.send_error_response(data['id'], str(e))
+
+    #---------------------------------------------------------------------------
+    def jobs_schedule(self, data):
+        """
+        Execute a request to schedule multiple jobs at once.
+        """
+
+        if 'jobs' not in data:
+            self.send_error_response(data['id'], 'Jobs not specified.')
+            return
+
+        if not isinstance(data['jobs'], list):
+            self.send_error_response(data['id'], 'Jobs need to be a list.')
+            return
+
+        payload = '{}'
+        if 'payload' in data:
+            payload = data['payload']
+
+        try:
+            jobIds = self.controller.schedule_jobs(data['jobs'],
+                                                   payload=payload)
+            msg = {
+                'jobIds': jobIds
+            }
+            self.send_response(data['id'], msg)
+        except Exception as e:
+            self.send_error_response(data['id'], str(e))
+
+    #---------------------------------------------------------------------------
+    def job_window(self, data):
+        """
+        Show the client a page of one of the job lists. From now on, the
+        client is only told about the changes affecting this page.
+        """
+
+        params = {}
+        for field in ['offset', 'limit', 'sort', 'descending', 'project',
+                      'spider']:
+            if field in data:
+                params[field] = data[field]
+
+        try:
+            window = JobWindow(data.get('list'), **params)
+            window.subscription = self.subscription
+            msg = window.fetch(self.controller)
+        except ValueError as e:
+            self.send_error_response(data['id'], str(e))
+            return
+
+        self.job_windows[window.job_list] = window
+        self.factory.note_jobs(self, window.ids)
+        self.send_response(data['id'])
+        self.send_json(msg)
+
+    #---------------------------------------------------------------------------
+    def subscribe(self, data):
+        """
+        Subscribe the client to a subset of the events: the jobs and the
+        projects of the given projects, the jobs in the given statuses, or
+        only the status summaries. The fields that are missing or `null`
+        don't restrict anything, so an empty request subscribes the client to
+        everything again. The client is sent the project and job lists that
+        match its new subscription.
+        """
+
+        try:
+            subscription = Subscription(data.get('projects'),
+                                        data.get('statuses'),
+                                        data.get('countersOnly', False))
+        except ValueError as e:
+            self.send_error_response(data['id'], str(e))
+            return
+
+        self.factory.subscribe(self, subscription)
+        self.send_response(data['id'])
+        if subscription.counters_only:
+            return
+
+        self.send_project_list()
+        for job_list in JOB_LISTS:
+            if job_list in self.job_windows:
+                window = self.job_windows[job_list]
+                window.subscription = self.subscription
+                self.send_json(window.fetch(self.controller))
+                self.factory.note_jobs(self, window.ids)
+            else:
+                self.send_job_list(job_list)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def log_subscribe(self, data):
+        """
+        Execute a log subscription request. The logs of the running jobs are
+        followed until the jobs finish, while the logs of the completed jobs
+        are sent at once.
+        """
+
+        for key in ['jobId', 'logType']:
+            if key not in data:
+                msg = 'Parameter "{}" not specified.'.format(key)
+                self.send_error_response(data['id'], msg)
+                return
+
+        job_id = data['jobId']
+        log_type = data['logType']
+        offset = data.get('offset')
+        subscription = (job_id, log_type)
+        if log_type not in ['out', 'err']:
+            self.send_error_response(data['id'], 'Unknown log type.')
+            return
+
+        if subscription in self.log_subscriptions:
+            self.send_error_response(data['id'], 'Already subscribed.')
+            return
+
+        def on_data(offset, chunk):
+            self.send_log_data(job_id, log_type, offset, chunk)
+
+        def on_end():
+            self.log_subscriptions.pop(subscription, None)
+            self.send_log_end(job_id, log_type)
+
+        #-----------------------------------------------------------------------
+        # Follow the log of a running job
+        #-----------------------------------------------------------------------
+        if job_id in self.controller.running_jobs:
+            try:
+                follower = self.factory.get_log_follower(job_id, log_type)
+            except OSError:
+                follower = None
+
+            if follower is not None:
+                self.log_subscriptions[subscription] = follower
+                self.send_response(data['id'])
+                follower.subscribe(self, on_data, on_end, offset)
+                return
+
+        #-----------------------------------------------------------------------
+        # Send the log of a completed job
+        #-----------------------------------------------------------------------
+        path = os.path.join(self.controller.log_dir,
+                            '{}.{}'.format(job_id, log_type))
+        path = find_log(path)
+        if path is None:
+            self.send_error_response(data['id'], 'Log not found.')
+            return
+
+        self.log_subscriptions[subscription] = None
+        try:
+            offset, chunk = yield deferToThread(read_log_tail, path, offset)
+        except Exception as e:
+            self.log_subscriptions.pop(subscription, None)
+            self.send_error_response(data['id'], str(e))
+            return
+
+        if subscription not in self.log_subscriptions:
+            return  # unsubscribed in the meantime
+
+        self.send_response(data['id'])
+        if chunk:
+            on_data(offset, chunk.decode('utf-8', 'replace'))
+        on_end()
+
+    #---------------------------------------------------------------------------
+    def log_unsubscribe(self, data):
+        """
+        Execute a log unsubscription request.
+        """
+
+        subscription = (data.get('jobId'), data.get('logType'))
+        if subscription not in self.log_subscriptions:
+            self.send_error_response(data['id'], 'Not subscribed.')
+            return
+
+        follower = self.log_subscriptions.pop(subscription)
+        if follower is not None:
+            follower.unsubscribe(self)
+        self.send_response(data['id'])
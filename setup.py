@@ -143,5 +143,9 @@ setup(
     install_requires = [
         'scrapy', 'twisted', 'pyOpenSSL', 'psutil', 'python-dateutil',
         'schedule', 'pem', 'tabulate', 'requests', 'autobahn', 'tzlocal'
-    ]
+    ],
+    extras_require = {
+        'zstd': ['zstandard'],
+        'msgpack': ['msgpack']
+    }
 )
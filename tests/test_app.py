@@ -52,6 +52,11 @@ default_config = {
         'job-slots': 2,
         'completed-cap': 3
     },
+    'retry-policies': {},
+    'rate-limits': {},
+    'spider-tags': {},
+    'log-size-caps': {},
+    'event-listeners': {},
     'web': {
         'interfaces': '127.0.0.1:7654',
         'https': False,
@@ -103,6 +108,33 @@ class AppConfigTests(unittest.TestCase):
         self.assertEqual(len(web_config), 7)
         self.config['web']['https'] = False
 
+        #-----------------------------------------------------------------------
+        # Incorrect WebSocket batch window
+        #-----------------------------------------------------------------------
+        self.config['web']['ws-batch-window'] = -1.
+        self.assertRaises(ValueError,
+                          f=self.service_maker._validate_web_config,
+                          config=config)
+        del self.config['web']['ws-batch-window']
+
+        #-----------------------------------------------------------------------
+        # Incorrect WebSocket event buffer
+        #-----------------------------------------------------------------------
+        self.config['web']['ws-event-buffer'] = 0
+        self.assertRaises(ValueError,
+                          f=self.service_maker._validate_web_config,
+                          config=config)
+        del self.config['web']['ws-event-buffer']
+
+        #-----------------------------------------------------------------------
+        # Incorrect WebSocket queue limit
+        #-----------------------------------------------------------------------
+        self.config['web']['ws-queue-limit'] = 0
+        self.assertRaises(ValueError,
+                          f=self.service_maker._validate_web_config,
+                          config=config)
+        del self.config['web']['ws-queue-limit']
+
         #-----------------------------------------------------------------------
         # Incorrect HTTPS config
         #-----------------------------------------------------------------------
@@ -6,6 +6,8 @@
 #-------------------------------------------------------------------------------
 
 import configparser
+import requests
+import json
 import unittest
 import argparse
 import tempfile
@@ -14,7 +16,8 @@ import shutil
 import os
 
 from scrapy_do.client.archive import build_project_archive
-from scrapy_do.client.webclient import request
+from scrapy_do.client.webclient import request, stream, parse_events
+from scrapy_do.client import ClientException
 from unittest.mock import Mock, patch, DEFAULT
 
 import scrapy_do.client.commands as cmd
@@ -121,6 +124,48 @@ class ClientTests(unittest.TestCase):
             with self.assertRaises(Exception):
                 request('POST', 'foo')
 
+    #---------------------------------------------------------------------------
+    def test_event_stream(self):
+        #-----------------------------------------------------------------------
+        # Parsing
+        #-----------------------------------------------------------------------
+        lines = ['retry: 3000', '', ': keepalive', '', 'id: a:1',
+                 'event: FOO', 'data: {"a":', 'data:1}', '', 'data: 2', '']
+        events = list(parse_events(lines))
+        self.assertEqual(events, [('a:1', 'FOO', '{"a":\n1}'),
+                                  (None, 'message', '2')])
+
+        #-----------------------------------------------------------------------
+        # Reconnecting with the last event ID
+        #-----------------------------------------------------------------------
+        def get_response(lines, status_code=200):
+            response = Mock()
+            response.status_code = status_code
+            response.reason = 'Unauthorized'
+            response.iter_lines.return_value = lines
+            return response
+
+        with patch('requests.get') as get, patch('time.sleep'):
+            get.side_effect = [
+                get_response(['id: a:1', 'event: FOO', 'data: {}', '']),
+                requests.exceptions.ConnectionError('gone'),
+                get_response(['id: a:2', 'event: BAR', 'data: 1', '']),
+                get_response([], 401)
+            ]
+            events = stream('foo', auth=('test', 'test'), ssl_verify=False)
+            self.assertEqual(next(events), ('FOO', {}))
+            self.assertEqual(next(events), ('BAR', 1))
+            self.assertEqual(get.call_args[1]['headers']['Last-Event-ID'],
+                             'a:1')
+            with self.assertRaises(ClientException):
+                next(events)
+
+            get.reset_mock()
+            get.side_effect = requests.exceptions.ConnectionError('gone')
+            with self.assertRaises(ClientException):
+                list(stream('foo', max_retries=2))
+            self.assertEqual(get.call_count, 3)
+
     #---------------------------------------------------------------------------
     def test_url_setup(self):
         #-----------------------------------------------------------------------
@@ -157,13 +202,51 @@ class ClientTests(unittest.TestCase):
         cmd.list_spiders_arg_setup(subparsers)
         cmd.list_jobs_arg_setup(subparsers)
         cmd.get_log_arg_setup(subparsers)
+        cmd.search_logs_arg_setup(subparsers)
         cmd.push_project_arg_setup(subparsers)
         cmd.schedule_job_arg_setup(subparsers)
+        cmd.schedule_jobs_arg_setup(subparsers)
         cmd.cancel_job_arg_setup(subparsers)
         cmd.remove_project_arg_setup(subparsers)
+        cmd.watch_arg_setup(subparsers)
 
     #---------------------------------------------------------------------------
     def test_arg_process(self):
+        #-----------------------------------------------------------------------
+        # Search logs
+        #-----------------------------------------------------------------------
+        args = Mock()
+        args.pattern = 'foo'
+        args.level = None
+        args.project = 'bar'
+        args.spider = None
+        args.since = None
+        args.until = None
+        args.log_type = 'err'
+        args.limit = 10
+        payload = cmd.search_logs_arg_process(args)
+        self.assertEqual(payload, {'pattern': 'foo', 'project': 'bar',
+                                   'log-type': 'err', 'limit': 10})
+
+        args.pattern = None
+        with patch('sys.exit') as exit:
+            with patch('builtins.print'):
+                cmd.search_logs_arg_process(args)
+                exit.assert_called_once()
+
+        #-----------------------------------------------------------------------
+        # Get log
+        #-----------------------------------------------------------------------
+        args = Mock()
+        args.tail = None
+        args.since = None
+        self.assertEqual(cmd.get_log_arg_process(args), {})
+        args.tail = 10
+        self.assertEqual(cmd.get_log_arg_process(args), {'tail': 10})
+        args.tail = None
+        args.since = 100
+        self.assertEqual(cmd.get_log_arg_process(args), {'since': 100})
+
         #-----------------------------------------------------------------------
         # List spiders
         #-----------------------------------------------------------------------
@@ -224,6 +307,8 @@ class ClientTests(unittest.TestCase):
         args.when = 'now'
         args.description = 'bartitle'
         args.payload = '{}'
+        args.depends_on = []
+        args.retry = None
         payload = cmd.schedule_job_arg_process(args)
         self.assertIn('project', payload)
         self.assertIn('spider', payload)
@@ -235,6 +320,24 @@ class ClientTests(unittest.TestCase):
         self.assertEqual(payload['when'], 'now')
         self.assertEqual(payload['description'], 'bartitle')
         self.assertEqual(payload['payload'], '{}')
+        self.assertNotIn('dependencies', payload)
+
+        args.depends_on = ['baz', 'qux']
+        payload = cmd.schedule_job_arg_process(args)
+        self.assertEqual(payload['dependencies'], 'baz,qux')
+        self.assertNotIn('retry', payload)
+
+        args.retry = '{"attempts": 3}'
+        payload = cmd.schedule_job_arg_process(args)
+        self.assertEqual(payload['retry'], '{"attempts": 3}')
+
+        args.retry = 'foo'
+        with patch('sys.exit') as exit:
+            exit.side_effect = SystemExit()
+            with patch('builtins.print'):
+                with self.assertRaises(SystemExit):
+                    cmd.schedule_job_arg_process(args)
+        args.retry = None
 
         args.project = None
         with patch('sys.exit') as exit:
@@ -257,6 +360,45 @@ class ClientTests(unittest.TestCase):
                 cmd.schedule_job_arg_process(args)
                 exit.assert_called_once()
 
+        #-----------------------------------------------------------------------
+        # Schedule jobs
+        #-----------------------------------------------------------------------
+        temp_file = tempfile.mkstemp()
+        with open(temp_file[0], 'w') as f:
+            f.write('{"project": "foo", "spider": "bar"}\n\n')
+            f.write('{"project": "foo", "spider": "baz", '
+                    '"payload": {"a": 1}}\n')
+        args = Mock()
+        args.from_file = temp_file[1]
+        args.payload = '{"b": 2}'
+        payload = cmd.schedule_jobs_arg_process(args)
+        jobs = json.loads(payload['jobs'])
+        self.assertEqual(payload['payload'], '{"b": 2}')
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(jobs[1]['spider'], 'baz')
+        self.assertEqual(jobs[1]['payload'], {'a': 1})
+
+        args.payload = 'foo'
+        with patch('sys.exit') as exit:
+            exit.side_effect = SystemExit()
+            with patch('builtins.print'):
+                with self.assertRaises(SystemExit):
+                    cmd.schedule_jobs_arg_process(args)
+        args.payload = '{}'
+
+        with open(temp_file[1], 'w') as f:
+            f.write('{"project": "foo", "spider": "bar"}\n[1, 2]\n')
+
+        for from_file in [None, temp_file[1], temp_file[1] + 'foo']:
+            args.from_file = from_file
+            with patch('sys.exit') as exit:
+                exit.side_effect = SystemExit()
+                with patch('builtins.print'):
+                    with self.assertRaises(SystemExit):
+                        cmd.schedule_jobs_arg_process(args)
+                    exit.assert_called_once()
+        os.remove(temp_file[1])
+
         #-----------------------------------------------------------------------
         # Cancel Job
         #-----------------------------------------------------------------------
@@ -287,6 +429,16 @@ class ClientTests(unittest.TestCase):
                 cmd.remove_project_arg_process(args)
                 exit.assert_called_once()
 
+        #-----------------------------------------------------------------------
+        # Watch
+        #-----------------------------------------------------------------------
+        args = Mock()
+        args.types = None
+        self.assertEqual(cmd.watch_arg_process(args), {})
+        args.types = 'JOBS_STATUS'
+        self.assertEqual(cmd.watch_arg_process(args),
+                         {'types': 'JOBS_STATUS'})
+
     #---------------------------------------------------------------------------
     def test_rsp_parse(self):
         #-----------------------------------------------------------------------
@@ -299,6 +451,15 @@ class ClientTests(unittest.TestCase):
         self.assertIn(['foo1', 'bar1'], ret['data'])
         self.assertIn(['foo2', 'bar2'], ret['data'])
 
+        #-----------------------------------------------------------------------
+        # Search logs
+        #-----------------------------------------------------------------------
+        rsp = '{"identifier": "foo", "log-type": "err", "line": 2, ' \
+            '"offset": 10, "text": "bar"}\n\n'
+        ret = cmd.search_logs_rsp_parse(rsp)
+        self.assertEqual(ret['headers'], ['identifier', 'log', 'line', 'text'])
+        self.assertEqual(ret['data'], [['foo', 'err', 2, 'bar']])
+
         #-----------------------------------------------------------------------
         # List projects
         #-----------------------------------------------------------------------
@@ -358,6 +519,13 @@ class ClientTests(unittest.TestCase):
         self.assertIn('identifier', ret['headers'])
         self.assertIn(['foo'], ret['data'])
 
+        #-----------------------------------------------------------------------
+        # Schedule jobs
+        #-----------------------------------------------------------------------
+        ret = cmd.schedule_jobs_rsp_parse({'identifiers': ['foo', 'bar']})
+        self.assertIn('identifier', ret['headers'])
+        self.assertEqual([['foo'], ['bar']], ret['data'])
+
         #-----------------------------------------------------------------------
         # Cancel job
         #-----------------------------------------------------------------------
@@ -369,3 +537,23 @@ class ClientTests(unittest.TestCase):
         #-----------------------------------------------------------------------
         ret = cmd.remove_project_rsp_parse(rsp)
         self.assertEqual(ret, 'Removed.')
+
+        #-----------------------------------------------------------------------
+        # Watch
+        #-----------------------------------------------------------------------
+        job = {'identifier': 'foo', 'project': 'bar', 'spider': 'baz',
+               'status': 'RUNNING'}
+        ret = cmd.watch_rsp_parse(('JOB_BATCH_UPDATE',
+                                   {'jobs': [job], 'removed': ['qux']}))
+        self.assertEqual(ret, '[job] foo bar baz RUNNING\n[job] qux REMOVED')
+        ret = cmd.watch_rsp_parse(('JOB_BATCH_UPDATE',
+                                   {'jobs': [], 'removed': []}))
+        self.assertIsNone(ret)
+        ret = cmd.watch_rsp_parse(('JOBS_STATUS', {
+            'jobsScheduled': 1, 'jobsRun': 2, 'jobsSuccessful': 3,
+            'jobsFailed': 4, 'jobsCanceled': 5}))
+        self.assertEqual(ret, '[jobs] 1 scheduled, 2 run, 3 successful, '
+                              '4 failed, 5 canceled')
+        ret = cmd.watch_rsp_parse(('PROJECT_REMOVE', {'name': 'foo'}))
+        self.assertEqual(ret, '[project] foo removed')
+        self.assertIsNone(cmd.watch_rsp_parse(('SYNC', {})))
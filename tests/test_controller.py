@@ -6,13 +6,15 @@
 #-------------------------------------------------------------------------------
 
 import tempfile
+import gzip
 import shutil
 import uuid
 import json
 import os
 
 from twisted.internet.defer import inlineCallbacks
-from scrapy_do.controller import Controller
+from scrapy_do.controller import Controller, Event
+from scrapy_do.config import Config
 from scrapy_do.schedule import Status, Actor, Job
 from scrapy_do.utils import twisted_sleep, run_process
 from distutils.spawn import find_executable
@@ -20,6 +22,18 @@ from unittest.mock import Mock, patch, DEFAULT
 from twisted.trial import unittest
 
 
+#-------------------------------------------------------------------------------
+class EventRecorder:
+    event_types = [Event.PROJECT_PUSH, Event.PROJECT_REMOVE]
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.events = []
+
+    def __call__(self, event_type, event_data):
+        self.events.append((event_type, event_data))
+
+
 #-------------------------------------------------------------------------------
 class ControllerTests(unittest.TestCase):
 
@@ -32,9 +46,10 @@ class ControllerTests(unittest.TestCase):
             self.project_no_css_archive_data = f.read()
 
         self.temp_dir = tempfile.mkdtemp()
-        self.config = Mock()
-        self.config.get_string.return_value = self.temp_dir
-        self.config.get_int.return_value = 2
+        self.config = Config()
+        self.config.conf.set('scrapy-do', 'project-store', self.temp_dir)
+        self.config.conf.set('scrapy-do', 'job-slots', '2')
+        self.config.conf.set('scrapy-do', 'completed-cap', '2')
         self.controller = Controller(self.config)
 
     #---------------------------------------------------------------------------
@@ -60,11 +75,26 @@ class ControllerTests(unittest.TestCase):
 
         #-----------------------------------------------------------------------
         # Set up another controller with the same config to see if the state
-        # is reconstructed
+        # is reconstructed. The state should be reconstructed incrementally
+        # and the jobs canceled in the meantime should be skipped.
         #-----------------------------------------------------------------------
         controller = Controller(self.config)
+        controller.REHYDRATION_CHUNK = 1
+        self.assertEqual(len(controller.scheduler.jobs), 0)
+        d = controller.start_rehydration()
+        self.assertEqual(controller.rehydration_done, 0)
+        yield d
+        self.assertEqual(controller.rehydration_done, 2)
+        self.assertEqual(controller.rehydration_total, 2)
         self.assertEqual(len(controller.scheduler.jobs), 2)
         self.assertEqual(len(controller.get_jobs(Status.PENDING)), 2)
+
+        job_id = controller.schedule_job('quotesbot', 'toscrape-css',
+                                         'every 25 minutes')
+        controller3 = Controller(self.config)
+        yield controller3.cancel_job(job_id)
+        controller3.rehydrate()
+        self.assertEqual(len(controller3.scheduler.jobs), 2)
         yield twisted_sleep(3)
         controller.run_scheduler()
         pending_jobs = controller.get_jobs(Status.PENDING)
@@ -281,6 +311,311 @@ class ControllerTests(unittest.TestCase):
         self.assertEqual(len(scheduled_jobs), 1)
         self.assertEqual(len(pending_jobs), 2)
 
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_schedule_jobs(self):
+        controller = self.controller
+        yield controller.push_project(self.project_archive_data)
+        listener = Mock()
+        controller.add_event_listener(listener)
+
+        #-----------------------------------------------------------------------
+        # Invalid batches should not schedule anything
+        #-----------------------------------------------------------------------
+        invalid_batches = [
+            [{'project': 'quotesbot'}],
+            [{'project': 'quotesbot', 'spider': 'toscrape-css'}, 'foo'],
+            [{'project': 'quotesbot', 'spider': 'toscrape-css'},
+             {'project': 'quotesbot', 'spider': 'foo'}],
+            [{'project': 'quotesbot', 'spider': 'toscrape-css',
+              'when': 'every 2 foobar'}],
+            [{'project': 'quotesbot', 'spider': 'toscrape-css',
+              'payload': 'foo'}]
+        ]
+
+        for batch in invalid_batches:
+            try:
+                controller.schedule_jobs(batch)
+                self.fail('Scheduling an invalid batch should have risen '
+                          'a ValueError')
+            except ValueError as e:
+                self.assertTrue(str(e).startswith('Job #'))
+
+        self.assertEqual(len(controller.get_active_jobs()), 0)
+        self.assertEqual(len(controller.scheduler.jobs), 0)
+        listener.assert_not_called()
+        self.assertEqual(controller.schedule_jobs([]), [])
+
+        #-----------------------------------------------------------------------
+        # Valid batch
+        #-----------------------------------------------------------------------
+        batch = [
+            {'project': 'quotesbot', 'spider': 'toscrape-css',
+             'payload': {'test': 42}},
+            {'project': 'quotesbot', 'spider': 'toscrape-xpath',
+             'when': 'every 25 minutes', 'description': 'foo'},
+            {'project': 'quotesbot', 'spider': 'toscrape-css',
+             'payload': '{"test": 43}'}
+        ]
+        job_ids = controller.schedule_jobs(batch)
+        self.assertEqual(len(job_ids), 3)
+        listener.assert_not_called()
+        controller.event_bus.deliver()
+        self.assertEqual(listener.call_count, 1)
+        self.assertEqual(len(listener.call_args[0][1]), 3)
+
+        job1 = controller.get_job(job_ids[0])
+        job2 = controller.get_job(job_ids[1])
+        job3 = controller.get_job(job_ids[2])
+        self.assertEqual(job1.status, Status.PENDING)
+        self.assertEqual(job1.payload, '{"test": 42}')
+        self.assertEqual(job2.status, Status.SCHEDULED)
+        self.assertEqual(job2.description, 'foo')
+        self.assertEqual(job3.payload, '{"test": 43}')
+        self.assertEqual(len(controller.scheduler.jobs), 1)
+        self.assertIn(job_ids[1], controller.scheduled_jobs)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_dependencies(self):
+        controller = self.controller
+        yield controller.push_project(self.project_archive_data)
+
+        #-----------------------------------------------------------------------
+        # Invalid dependencies
+        #-----------------------------------------------------------------------
+        sched_id = controller.schedule_job('quotesbot', 'toscrape-css',
+                                           'every 25 minutes')
+        job_id1 = controller.schedule_job('quotesbot', 'toscrape-css', 'now')
+        invalid_deps = [
+            ('now', ['foo']),
+            ('now', [sched_id]),
+            ('every 25 minutes', [job_id1])
+        ]
+        for when, deps in invalid_deps:
+            with self.assertRaises(ValueError):
+                controller.schedule_job('quotesbot', 'toscrape-css', when,
+                                        dependencies=deps)
+
+        batch = [
+            {'project': 'quotesbot', 'spider': 'toscrape-css', 'name': 'a',
+             'dependencies': ['b']},
+            {'project': 'quotesbot', 'spider': 'toscrape-css', 'name': 'b',
+             'dependencies': ['a']}
+        ]
+        with self.assertRaises(ValueError):
+            controller.schedule_jobs(batch)
+        batch[0]['dependencies'] = []
+        batch[1]['name'] = 'a'
+        with self.assertRaises(ValueError):
+            controller.schedule_jobs(batch)
+        self.assertEqual(len(controller.get_active_jobs()), 2)
+
+        #-----------------------------------------------------------------------
+        # A chain of jobs: job1 -> job2 -> job3 and job1 -> job4
+        #-----------------------------------------------------------------------
+        job_id2 = controller.schedule_job('quotesbot', 'toscrape-xpath', 'now',
+                                          dependencies=[job_id1])
+        batch = [
+            {'project': 'quotesbot', 'spider': 'toscrape-css', 'name': 'job3',
+             'dependencies': [job_id2]},
+            {'project': 'quotesbot', 'spider': 'toscrape-xpath',
+             'dependencies': ['job3', job_id1]}
+        ]
+        job_id3, job_id5 = controller.schedule_jobs(batch, payload={'x': 1})
+        job_id4 = controller.schedule_job('quotesbot', 'toscrape-xpath', 'now',
+                                          dependencies=[job_id1])
+        self.assertEqual(controller.get_job(job_id2).status, Status.WAITING)
+        self.assertEqual(controller.get_job(job_id3).status, Status.WAITING)
+        self.assertEqual(controller.get_job(job_id3).payload, '{"x": 1}')
+        self.assertEqual(controller.get_job(job_id5).dependencies,
+                         [job_id1, job_id3])
+
+        #-----------------------------------------------------------------------
+        # Run the upstream job, the direct dependants should become pending
+        #-----------------------------------------------------------------------
+        controller.run_crawlers()
+        yield controller.wait_for_running_jobs()
+        self.assertEqual(controller.get_job(job_id1).status, Status.SUCCESSFUL)
+        self.assertEqual(controller.get_job(job_id2).status, Status.PENDING)
+        self.assertEqual(controller.get_job(job_id3).status, Status.WAITING)
+        self.assertEqual(controller.get_job(job_id4).status, Status.PENDING)
+
+        #-----------------------------------------------------------------------
+        # Depending on a successful job makes the job pending right away
+        #-----------------------------------------------------------------------
+        job_id6 = controller.schedule_job('quotesbot', 'toscrape-css', 'now',
+                                          dependencies=[job_id1])
+        self.assertEqual(controller.get_job(job_id6).status, Status.PENDING)
+
+        #-----------------------------------------------------------------------
+        # Canceling a job cancels everything downstream
+        #-----------------------------------------------------------------------
+        yield controller.cancel_job(job_id2)
+        self.assertEqual(controller.get_job(job_id3).status, Status.CANCELED)
+        self.assertEqual(controller.get_job(job_id5).status, Status.CANCELED)
+        self.assertEqual(controller.get_job(job_id4).status, Status.PENDING)
+
+        with self.assertRaises(ValueError):
+            controller.schedule_job('quotesbot', 'toscrape-css', 'now',
+                                    dependencies=[job_id2])
+
+        #-----------------------------------------------------------------------
+        # Waiting jobs should be re-evaluated on start-up
+        #-----------------------------------------------------------------------
+        job1 = Job(Status.WAITING, Actor.USER, None, 'quotesbot',
+                   'toscrape-css', dependencies=[job_id1])
+        job2 = Job(Status.WAITING, Actor.USER, None, 'quotesbot',
+                   'toscrape-css', dependencies=[str(uuid.uuid4())])
+        job3 = Job(Status.WAITING, Actor.USER, None, 'quotesbot',
+                   'toscrape-css', dependencies=[job_id4])
+        controller.schedule.add_jobs([job1, job2, job3])
+        controller = Controller(self.config)
+        controller.rehydrate()
+        self.assertEqual(controller.get_job(job1.identifier).status,
+                         Status.PENDING)
+        self.assertEqual(controller.get_job(job2.identifier).status,
+                         Status.PENDING)
+        self.assertEqual(controller.get_job(job3.identifier).status,
+                         Status.WAITING)
+        yield controller.cancel_job(job3.identifier)
+        self.assertEqual(controller.get_job(job3.identifier).status,
+                         Status.CANCELED)
+
+        #-----------------------------------------------------------------------
+        # An upstream job purged after succeeding counts as successful
+        #-----------------------------------------------------------------------
+        upstream1 = Job(Status.SUCCESSFUL, Actor.USER, None, 'quotesbot',
+                        'toscrape-css')
+        upstream2 = Job(Status.RUNNING, Actor.USER, None, 'quotesbot',
+                        'toscrape-css')
+        dependant = Job(Status.WAITING, Actor.USER, None, 'quotesbot',
+                        'toscrape-css', dependencies=[upstream1.identifier,
+                                                      upstream2.identifier])
+        controller.schedule.add_jobs([upstream1, upstream2, dependant])
+        controller.completed_cap = 0
+        controller.purge_completed_jobs()
+        with self.assertRaises(ValueError):
+            controller.get_job(upstream1.identifier)
+
+        upstream2.status = Status.SUCCESSFUL
+        controller.schedule.commit_job(upstream2)
+        controller._update_dependants(upstream2)
+        self.assertEqual(controller.get_job(dependant.identifier).status,
+                         Status.PENDING)
+
+    #---------------------------------------------------------------------------
+    def test_retry_policy(self):
+        #-----------------------------------------------------------------------
+        # Policy resolution
+        #-----------------------------------------------------------------------
+        self.config.conf.set('scrapy-do', 'retry-attempts', '1')
+        self.config.conf.set('scrapy-do', 'retry-exit-codes', '1, 2')
+        self.config.conf.set('retry-policies', 'foo', '{"attempts": 3}')
+        self.config.conf.set('retry-policies', 'foo/Bar',
+                             '{"backoff-base": 1}')
+        controller = Controller(self.config)
+
+        job = Job(Status.PENDING, Actor.USER, 'now', 'foo', 'bar',
+                  retry='{"backoff-cap": 2}')
+        policy = controller.get_retry_policy(job)
+        self.assertEqual(policy['attempts'], 3)
+        self.assertEqual(policy['backoff-base'], 1)
+        self.assertEqual(policy['backoff-cap'], 2)
+        self.assertEqual(policy['exit-codes'], [1, 2])
+
+        job = Job(Status.PENDING, Actor.USER, 'now', 'baz', 'bar')
+        policy = controller.get_retry_policy(job)
+        self.assertEqual(policy['attempts'], 1)
+        self.assertEqual(policy['backoff-base'], 30)
+
+        #-----------------------------------------------------------------------
+        # Invalid policies
+        #-----------------------------------------------------------------------
+        invalid_policies = ['{"foo": 1}', '{"attempts": "foo"}',
+                            '{"attempts": -1}', '{"exit-codes": ["foo"]}',
+                            '[1, 2]', 'foo']
+        for policy in invalid_policies:
+            self.config.conf.set('retry-policies', 'foo', policy)
+            with self.assertRaises(ValueError):
+                Controller(self.config)
+        self.config.conf.remove_option('retry-policies', 'foo')
+
+        self.config.conf.set('scrapy-do', 'retry-exit-codes', 'foo')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_retry(self):
+        controller = self.controller
+        yield controller.push_project(self.project_archive_data)
+
+        with self.assertRaises(ValueError):
+            controller.schedule_job('quotesbot', 'toscrape-css', 'now',
+                                    retry='{"attempts": "foo"}')
+
+        #-----------------------------------------------------------------------
+        # Make the job fail by requesting a non-existent spider
+        #-----------------------------------------------------------------------
+        retry = {'attempts': 2, 'backoff-base': 0.1, 'exit-codes': [1]}
+        job = Job(Status.PENDING, Actor.USER, 'now', 'quotesbot', 'foo',
+                  retry=json.dumps(retry))
+        job_id = job.identifier
+        controller.schedule.add_job(job)
+        dep_id = controller.schedule_job('quotesbot', 'toscrape-css', 'now',
+                                         dependencies=[job_id])
+
+        for attempt in range(3):
+            controller.run_crawlers()
+            yield controller.wait_for_running_jobs()
+            yield twisted_sleep(0.1 * 2 ** attempt + 0.1)
+
+        #-----------------------------------------------------------------------
+        # Check the attempts
+        #-----------------------------------------------------------------------
+        attempts = controller.schedule.get_attempts(job_id)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(controller.get_job(job_id).status, Status.FAILED)
+        for i, attempt in enumerate(attempts):
+            self.assertEqual(attempt.status, Status.FAILED)
+            self.assertEqual(attempt.attempt, i + 2)
+            self.assertEqual(attempt.origin, job_id)
+            self.assertEqual(attempt.retry, job.retry)
+        self.assertEqual(controller.counter_retry, 2)
+        self.assertEqual(len(controller.retry_timers), 0)
+
+        dep = controller.get_job(dep_id)
+        self.assertEqual(dep.status, Status.CANCELED)
+        self.assertEqual(dep.dependencies, [attempts[-1].identifier])
+
+        #-----------------------------------------------------------------------
+        # Canceling a retry waiting for its timer
+        #-----------------------------------------------------------------------
+        job = controller.get_job(job_id)
+        job.attempt = 1
+        retry = controller._retry_job(job, 1)
+        self.assertIn(retry.identifier, controller.retry_timers)
+        yield controller.cancel_job(retry.identifier)
+        self.assertEqual(len(controller.retry_timers), 0)
+
+        #-----------------------------------------------------------------------
+        # Exit codes not listed in the policy do not trigger a retry
+        #-----------------------------------------------------------------------
+        self.assertIsNone(controller._retry_job(job, 2))
+
+        #-----------------------------------------------------------------------
+        # Waiting retries are re-armed on start-up
+        #-----------------------------------------------------------------------
+        retry = controller._retry_job(job, 1)
+        controller.retry_timers[retry.identifier].cancel()
+        controller = Controller(self.config)
+        controller.rehydrate()
+        self.assertIn(retry.identifier, controller.retry_timers)
+        yield twisted_sleep(0.2)
+        self.assertEqual(controller.get_job(retry.identifier).status,
+                         Status.PENDING)
+
     #---------------------------------------------------------------------------
     @inlineCallbacks
     def test_run_scheduler(self):
@@ -330,6 +665,30 @@ class ControllerTests(unittest.TestCase):
         self.assertFalse(os.path.exists(out_path))
         self.assertFalse(os.path.exists(err_path))
 
+        #-----------------------------------------------------------------------
+        # Capture the output and cap it
+        #-----------------------------------------------------------------------
+        data_path = os.path.join(temp_dir, 'data')
+        with open(data_path, 'wb') as f:
+            f.write(b'a' * 100000 + b'b' * 100000)
+        process, exit_status = run_process('cat', [data_path, 'foo'], 'foo',
+                                           temp_dir, size_cap=1000)
+        status = yield exit_status
+        self.assertEqual(status, 1)
+        with open(out_path, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b'a' * 500 + b'\n[scrapy-do] 199000'))
+        self.assertTrue(data.endswith(b'truncated\n' + b'b' * 500))
+        with open(err_path, 'rb') as f:
+            self.assertIn(b'foo', f.read())
+
+        process, exit_status = run_process('cat', ['/dev/null'], 'foo',
+                                           temp_dir, size_cap=1000)
+        status = yield exit_status
+        self.assertEqual(status, 0)
+        self.assertFalse(os.path.exists(out_path))
+        self.assertFalse(os.path.exists(err_path))
+
         shutil.rmtree(temp_dir)
 
     #---------------------------------------------------------------------------
@@ -441,6 +800,10 @@ class ControllerTests(unittest.TestCase):
             else:
                 self.assertEqual(log[0], None)
             self.assertNotEqual(log[1], None)
+            self.assertEqual(job.logs['err'], os.path.getsize(log[1]))
+            self.assertEqual('out' in job.logs, log[0] is not None)
+            self.assertEqual(controller._read_log_sizes(job.identifier),
+                             job.logs)
 
         #-----------------------------------------------------------------------
         # Test failure to spawn a job
@@ -451,6 +814,7 @@ class ControllerTests(unittest.TestCase):
         yield controller.wait_for_starting_jobs()
         job = controller.get_job(job.identifier)
         self.assertEqual(job.status, Status.FAILED)
+        self.assertEqual(job.logs, {})
 
         #-----------------------------------------------------------------------
         # Spawn a job but then kill it
@@ -465,6 +829,69 @@ class ControllerTests(unittest.TestCase):
         self.assertEqual(len(controller.get_active_jobs()), 4)
         self.assertEqual(len(controller.get_completed_jobs()), 6)
 
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_rate_limits(self):
+        self.config.conf.set('rate-limits', 'quotesbot/toscrape-css',
+                             '1/minute')
+        self.config.conf.set('rate-limits', 'tag:toscrape', '1/hour')
+        self.config.conf.set('spider-tags', 'QuotesBot/toscrape-xpath',
+                             'toscrape, foo')
+        controller = Controller(self.config)
+        yield controller.push_project(self.project_archive_data)
+        self.assertEqual(len(controller._get_rate_limiters(
+            Job(project='quotesbot', spider='toscrape-xpath'))), 1)
+
+        for spider in ['toscrape-css'] * 3 + ['toscrape-xpath'] * 2:
+            controller.schedule_job('quotesbot', spider, 'now')
+
+        #-----------------------------------------------------------------------
+        # Only one job per limit should start even though there are free slots
+        #-----------------------------------------------------------------------
+        for _ in range(2):
+            controller.run_crawlers()
+            yield controller.wait_for_running_jobs()
+
+        successful = controller.get_jobs(Status.SUCCESSFUL)
+        self.assertEqual(len(successful), 2)
+        self.assertEqual(set(job.spider for job in successful),
+                         set(['toscrape-css', 'toscrape-xpath']))
+        self.assertEqual(len(controller.get_jobs(Status.PENDING)), 3)
+
+        #-----------------------------------------------------------------------
+        # Invalid limits
+        #-----------------------------------------------------------------------
+        self.config.conf.set('rate-limits', 'quotesbot', 'foo')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_cancel_running_output(self):
+        controller = self.controller
+        yield controller.push_project(self.project_archive_data)
+        job_id = controller.schedule_job('quotesbot', 'toscrape-css', 'now')
+        controller.run_crawlers()
+        yield controller.wait_for_starting_jobs()
+
+        #-----------------------------------------------------------------------
+        # Wait for some output and cancel; the logs and the metrics recorded
+        # when the process exits need to survive the cancellation
+        #-----------------------------------------------------------------------
+        log_path = os.path.join(controller.log_dir, job_id + '.err')
+        while not os.path.exists(log_path) or not os.path.getsize(log_path):
+            yield twisted_sleep(0.1)
+
+        metrics = {'finish_reason': 'shutdown'}
+        with patch('scrapy_do.controller.get_metrics', return_value=metrics):
+            yield controller.cancel_job(job_id)
+
+        job = controller.get_job(job_id)
+        self.assertEqual(job.status, Status.CANCELED)
+        self.assertIn('err', job.logs)
+        self.assertEqual(job.metrics, metrics)
+        self.assertTrue(os.path.exists(log_path))
+
     #---------------------------------------------------------------------------
     @inlineCallbacks
     def test_cancel(self):
@@ -574,6 +1001,164 @@ class ControllerTests(unittest.TestCase):
             log_file = os.path.join(controller.log_dir, job.identifier + '.err')
             self.assertFalse(os.path.exists(log_file))
 
+    #---------------------------------------------------------------------------
+    def test_log_size_caps(self):
+        self.config.conf.set('scrapy-do', 'log-size-cap', '10M')
+        self.config.conf.set('log-size-caps', 'Foo', '1k')
+        self.config.conf.set('log-size-caps', 'foo/bar', '0')
+        controller = Controller(self.config)
+        self.assertEqual(controller.get_log_size_cap('foo', 'bar'), None)
+        self.assertEqual(controller.get_log_size_cap('foo', 'baz'), 1024)
+        self.assertEqual(controller.get_log_size_cap('qux', 'baz'),
+                         10 * 1024 ** 2)
+
+        self.config.conf.set('log-size-caps', 'foo', 'bar')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_log_retention(self):
+        self.config.conf.set('scrapy-do', 'log-budget', 'foo')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+        self.config.conf.set('scrapy-do', 'log-budget', '')
+        self.config.conf.set('scrapy-do', 'log-max-age', 'foo')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+
+        self.config.conf.set('scrapy-do', 'log-max-age', '30d')
+        self.config.conf.set('scrapy-do', 'log-budget', '1')
+        controller = Controller(self.config)
+        self.assertEqual(controller.log_retention.budget, 1)
+        self.assertEqual(controller.log_retention.max_age, 30 * 86400)
+        yield controller.push_project(self.project_archive_data)
+        job_id = controller.schedule_job('quotesbot', 'toscrape-css', 'now')
+        controller.run_crawlers()
+        yield controller.wait_for_running_jobs()
+        self.assertIn('err', controller.get_job(job_id).logs)
+
+        #-----------------------------------------------------------------------
+        # The logs of the running jobs are protected
+        #-----------------------------------------------------------------------
+        controller.running_jobs[job_id] = None
+        yield controller.enforce_log_retention()
+        self.assertNotEqual(controller.get_job_logs(job_id)[1], None)
+        self.assertTrue(controller.log_retention.usage > 1)
+        del controller.running_jobs[job_id]
+
+        listener = Mock()
+        controller.add_event_listener(listener)
+        yield controller.enforce_log_retention()
+        self.assertEqual(controller.get_job_logs(job_id), (None, None))
+        self.assertEqual(controller.get_job(job_id).logs, {})
+        self.assertEqual(controller.log_retention.usage, 0)
+        self.assertEqual(controller.log_retention.evicted, 1)
+        controller.event_bus.deliver()
+        listener.assert_called()
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_feeds(self):
+        self.config.conf.set('scrapy-do', 'feed-compression', 'foo')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+
+        self.config.conf.set('scrapy-do', 'feeds', 'on')
+        self.config.conf.set('scrapy-do', 'feed-compression', 'gzip')
+        controller = Controller(self.config)
+        yield controller.push_project(self.project_archive_data)
+        job_id = controller.schedule_job('quotesbot', 'toscrape-css', 'now')
+        controller.run_crawlers()
+        yield controller.wait_for_running_jobs()
+
+        #-----------------------------------------------------------------------
+        # The spider can't reach the network here, so the feed is empty and
+        # removed
+        #-----------------------------------------------------------------------
+        job = controller.get_job(job_id)
+        log_path = controller.get_job_logs(job_id)[1]
+        with open(log_path, 'r') as f:
+            self.assertIn(os.path.join(controller.feed_dir, job_id + '.jl'),
+                          f.read())
+        self.assertIsNone(job.feed)
+        self.assertIsNone(controller.get_job_feed(job_id))
+
+        feed_path = os.path.join(controller.feed_dir, job_id + '.jl')
+        with open(feed_path, 'w') as f:
+            f.write('{"text": "foo"}\n')
+        yield controller._finalize_output(job)
+        job = controller.get_job(job_id)
+        feed_path = controller.get_job_feed(job_id)
+        self.assertEqual(job.feed['file'], job_id + '.jl.gz')
+        self.assertEqual(job.feed['size'], os.path.getsize(feed_path))
+        with gzip.open(feed_path, 'rb') as f:
+            self.assertEqual(f.read(), b'{"text": "foo"}\n')
+
+        with self.assertRaises(ValueError):
+            controller.get_job_feed('foo')
+
+        controller.completed_cap = 0
+        controller.purge_completed_jobs()
+        self.assertFalse(os.path.exists(feed_path))
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_log_compression(self):
+        self.config.conf.set('scrapy-do', 'log-compression', 'foo')
+        with self.assertRaises(ValueError):
+            Controller(self.config)
+
+        self.config.conf.set('scrapy-do', 'log-compression', 'gzip')
+        controller = Controller(self.config)
+        yield controller.push_project(self.project_archive_data)
+        job_id = controller.schedule_job('quotesbot', 'toscrape-css', 'now')
+        controller.run_crawlers()
+        yield controller.wait_for_running_jobs()
+
+        log_file = os.path.join(controller.log_dir, job_id + '.err')
+        self.assertFalse(os.path.exists(log_file))
+        self.assertTrue(os.path.exists(log_file + '.gz'))
+        with gzip.open(log_file + '.gz', 'rb') as f:
+            self.assertIn(b'Spider closed', f.read())
+        self.assertEqual(controller.get_job_logs(job_id)[1], log_file + '.gz')
+        self.assertTrue(os.path.exists(log_file + '.idx'))
+
+        metrics = controller.get_job(job_id).metrics
+        self.assertEqual(metrics['finish_reason'], 'finished')
+        self.assertIn('log_count/INFO', metrics)
+
+        #-----------------------------------------------------------------------
+        # The log sizes are those of the uncompressed logs and are looked up
+        # on rehydration for the jobs that don't have them
+        #-----------------------------------------------------------------------
+        job = controller.get_job(job_id)
+        logs = job.logs
+        self.assertNotEqual(logs['err'], os.path.getsize(log_file + '.gz'))
+        job.logs = None
+        controller.schedule.commit_job(job)
+        controller.rehydrate()
+        self.assertEqual(controller.get_job(job_id).logs, logs)
+
+        #-----------------------------------------------------------------------
+        # The incremental rehydration looks the sizes up in a thread and
+        # doesn't resurrect the jobs removed in the meantime
+        #-----------------------------------------------------------------------
+        controller.schedule.commit_job(job)
+        d = controller.start_rehydration()
+        self.assertIsNone(controller.get_job(job_id).logs)
+        yield d
+        self.assertEqual(controller.get_job(job_id).logs, logs)
+
+        controller._store_log_sizes(logs, 'foo')
+        with self.assertRaises(ValueError):
+            controller.schedule.get_job('foo')
+
+        controller.completed_cap = 0
+        controller.purge_completed_jobs()
+        self.assertFalse(os.path.exists(log_file + '.gz'))
+        self.assertFalse(os.path.exists(log_file + '.idx'))
+
     #---------------------------------------------------------------------------
     @inlineCallbacks
     def test_remove_project(self):
@@ -609,8 +1194,38 @@ class ControllerTests(unittest.TestCase):
         listener = Mock()
         controller.add_event_listener(listener)
         controller.dispatch_periodic_events()
+        controller.event_bus.deliver()
+        self.assertEqual(listener.call_count, 1)
+
+        #-----------------------------------------------------------------------
+        # The memory usage comes from the sampled metrics
+        #-----------------------------------------------------------------------
+        controller.dispatch_periodic_events()
+        controller.event_bus.deliver()
+        self.assertEqual(listener.call_count, 1)
+        snapshot = dict(controller.metrics.get_snapshot())
+        snapshot['memory-usage'] += 2
+        controller.metrics.snapshot = snapshot
+        controller.dispatch_periodic_events()
+        controller.event_bus.deliver()
+        self.assertEqual(listener.call_count, 2)
         controller.remove_event_listener(listener)
 
+        #-----------------------------------------------------------------------
+        # Listeners configured as plugins
+        #-----------------------------------------------------------------------
+        self.config.conf.set('event-listeners', 'recorder',
+                             'tests.test_controller.EventRecorder')
+        controller = Controller(self.config)
+        recorders = [listener.callback for listener in
+                     controller.event_bus.listeners.values()]
+        self.assertEqual(len(recorders), 1)
+        self.assertIs(recorders[0].controller, controller)
+        controller.dispatch_event(Event.DAEMON_STATUS_CHANGE, None)
+        controller.dispatch_event(Event.PROJECT_REMOVE, 'foo')
+        controller.event_bus.deliver()
+        self.assertEqual(recorders[0].events, [(Event.PROJECT_REMOVE, 'foo')])
+
     #---------------------------------------------------------------------------
     def tearDown(self):
         shutil.rmtree(self.temp_dir)
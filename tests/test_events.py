@@ -0,0 +1,90 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+from scrapy_do.events import EventBus, Event, get_listener_name
+from twisted.internet.task import Clock
+from twisted.trial import unittest
+from unittest.mock import Mock
+
+
+#-------------------------------------------------------------------------------
+class EventsTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_event_bus(self):
+        clock = Clock()
+        bus = EventBus(clock)
+        listener = Mock()
+        projects_listener = Mock()
+        bus.add_listener(listener)
+        bus.add_listener(projects_listener, [Event.PROJECT_PUSH])
+
+        with self.assertRaises(TypeError):
+            bus.add_listener(Mock(), ['PROJECT_PUSH'])
+        with self.assertRaises(TypeError):
+            bus.dispatch('JOB_UPDATE', None)
+
+        #-----------------------------------------------------------------------
+        # The events are delivered later, in order, and only to the listeners
+        # that want them
+        #-----------------------------------------------------------------------
+        bus.dispatch(Event.JOB_UPDATE, 'job')
+        bus.dispatch(Event.PROJECT_PUSH, 'project')
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        listener.assert_not_called()
+        self.assertEqual(bus.get_stats()['pending'], 2)
+
+        clock.advance(0)
+        self.assertEqual([c[0] for c in listener.call_args_list],
+                         [(Event.JOB_UPDATE, 'job'),
+                          (Event.PROJECT_PUSH, 'project')])
+        projects_listener.assert_called_once_with(Event.PROJECT_PUSH,
+                                                  'project')
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+        #-----------------------------------------------------------------------
+        # A failing listener doesn't affect the others
+        #-----------------------------------------------------------------------
+        def failing(event_type, event_data):
+            bus.dispatch(Event.JOB_REMOVE, 'job')
+            raise RuntimeError('foo')
+        bus.add_listener(failing, [Event.DAEMON_STATUS_CHANGE])
+        bus.dispatch(Event.DAEMON_STATUS_CHANGE, None)
+        clock.advance(0)
+        self.assertEqual(listener.call_args[0], (Event.JOB_REMOVE, 'job'))
+        self.assertEqual(listener.call_count, 4)
+        self.assertEqual(clock.getDelayedCalls(), [])
+        self.flushLoggedErrors()
+
+        #-----------------------------------------------------------------------
+        # Statistics
+        #-----------------------------------------------------------------------
+        stats = bus.get_stats()
+        self.assertEqual(stats['dispatched'], 4)
+        self.assertEqual(stats['pending'], 0)
+        failing_stats = stats['listeners'][get_listener_name(failing)]
+        self.assertEqual(failing_stats['events'], 1)
+        self.assertEqual(failing_stats['errors'], 1)
+        listener_stats = stats['listeners']['unittest.mock.Mock#1']
+        self.assertEqual(listener_stats['events'], 4)
+        self.assertEqual(listener_stats['errors'], 0)
+        self.assertGreaterEqual(listener_stats['max-latency'],
+                                listener_stats['max-time'])
+        self.assertEqual(stats['listeners']['unittest.mock.Mock#2']['events'],
+                         1)
+
+        #-----------------------------------------------------------------------
+        # The removed listeners don't get the pending events
+        #-----------------------------------------------------------------------
+        bus.dispatch(Event.PROJECT_PUSH, 'project')
+        bus.remove_listener(projects_listener)
+        with self.assertRaises(KeyError):
+            bus.remove_listener(projects_listener)
+        bus.deliver()
+        self.assertEqual(projects_listener.call_count, 1)
+        self.assertEqual(listener.call_count, 5)
+        self.assertEqual(clock.getDelayedCalls(), [])
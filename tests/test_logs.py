@@ -0,0 +1,569 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+import tempfile
+import gzip
+import re
+import shutil
+import os
+
+from twisted.internet.defer import Deferred, inlineCallbacks
+from scrapy_do.logs import LogWatcher, LogFileProducer, inotify
+from scrapy_do.logs import tail_offset, parse_range, accepts_encoding
+from scrapy_do.logs import compress_log, find_log, open_log, get_log_size
+from scrapy_do.logs import build_log_index, load_log_index, search_log
+from scrapy_do.logs import get_index_path, LogFollower, read_log_tail
+from scrapy_do.logs import parse_stats_dump, get_metrics, LogRetention
+from scrapy_do.logs import zstandard, open_log_at
+from scrapy_do.utils import twisted_sleep, CappedLogFile
+from twisted.python.failure import Failure
+from twisted.trial import unittest
+from unittest.mock import Mock, patch
+
+
+#-------------------------------------------------------------------------------
+class LogsTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, 'foo.out')
+        with open(self.log_file, 'wb') as f:
+            f.write(b'foo')
+
+    #---------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def check_watcher(self, watcher):
+        callback1 = Mock()
+        callback2 = Mock()
+        watcher.watch(self.log_file, callback1)
+        watcher.watch(self.log_file, callback2)
+        self.assertEqual(len(watcher.callbacks), 1)
+
+        with open(self.log_file, 'ab') as f:
+            f.write(b'bar')
+        yield twisted_sleep(0.1)
+        callback1.assert_called()
+        callback2.assert_called()
+
+        watcher.unwatch(self.log_file, callback1)
+        watcher.unwatch(self.log_file, callback1)
+        callback2.reset_mock()
+        watcher.notify(self.log_file)
+        callback2.assert_called_once()
+
+        watcher.unwatch(self.log_file, callback2)
+        self.assertEqual(watcher.callbacks, {})
+        self.assertIsNone(watcher.poll_loop)
+        self.assertIsNone(watcher.notifier)
+
+    #---------------------------------------------------------------------------
+    def test_watcher_polling(self):
+        return self.check_watcher(LogWatcher(poll_interval=0.01,
+                                             use_inotify=False))
+
+    #---------------------------------------------------------------------------
+    def test_watcher_inotify(self):
+        if inotify is None:
+            raise unittest.SkipTest('inotify is not available')
+        watcher = LogWatcher()
+        return self.check_watcher(watcher)
+
+    #---------------------------------------------------------------------------
+    def test_producer(self):
+        #-----------------------------------------------------------------------
+        # Write the data chunk by chunk pausing after every write
+        #-----------------------------------------------------------------------
+        with open(self.log_file, 'wb') as f:
+            f.write(b'a' * (2 * LogFileProducer.CHUNK_SIZE + 1))
+
+        watcher = LogWatcher(use_inotify=False)
+        request = Mock()
+        request.notifyFinish.return_value = Deferred()
+        producer = LogFileProducer(request, self.log_file, watcher,
+                                   lambda: False)
+        request.write.side_effect = lambda data: producer.pauseProducing()
+        d = producer.start()
+        request.registerProducer.assert_called_once_with(producer, True)
+
+        for i in range(3):
+            self.assertEqual(request.write.call_count, i + 1)
+            request.finish.assert_not_called()
+            producer.resumeProducing()
+
+        request.finish.assert_called_once()
+        self.assertTrue(d.called)
+        data = b''.join([c[0][0] for c in request.write.call_args_list])
+        self.assertEqual(len(data), 2 * LogFileProducer.CHUNK_SIZE + 1)
+
+        #-----------------------------------------------------------------------
+        # Lose the connection while following
+        #-----------------------------------------------------------------------
+        request = Mock()
+        request.notifyFinish.return_value = Deferred()
+        producer = LogFileProducer(request, self.log_file, watcher,
+                                   lambda: True)
+        d = producer.start()
+        self.assertIn(self.log_file, watcher.callbacks)
+        request.notifyFinish.return_value.errback(Failure(IOError()))
+        self.assertTrue(d.called)
+        self.assertEqual(watcher.callbacks, {})
+        request.finish.assert_not_called()
+
+        #-----------------------------------------------------------------------
+        # Read error
+        #-----------------------------------------------------------------------
+        request = Mock()
+        request.notifyFinish.return_value = Deferred()
+        producer = LogFileProducer(request, self.log_file, watcher,
+                                   lambda: False)
+        with patch('builtins.open') as mock_open:
+            mock_open.return_value.read.side_effect = IOError()
+            producer.start()
+        request.setResponseCode.assert_called_once_with(500)
+        request.finish.assert_called_once()
+
+        #-----------------------------------------------------------------------
+        # Ranged reads don't follow the log
+        #-----------------------------------------------------------------------
+        request = Mock()
+        request.notifyFinish.return_value = Deferred()
+        producer = LogFileProducer(request, self.log_file, watcher,
+                                   lambda: True, 10, 20)
+        d = producer.start()
+        self.assertTrue(d.called)
+        data = b''.join([c[0][0] for c in request.write.call_args_list])
+        self.assertEqual(data, b'a' * 10)
+        request.finish.assert_called_once()
+
+    #---------------------------------------------------------------------------
+    def test_tail_offset(self):
+        with open(self.log_file, 'wb') as f:
+            f.write(b'line1\nline2\nline3\n')
+        self.assertEqual(tail_offset(self.log_file, 0), 18)
+        self.assertEqual(tail_offset(self.log_file, 1), 12)
+        self.assertEqual(tail_offset(self.log_file, 2), 6)
+        self.assertEqual(tail_offset(self.log_file, 3), 0)
+        self.assertEqual(tail_offset(self.log_file, 10), 0)
+        self.assertEqual(tail_offset(self.log_file, 2, block_size=4), 6)
+
+        with open(self.log_file, 'wb') as f:
+            f.write(b'line1\nline2')
+        self.assertEqual(tail_offset(self.log_file, 1, block_size=1), 6)
+
+        with open(self.log_file, 'wb') as f:
+            pass
+        self.assertEqual(tail_offset(self.log_file, 5), 0)
+
+    #---------------------------------------------------------------------------
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 10))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 100))
+        self.assertEqual(parse_range('bytes=50-', 100), (50, 100))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 100))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 100))
+        for header in ['bytes=-', 'foo', 'bytes=0-1,5-6', 'bytes=100-',
+                       'bytes=5-2', 'bytes=-0']:
+            with self.assertRaises(ValueError):
+                parse_range(header, 100)
+
+    #---------------------------------------------------------------------------
+    def test_compression(self):
+        data = b''.join(['line{}\n'.format(i).encode('utf-8')
+                         for i in range(10000)])
+        with open(self.log_file, 'wb') as f:
+            f.write(data)
+
+        self.assertEqual(find_log(self.log_file), self.log_file)
+        compressed = compress_log(self.log_file, 'gzip')
+        self.assertEqual(compressed, self.log_file + '.gz')
+        self.assertFalse(os.path.exists(self.log_file))
+        self.assertEqual(find_log(self.log_file), compressed)
+        self.assertIsNone(find_log(self.log_file + '.foo'))
+        with gzip.open(compressed, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        with open_log(compressed) as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(get_log_size(compressed), len(data))
+        self.assertEqual(tail_offset(compressed, 2), len(data) - 18)
+        self.assertEqual(tail_offset(compressed, 2, block_size=3),
+                         len(data) - 18)
+        self.assertEqual(tail_offset(compressed, 0), len(data))
+        self.assertEqual(tail_offset(compressed, 20000), 0)
+
+        with self.assertRaises(ValueError):
+            compress_log(compressed, 'foo')
+
+        #-----------------------------------------------------------------------
+        # Stream the decompressed data
+        #-----------------------------------------------------------------------
+        request = Mock()
+        request.notifyFinish.return_value = Deferred()
+        producer = LogFileProducer(request, compressed, LogWatcher(),
+                                   lambda: False, 6)
+        producer.start()
+        result = b''.join([c[0][0] for c in request.write.call_args_list])
+        self.assertEqual(result, data[6:])
+
+    #---------------------------------------------------------------------------
+    def test_open_log_at(self):
+        data = b''.join(['line{}\n'.format(i).encode('utf-8')
+                         for i in range(1000)]) + b'last'
+        with open(self.log_file, 'wb') as f:
+            f.write(data)
+
+        f, offset = open_log_at(self.log_file, 10)
+        with f:
+            self.assertEqual(offset, 10)
+            self.assertEqual(f.read(4), data[10:14])
+
+        expected = tail_offset(self.log_file, 3)
+        f, offset = open_log_at(self.log_file, lines=3)
+        with f:
+            self.assertEqual(offset, expected)
+            self.assertEqual(f.read(), data[expected:])
+
+        #-----------------------------------------------------------------------
+        # The compressed logs with an index are positioned in a single pass
+        #-----------------------------------------------------------------------
+        build_log_index(self.log_file)
+        compressed = compress_log(self.log_file, 'gzip')
+        self.assertEqual(get_log_size(compressed), len(data))
+        with patch('scrapy_do.logs._tail_offset_forward') as forward:
+            for lines, start in [(3, expected), (0, len(data)),
+                                 (2000, 0)]:
+                f, offset = open_log_at(compressed, 100, lines)
+                with f:
+                    self.assertEqual(offset, start)
+                    self.assertEqual(f.read(), data[start:])
+            forward.assert_not_called()
+
+        os.remove(self.log_file + '.idx')
+        f, offset = open_log_at(compressed, lines=3)
+        with f:
+            self.assertEqual(offset, expected)
+            self.assertEqual(f.read(), data[expected:])
+
+    #---------------------------------------------------------------------------
+    def test_accepts_encoding(self):
+        self.assertTrue(accepts_encoding('gzip, deflate, br', 'gzip'))
+        self.assertTrue(accepts_encoding('deflate, *', 'gzip'))
+        self.assertTrue(accepts_encoding('gzip;q=0.5', 'gzip'))
+        self.assertFalse(accepts_encoding('gzip;q=0', 'gzip'))
+        self.assertFalse(accepts_encoding('deflate', 'gzip'))
+        self.assertFalse(accepts_encoding(None, 'gzip'))
+
+    #---------------------------------------------------------------------------
+    def test_log_index(self):
+        lines = [
+            '2026-10-19 10:00:00 [scrapy.core.engine] INFO: Spider opened\n',
+            '2026-10-19 10:00:01 [foo] WARNING: http://foo.com/1 slow\n',
+            '2026-10-19 10:00:02 [foo] ERROR: http://foo.com/2 failed\n',
+            'Traceback (most recent call last):\n',
+            '2026-10-19 10:00:03 [foo] CRITICAL: http://foo.com/3 boom\n',
+            '2026-10-19 10:00:04 [scrapy.core.engine] INFO: Spider closed\n'
+        ]
+        data = ''.join(lines).encode('utf-8')
+        with open(self.log_file, 'wb') as f:
+            f.write(data)
+
+        self.assertIsNone(load_log_index(self.log_file))
+        index = build_log_index(self.log_file)
+        self.assertEqual(index, load_log_index(self.log_file))
+        self.assertEqual(index['size'], len(data))
+        self.assertEqual(index['lines'], 6)
+        self.assertEqual(index['levels']['ERROR']['count'], 1)
+        offset = len(''.join(lines[:2]))
+        self.assertEqual(index['levels']['ERROR']['lines'], [[3, offset]])
+
+        #-----------------------------------------------------------------------
+        # Search with and without the index
+        #-----------------------------------------------------------------------
+        matches = search_log(self.log_file, level='ERROR')
+        self.assertEqual([m['line'] for m in matches], [3, 5])
+        self.assertEqual(matches[0]['offset'], offset)
+        self.assertEqual(matches[0]['text'], lines[2].rstrip('\n'))
+
+        pattern = re.compile(r'foo\.com/\d')
+        matches = search_log(self.log_file, pattern)
+        self.assertEqual([m['line'] for m in matches], [2, 3, 5])
+        matches = search_log(self.log_file, pattern, 'WARNING', limit=2)
+        self.assertEqual([m['line'] for m in matches], [2, 3])
+        matches = search_log(self.log_file, re.compile('Traceback'))
+        self.assertEqual([m['line'] for m in matches], [4])
+
+        compressed = compress_log(self.log_file, 'gzip')
+        self.assertEqual(get_index_path(compressed), self.log_file + '.idx')
+        matches = search_log(compressed, pattern, 'CRITICAL')
+        self.assertEqual([m['line'] for m in matches], [5])
+
+        os.remove(self.log_file + '.idx')
+        matches = search_log(compressed, level='CRITICAL')
+        self.assertEqual([m['line'] for m in matches], [5])
+
+    #---------------------------------------------------------------------------
+    def test_log_search_zstd(self):
+        if zstandard is None:
+            raise unittest.SkipTest('zstandard is not available')
+
+        lines = [
+            '2026-10-19 10:00:00 [scrapy.core.engine] INFO: Spider opened\n',
+            '2026-10-19 10:00:01 [foo] ERROR: http://foo.com/1 failed\n',
+            '2026-10-19 10:00:02 [foo] INFO: http://foo.com/2 fetched\n',
+            '2026-10-19 10:00:03 [foo] ERROR: http://foo.com/3 failed\n'
+        ]
+        data = ''.join(lines).encode('utf-8')
+        with open(self.log_file, 'wb') as f:
+            f.write(data)
+        build_log_index(self.log_file)
+
+        compressed = compress_log(self.log_file, 'zstd')
+        with open_log(compressed) as f:
+            self.assertEqual(f.readline(), lines[0].encode('utf-8'))
+            self.assertEqual(f.read(), b''.join(
+                [x.encode('utf-8') for x in lines[1:]]))
+
+        pattern = re.compile(r'foo\.com/\d')
+        matches = search_log(compressed, pattern)
+        self.assertEqual([m['line'] for m in matches], [2, 3, 4])
+        self.assertEqual(matches[1]['offset'], len(''.join(lines[:2])))
+        self.assertEqual(matches[2]['text'], lines[3].rstrip('\n'))
+
+        matches = search_log(compressed, level='ERROR')
+        self.assertEqual([m['line'] for m in matches], [2, 4])
+        os.remove(self.log_file + '.idx')
+        matches = search_log(compressed, level='ERROR')
+        self.assertEqual([m['line'] for m in matches], [2, 4])
+
+    #---------------------------------------------------------------------------
+    def test_log_follower(self):
+        watcher = LogWatcher(use_inotify=False)
+        running = [True]
+        on_close = Mock()
+        follower = LogFollower(self.log_file, watcher, lambda: running[0],
+                               on_close)
+        self.assertEqual(follower.offset, 3)
+
+        #-----------------------------------------------------------------------
+        # Subscribe and get the backlog
+        #-----------------------------------------------------------------------
+        data1 = Mock()
+        end1 = Mock()
+        self.assertEqual(follower.subscribe('a', data1, end1), 0)
+        data1.assert_called_once_with(0, 'foo')
+
+        data2 = Mock()
+        end2 = Mock()
+        self.assertEqual(follower.subscribe('b', data2, end2, 10), 3)
+        data2.assert_not_called()
+
+        #-----------------------------------------------------------------------
+        # Fan out; multi-byte characters are not split
+        #-----------------------------------------------------------------------
+        euro = '\u20ac'.encode('utf-8')
+        with open(self.log_file, 'ab') as f:
+            f.write(b'bar' + euro[:1])
+        watcher.notify(self.log_file)
+        data1.assert_called_with(3, 'bar')
+        data2.assert_called_once_with(3, 'bar')
+
+        data3 = Mock()
+        self.assertEqual(follower.subscribe('c', data3, Mock(), 2), 2)
+        data3.assert_called_once_with(2, 'obar')
+
+        with open(self.log_file, 'ab') as f:
+            f.write(euro[1:] + b'baz')
+        watcher.notify(self.log_file)
+        data1.assert_called_with(6, '\u20acbaz')
+        data3.assert_called_with(6, '\u20acbaz')
+
+        #-----------------------------------------------------------------------
+        # Unsubscribe and finish
+        #-----------------------------------------------------------------------
+        follower.unsubscribe('c')
+        follower.unsubscribe('b')
+        running[0] = False
+        watcher.notify(self.log_file)
+        end1.assert_called_once()
+        end2.assert_not_called()
+        on_close.assert_called_once_with(follower)
+        self.assertTrue(follower.closed)
+        self.assertEqual(watcher.callbacks, {})
+
+        #-----------------------------------------------------------------------
+        # The last subscriber leaving closes the follower
+        #-----------------------------------------------------------------------
+        running[0] = True
+        follower = LogFollower(self.log_file, watcher, lambda: running[0])
+        follower.subscribe('a', Mock(), Mock())
+        follower.unsubscribe('a')
+        self.assertTrue(follower.closed)
+        self.assertEqual(watcher.callbacks, {})
+
+    #---------------------------------------------------------------------------
+    def test_capped_log_follower(self):
+        watcher = LogWatcher(use_inotify=False)
+        running = [True]
+        log = CappedLogFile(self.log_file, 8, watcher.notify)
+        log.write(b'0123')
+        follower = LogFollower(self.log_file, watcher, lambda: running[0])
+        data1 = Mock()
+        end1 = Mock()
+        self.assertEqual(follower.subscribe('a', data1, end1), 0)
+
+        def received(data):
+            return ''.join([c[0][1] for c in data.call_args_list])
+
+        #-----------------------------------------------------------------------
+        # The output past the head is followed through the rotations of the
+        # sidecar files
+        #-----------------------------------------------------------------------
+        log.write(b'ab')
+        data1.assert_called_with(4, 'ab')
+        log.write(b'cdef')
+        self.assertTrue(os.path.exists(self.log_file + '.tail.1'))
+        self.assertEqual(received(data1), '0123abcdef')
+        self.assertEqual(follower.offset, 10)
+
+        data2 = Mock()
+        self.assertEqual(follower.subscribe('b', data2, Mock(), 0), 8)
+        data2.assert_called_once_with(8, 'ef')
+
+        #-----------------------------------------------------------------------
+        # A follower lagging behind catches up with the rotated file
+        #-----------------------------------------------------------------------
+        log.on_spill = None
+        for chunk in [b'gh', b'ij', b'kl', b'mn']:
+            log.write(chunk)
+        watcher.notify(self.log_file)
+        self.assertEqual(received(data1), '0123abcdefghijklmn')
+
+        #-----------------------------------------------------------------------
+        # Streaming over HTTP continues past the head as well
+        #-----------------------------------------------------------------------
+        request = Mock()
+        request.notifyFinish.return_value = Deferred()
+        producer = LogFileProducer(request, self.log_file, watcher,
+                                   lambda: running[0], 2)
+        producer.start()
+        log.on_spill = watcher.notify
+        log.write(b'op')
+        result = b''.join([c[0][0] for c in request.write.call_args_list])
+        self.assertEqual(result, b'23ijklmnop')
+        self.assertEqual(received(data1), '0123abcdefghijklmnop')
+
+        #-----------------------------------------------------------------------
+        # Closing the log does not send the assembled tail again
+        #-----------------------------------------------------------------------
+        self.assertEqual(log.close(), 8)
+        running[0] = False
+        watcher.notify(self.log_file)
+        end1.assert_called_once()
+        self.assertTrue(follower.closed)
+        self.assertEqual(received(data1), '0123abcdefghijklmnop')
+        request.finish.assert_called_once()
+        self.assertFalse(os.path.exists(self.log_file + '.tail'))
+        with open(self.log_file, 'rb') as f:
+            self.assertEqual(f.read(), b'0123\n[scrapy-do] 12 bytes of '
+                             b'output truncated\nmnop')
+
+    #---------------------------------------------------------------------------
+    def test_read_log_tail(self):
+        with open(self.log_file, 'wb') as f:
+            f.write(b'0123456789')
+        self.assertEqual(read_log_tail(self.log_file), (0, b'0123456789'))
+        self.assertEqual(read_log_tail(self.log_file, 8), (8, b'89'))
+        self.assertEqual(read_log_tail(self.log_file, 20), (10, b''))
+        self.assertEqual(read_log_tail(self.log_file, size=3), (7, b'789'))
+        compressed = compress_log(self.log_file, 'gzip')
+        self.assertEqual(read_log_tail(compressed, 2, 4), (6, b'6789'))
+
+    #---------------------------------------------------------------------------
+    def test_metrics(self):
+        log = """2026-10-19 10:00:00 [scrapy.core.engine] INFO: Closing spider
+2026-10-19 10:00:00 [scrapy.statscollectors] INFO: Dumping Scrapy stats:
+{'downloader/request_bytes': 1234,
+ 'downloader/request_count': 11,
+ 'downloader/response_count': 10,
+ 'downloader/response_status_count/200': 9,
+ 'downloader/response_status_count/404': 1,
+ 'elapsed_time_seconds': 3.5,
+ 'finish_reason': 'finished',
+ 'finish_time': datetime.datetime(2026, 10, 19, 10, 0, 0, 123456),
+ 'item_scraped_count': 100,
+ 'log_count/ERROR': 2,
+ 'log_count/INFO': 10,
+ 'start_time': datetime.datetime(2026, 10, 19, 9, 59, 56, 623456)}
+2026-10-19 10:00:00 [scrapy.core.engine] INFO: Spider closed (finished)
+"""
+        stats = parse_stats_dump(log)
+        self.assertEqual(stats['downloader/request_bytes'], 1234)
+        self.assertEqual(stats['finish_time'],
+                         'datetime.datetime(2026, 10, 19, 10, 0, 0, 123456)')
+        self.assertIsNone(parse_stats_dump('foo'))
+        self.assertIsNone(parse_stats_dump(log[:log.index("'item_")]))
+        self.assertIsNone(parse_stats_dump('Dumping Scrapy stats:\n{foo}'))
+
+        with open(self.log_file, 'w') as f:
+            f.write(log)
+        self.assertEqual(get_metrics(self.log_file), {
+            'downloader/request_count': 11,
+            'downloader/response_count': 10,
+            'downloader/response_status_count/200': 9,
+            'downloader/response_status_count/404': 1,
+            'elapsed_time_seconds': 3.5,
+            'finish_reason': 'finished',
+            'item_scraped_count': 100,
+            'log_count/ERROR': 2,
+            'log_count/INFO': 10
+        })
+
+        with open(self.log_file, 'w') as f:
+            f.write('foo')
+        self.assertEqual(get_metrics(self.log_file), {})
+
+    #---------------------------------------------------------------------------
+    def test_log_retention(self):
+        #-----------------------------------------------------------------------
+        # Jobs a, b, c, and d, each using 100 bytes, last used at 100, 200,
+        # 300, and 400 respectively
+        #-----------------------------------------------------------------------
+        os.remove(self.log_file)
+        for i, job_id in enumerate(['a', 'b', 'c', 'd']):
+            for name in ['.out', '.err.gz', '.err.idx', '.out.tail.1']:
+                path = os.path.join(self.temp_dir, job_id + name)
+                with open(path, 'wb') as f:
+                    f.write(b'x' * (40 if name == '.out' else 20))
+                os.utime(path, (100 * (i + 1), 100 * (i + 1)))
+        with open(os.path.join(self.temp_dir, 'foo.txt'), 'wb') as f:
+            f.write(b'x' * 1000)
+
+        retention = LogRetention(self.temp_dir)
+        self.assertEqual(len(retention.scan()), 4)
+        self.assertEqual(retention.scan()['a'][0], 100)
+        self.assertEqual(retention.enforce(now=1000), [])
+        self.assertEqual(retention.usage, 400)
+
+        retention.budget = 250
+        self.assertEqual(retention.enforce(['a'], now=1000), ['b', 'c'])
+        self.assertEqual(retention.usage, 200)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'b.out')))
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'a.out')))
+
+        retention.budget = None
+        retention.max_age = 650
+        retention.BATCH_SIZE = 1
+        self.assertEqual(retention.enforce(now=1000), ['a'])
+        self.assertEqual(retention.enforce(now=1000), [])
+        self.assertEqual(retention.usage, 100)
+        self.assertEqual(retention.evicted, 3)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'foo.txt')))
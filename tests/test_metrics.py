@@ -0,0 +1,52 @@
+#-------------------------------------------------------------------------------
+# Author: Lukasz Janyst <lukasz@jany.st>
+# Date:   19.10.2026
+#
+# Licensed under the 3-Clause BSD License, see the LICENSE file for details.
+#-------------------------------------------------------------------------------
+
+from scrapy_do.metrics import MetricsSampler
+from twisted.internet.task import Clock
+from twisted.trial import unittest
+
+
+#-------------------------------------------------------------------------------
+class MetricsTests(unittest.TestCase):
+
+    #---------------------------------------------------------------------------
+    def test_sampler(self):
+        with self.assertRaises(ValueError):
+            MetricsSampler(interval=0)
+        with self.assertRaises(ValueError):
+            MetricsSampler(history_size=0)
+
+        #-----------------------------------------------------------------------
+        # The snapshot is taken on demand when there is none
+        #-----------------------------------------------------------------------
+        sampler = MetricsSampler(interval=5, history_size=3)
+        snapshot = sampler.get_snapshot()
+        keys = ['timestamp', 'memory-usage', 'cpu-usage', 'threads',
+                'open-files', 'host-cpu-usage', 'host-memory-usage',
+                'load-average']
+        for key in keys:
+            self.assertIn(key, snapshot)
+        self.assertGreater(snapshot['memory-usage'], 0)
+        self.assertIs(sampler.get_snapshot(), snapshot)
+        self.assertEqual(sampler.get_history(), [snapshot])
+
+        #-----------------------------------------------------------------------
+        # Sampling on a fixed cadence with a bounded history
+        #-----------------------------------------------------------------------
+        clock = Clock()
+        sampler.loop.clock = clock
+        sampler.start()
+        self.assertEqual(len(sampler.get_history()), 2)
+        for _ in range(4):
+            clock.advance(5)
+        history = sampler.get_history()
+        self.assertEqual(len(history), 3)
+        self.assertIs(history[-1], sampler.get_snapshot())
+        sampler.stop()
+        clock.advance(5)
+        self.assertEqual(sampler.get_history(), history)
+        sampler.stop()
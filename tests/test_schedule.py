@@ -63,7 +63,7 @@ class ScheduleTests(unittest.TestCase):
         self.assertEqual(job1.payload, job2.payload)
 
     #---------------------------------------------------------------------------
-    def test_upgrade_from_v1_to_v2(self):
+    def test_upgrade_from_v1(self):
         db_file_orig = os.path.join(os.path.dirname(__file__),
                                     'schedule-v1.db')
         tmp_dir = tempfile.mkdtemp()
@@ -74,8 +74,15 @@ class ScheduleTests(unittest.TestCase):
         jobs = schedule.get_active_jobs()
         for job in jobs:
             self.assertEqual(job.description, '')
+            self.assertEqual(job.dependencies, [])
+            self.assertEqual(job.origin, None)
+            self.assertEqual(job.attempt, 1)
+            self.assertEqual(job.retry, '{}')
+            self.assertEqual(job.metrics, {})
+            self.assertEqual(job.logs, None)
+            self.assertEqual(job.feed, None)
 
-        self.assertEqual(int(self.schedule.get_metadata('version')), 2)
+        self.assertEqual(int(schedule.get_metadata('version')), 7)
 
         lst = glob.glob(db_file_test + '.bak*')
         self.assertEqual(len(lst), 1)
@@ -100,7 +107,8 @@ class ScheduleTests(unittest.TestCase):
 
         for job in active_jobs:
             self.assertIn(job.status,
-                          [Status.SCHEDULED, Status.PENDING, Status.RUNNING])
+                          [Status.SCHEDULED, Status.PENDING, Status.RUNNING,
+                           Status.WAITING])
         for job in completed_jobs:
             self.assertIn(job.status,
                           [Status.CANCELED, Status.SUCCESSFUL, Status.FAILED])
@@ -116,12 +124,130 @@ class ScheduleTests(unittest.TestCase):
         job = pending_jobs[0]
         job.status = Status.RUNNING
         self.assertTrue(job.timestamp > self.job3.timestamp)
+        job.metrics = {'item_scraped_count': 10}
+        job.logs = {'err': 100}
+        job.feed = {'file': job.identifier + '.jl', 'size': 10}
         self.schedule.commit_job(job)
         running_jobs = self.schedule.get_jobs(Status.RUNNING)
         pending_jobs = self.schedule.get_jobs(Status.PENDING)
         self.assertEqual(len(running_jobs), 2)
         self.assertEqual(len(pending_jobs), 0)
         self.compare_jobs(job, running_jobs[0])
+        self.assertEqual(running_jobs[0].metrics, {'item_scraped_count': 10})
+        self.assertEqual(running_jobs[0].logs, {'err': 100})
+        self.assertEqual(running_jobs[0].feed, job.feed)
+
+    #---------------------------------------------------------------------------
+    def test_dependants(self):
+        job1 = Job(status=Status.WAITING, actor=Actor.USER,
+                   project='testproj9', spider='testspider9',
+                   dependencies=[self.job3.identifier])
+        job2 = Job(status=Status.WAITING, actor=Actor.USER,
+                   project='testproj9', spider='testspider9',
+                   dependencies=[self.job3.identifier, self.job4.identifier])
+        self.schedule.add_jobs([job1, job2])
+
+        dependants = self.schedule.get_dependants(self.job3.identifier)
+        self.assertEqual(len(dependants), 2)
+        dependants = self.schedule.get_dependants(self.job4.identifier)
+        self.assertEqual(len(dependants), 1)
+        self.compare_jobs(dependants[0], job2)
+        self.assertEqual(dependants[0].dependencies, job2.dependencies)
+        dependants = self.schedule.get_dependants(self.job5.identifier)
+        self.assertEqual(len(dependants), 0)
+
+        job2.status = Status.PENDING
+        self.schedule.commit_job(job2)
+        dependants = self.schedule.get_dependants(self.job4.identifier)
+        self.assertEqual(len(dependants), 0)
+
+        active_jobs = self.schedule.get_active_jobs()
+        self.assertIn(job1.identifier, [job.identifier for job in active_jobs])
+
+    #---------------------------------------------------------------------------
+    def test_attempts(self):
+        jobs = [Job(status=Status.FAILED, actor=Actor.SCHEDULER,
+                    project='testproj3', spider='testspider3',
+                    origin=self.job3.identifier, attempt=i + 2,
+                    retry='{"attempts": 2}')
+                for i in range(2)]
+        self.schedule.add_jobs(reversed(jobs))
+
+        attempts = self.schedule.get_attempts(self.job3.identifier)
+        self.assertEqual(len(attempts), 2)
+        for job, attempt in zip(jobs, attempts):
+            self.compare_jobs(job, attempt)
+            self.assertEqual(attempt.origin, self.job3.identifier)
+            self.assertEqual(attempt.attempt, job.attempt)
+            self.assertEqual(attempt.retry, job.retry)
+        self.assertEqual(self.schedule.get_attempts(self.job4.identifier), [])
+
+    #---------------------------------------------------------------------------
+    def test_add_jobs(self):
+        jobs = [Job(status=Status.PENDING, actor=Actor.USER,
+                    project='testproj9', spider='testspider{}'.format(i))
+                for i in range(10)]
+        self.schedule.add_jobs(jobs)
+        pending_jobs = self.schedule.get_jobs(Status.PENDING)
+        self.assertEqual(len(pending_jobs), 11)
+
+        #-----------------------------------------------------------------------
+        # A duplicate identifier should roll back the entire batch
+        #-----------------------------------------------------------------------
+        jobs = [Job(status=Status.PENDING, actor=Actor.USER,
+                    project='testproj10', spider='testspider10'),
+                self.job1]
+        with self.assertRaises(Exception):
+            self.schedule.add_jobs(jobs)
+        pending_jobs = self.schedule.get_jobs(Status.PENDING)
+        self.assertEqual(len(pending_jobs), 11)
+
+    #---------------------------------------------------------------------------
+    def test_jobs_window(self):
+        completed = [Status.SUCCESSFUL, Status.FAILED, Status.CANCELED]
+        jobs, total = self.schedule.get_jobs_window(completed, limit=3)
+        self.assertEqual(total, 4)
+        self.assertEqual(len(jobs), 3)
+        for job in jobs:
+            self.assertEqual(job.status, Status.CANCELED)
+        timestamps = [job.timestamp for job in jobs]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+        #-----------------------------------------------------------------------
+        # The pages don't overlap
+        #-----------------------------------------------------------------------
+        rest, total = self.schedule.get_jobs_window(completed, offset=3,
+                                                    limit=3)
+        self.assertEqual(total, 4)
+        self.assertEqual(len(rest), 1)
+        ids = set(job.identifier for job in jobs + rest)
+        self.assertEqual(ids, set(job.identifier for job in
+                                  [self.job5, self.job6, self.job7,
+                                   self.job8]))
+
+        #-----------------------------------------------------------------------
+        # Sorting and filtering
+        #-----------------------------------------------------------------------
+        jobs, total = self.schedule.get_jobs_window(completed, sort='project',
+                                                    descending=False)
+        self.assertEqual([job.project for job in jobs],
+                         ['testproj5', 'testproj6', 'testproj7', 'testproj8'])
+        jobs, total = self.schedule.get_jobs_window(
+            [Status.SCHEDULED, Status.PENDING], project='testproj2')
+        self.assertEqual(total, 1)
+        self.compare_jobs(jobs[0], self.job2)
+        jobs, total = self.schedule.get_jobs_window(
+            [Status.SCHEDULED], project='testproj2', spider='testspider1')
+        self.assertEqual(total, 0)
+        self.assertEqual(jobs, [])
+        jobs, total = self.schedule.get_jobs_window(
+            completed, projects=['testproj5', 'testproj7', 'testproj9'])
+        self.assertEqual(total, 2)
+        self.assertEqual(set(job.project for job in jobs),
+                         {'testproj5', 'testproj7'})
+
+        with self.assertRaises(ValueError):
+            self.schedule.get_jobs_window(completed, sort='identifier; --')
 
     #---------------------------------------------------------------------------
     def test_remove(self):
@@ -146,6 +272,6 @@ class ScheduleTests(unittest.TestCase):
 
     #---------------------------------------------------------------------------
     def test_metadata(self):
-        self.assertEqual(int(self.schedule.get_metadata('version')), 2)
+        self.assertEqual(int(self.schedule.get_metadata('version')), 7)
         with self.assertRaises(KeyError):
             self.schedule.get_metadata('foo')
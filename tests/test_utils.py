@@ -6,12 +6,17 @@
 #-------------------------------------------------------------------------------
 
 import unittest
+import tempfile
 import schedule
+import shutil
 import os
 
 from dateutil.relativedelta import relativedelta
 from scrapy_do.utils import get_object, schedule_job, pprint_relativedelta
-from scrapy_do.utils import SSLCertOptions, decode_addresses
+from scrapy_do.utils import SSLCertOptions, decode_addresses, TokenBucket
+from scrapy_do.utils import parse_rate, parse_size, parse_duration
+from scrapy_do.utils import CappedLogFile
+from unittest.mock import Mock
 from datetime import datetime
 
 
@@ -95,3 +100,85 @@ class UtilsTests(unittest.TestCase):
         ]
         for addr in addrs:
             self.assertIn(addr, addrs_decoded)
+
+    #---------------------------------------------------------------------------
+    def test_token_bucket(self):
+        now = [0.]
+        bucket = TokenBucket(0.5, 2, clock=lambda: now[0])
+        self.assertTrue(bucket.consume())
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+        now[0] = 1.
+        self.assertFalse(bucket.consume())
+        now[0] = 2.
+        self.assertTrue(bucket.consume())
+        now[0] = 100.
+        self.assertEqual(bucket.available(), 2)
+
+        bucket = parse_rate('10 / minute')
+        self.assertEqual(bucket.capacity, 10)
+        self.assertAlmostEqual(bucket.rate, 1. / 6)
+        self.assertEqual(parse_rate('2/hour').rate, 2. / 3600)
+        for spec in ['foo', '10', '10/day', 'foo/minute', '0/second']:
+            with self.assertRaises(ValueError):
+                parse_rate(spec)
+
+    #---------------------------------------------------------------------------
+    def test_parse_size(self):
+        self.assertEqual(parse_size('100'), 100)
+        self.assertEqual(parse_size('2k'), 2048)
+        self.assertEqual(parse_size(' 3 MB'), 3 * 1024 ** 2)
+        self.assertEqual(parse_size('1GiB'), 1024 ** 3)
+        self.assertEqual(parse_size('0'), 0)
+        for spec in ['foo', '', '10X', '-1M', '1.5M']:
+            with self.assertRaises(ValueError):
+                parse_size(spec)
+
+    #---------------------------------------------------------------------------
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration('100'), 100)
+        self.assertEqual(parse_duration('10s'), 10)
+        self.assertEqual(parse_duration(' 5 M'), 300)
+        self.assertEqual(parse_duration('2h'), 7200)
+        self.assertEqual(parse_duration('30d'), 30 * 86400)
+        self.assertEqual(parse_duration('1w'), 604800)
+        for spec in ['foo', '', '10y', '-1d', '1.5h']:
+            with self.assertRaises(ValueError):
+                parse_duration(spec)
+
+    #---------------------------------------------------------------------------
+    def test_capped_log_file(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, 'foo.out')
+
+        log = CappedLogFile(path, 10)
+        log.write(b'abc')
+        log.write(b'de')
+        self.assertEqual(log.close(), 5)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcde')
+
+        #-----------------------------------------------------------------------
+        # The tail is spilled to the rotated sidecar files
+        #-----------------------------------------------------------------------
+        on_spill = Mock()
+        log = CappedLogFile(path, 10, on_spill)
+        log.write(b'0123456')
+        on_spill.assert_called_once_with(path)
+        with open(path + '.tail', 'rb') as f:
+            self.assertEqual(f.read(), b'56')
+        for i in range(10):
+            log.write(b'xy')
+        with open(path + '.tail.1', 'rb') as f:
+            self.assertEqual(f.read(), b'yxyxy')
+        with open(path + '.tail', 'rb') as f:
+            self.assertEqual(f.read(), b'xy')
+        log.write(b'abcdefg')
+        self.assertEqual(log.close(), 10)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data, b'01234\n[scrapy-do] 24 bytes of output '
+                         b'truncated\ncdefg')
+        self.assertFalse(os.path.exists(path + '.tail'))
+        self.assertFalse(os.path.exists(path + '.tail.1'))
+        shutil.rmtree(temp_dir)
@@ -5,18 +5,29 @@
 # Licensed under the 3-Clause BSD License, see the LICENSE file for details.
 #-------------------------------------------------------------------------------
 
+import tempfile
+import gzip
+import shutil
+import threading
 import json
 import uuid
+import os
 
 from twisted.internet.defer import Deferred, inlineCallbacks
 from scrapy_do.webservice import Status, PushProject, ListProjects, ListSpiders
 from scrapy_do.webservice import ScheduleJob, ListJobs, CancelJob, RemoveProject
-from scrapy_do.webservice import WebApp, GetLog
+from scrapy_do.webservice import ScheduleJobs
+from scrapy_do.webservice import WebApp, GetLog, GetFeed, SearchLogs
+from scrapy_do.webservice import EventStream, Metrics
+from scrapy_do.websocket import WSFactory, project_remove_msg
+from scrapy_do.client.webclient import parse_events
 from scrapy_do.controller import Project
+from scrapy_do.logs import LogWatcher, compress_log
+from scrapy_do.utils import twisted_sleep
 from twisted.web.server import NOT_DONE_YET
 from scrapy_do.schedule import Job, Actor
 from scrapy_do.schedule import Status as JobStatus
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import Mock, patch
 from twisted.trial import unittest
 from datetime import datetime
 
@@ -62,10 +73,28 @@ class WebServicesTests(unittest.TestCase):
         self.web_app.controller.get_completed_jobs.return_value = done_jobs
         self.web_app.controller.start_time = datetime.now()
         self.web_app.controller.counter_run = 0
+        self.web_app.ws_factory.get_queue_depths.return_value = {}
+        self.web_app.ws_factory.clients_dropped = 0
         self.web_app.controller.counter_success = 0
         self.web_app.controller.counter_failure = 0
         self.web_app.controller.counter_cancel = 0
+        self.web_app.controller.counter_retry = 0
+        self.web_app.controller.rehydration_done = 0
+        self.web_app.controller.rehydration_total = 0
         self.web_app.controller.scheduled_jobs = []
+        self.metrics = {
+            'timestamp': 0, 'memory-usage': 10., 'cpu-usage': 1.,
+            'threads': 1, 'open-files': 10, 'host-cpu-usage': 5.,
+            'host-memory-usage': 50., 'load-average': [0., 0., 0.]
+        }
+        self.web_app.controller.metrics.get_snapshot.return_value = \
+            self.metrics
+        self.web_app.controller.event_bus.get_stats.return_value = {
+            'dispatched': 0, 'pending': 0, 'listeners': {}
+        }
+        self.web_app.controller.log_retention.usage = 0
+        self.web_app.controller.log_retention.budget = None
+        self.web_app.controller.log_retention.evicted = 0
         prj1 = Project('a', 'a.zip', ['a', 'b'])
         prj2 = Project('b', 'b.zip', ['c'])
         self.web_app.controller.projects = {
@@ -80,12 +109,29 @@ class WebServicesTests(unittest.TestCase):
         request.method = 'GET'
         retval = service.render(request)
         decoded = json.loads(retval)
-        keys = ['memory-usage', 'cpu-usage', 'time', 'timezone', 'hostname',
+        keys = ['memory-usage', 'cpu-usage', 'host-cpu-usage',
+                'host-memory-usage', 'time', 'timezone', 'hostname',
                 'uptime', 'jobs-run', 'jobs-successful', 'jobs-failed',
-                'jobs-canceled', 'jobs-scheduled', 'projects', 'spiders',
-                'daemon-version']
+                'jobs-canceled', 'jobs-retried', 'jobs-scheduled',
+                'jobs-rehydrated', 'projects', 'spiders', 'log-usage',
+                'log-budget', 'logs-evicted', 'ws-queue-depths',
+                'ws-clients-dropped', 'event-bus', 'daemon-version']
         for key in keys:
             self.assertIn(key, decoded)
+        self.assertEqual(decoded['memory-usage'], 10.)
+
+    #---------------------------------------------------------------------------
+    def test_metrics(self):
+        self.web_app.controller.metrics.interval = 5.
+        self.web_app.controller.metrics.get_history.return_value = \
+            [self.metrics]
+        service = Metrics(self.web_app)
+        request = Mock()
+        request.method = 'GET'
+        decoded = json.loads(service.render(request))
+        self.assertEqual(decoded['interval'], 5.)
+        self.assertEqual(decoded['current'], self.metrics)
+        self.assertEqual(decoded['history'], [self.metrics])
 
     #---------------------------------------------------------------------------
     @inlineCallbacks
@@ -237,6 +283,43 @@ class WebServicesTests(unittest.TestCase):
         self.assertEqual(decoded['status'], 'ok')
         self.assertEqual(decoded['identifier'], 'foo')
 
+        request.args[b'dependencies'] = [b'bar, baz']
+        service.render(request)
+        _, kwargs = self.web_app.controller.schedule_job.call_args
+        self.assertEqual(kwargs['dependencies'], ['bar', 'baz'])
+
+    #---------------------------------------------------------------------------
+    def test_schedule_jobs(self):
+        service = ScheduleJobs(self.web_app)
+        self.web_app.controller.schedule_jobs.return_value = ['foo', 'bar']
+
+        jobs = [
+            {'project': 'quotesbot', 'spider': 'toscrape-css'},
+            {'project': 'quotesbot', 'spider': 'toscrape-xpath',
+             'when': 'every 10 minutes', 'payload': {'test': 42}}
+        ]
+
+        request = Mock()
+        request.method = 'POST'
+        request.args = {b'jobs': [json.dumps(jobs).encode('utf-8')]}
+        retval = service.render(request)
+        decoded = json.loads(retval)
+        self.assertEqual(decoded['status'], 'ok')
+        self.assertEqual(decoded['identifiers'], ['foo', 'bar'])
+        self.web_app.controller.schedule_jobs.assert_called_with(
+            jobs, payload='{}')
+
+        request.args[b'payload'] = [b'{"test": 43}']
+        service.render(request)
+        self.web_app.controller.schedule_jobs.assert_called_with(
+            jobs, payload='{"test": 43}')
+
+        for data in [b'foo', b'{"foo": "bar"}']:
+            request.args = {b'jobs': [data]}
+            retval = service.render(request)
+            decoded = json.loads(retval)
+            self.assertEqual(decoded['status'], 'error')
+
     #---------------------------------------------------------------------------
     def test_list_jobs(self):
         #-----------------------------------------------------------------------
@@ -406,79 +489,435 @@ class WebServicesTests(unittest.TestCase):
     #---------------------------------------------------------------------------
     @inlineCallbacks
     def test_get_log(self):
+        log_dir = tempfile.mkdtemp()
+        job_id = str(uuid.uuid4())
         web_app = Mock()
         web_app.controller = Mock()
-        web_app.controller.log_dir = '/'
-        web_app.controller.running_jobs = {
-            '76f8e58f-7fe5-4195-b926-cc5a69b057b2': None
-        }
+        web_app.controller.log_dir = log_dir
+        web_app.controller.log_watcher = LogWatcher(poll_interval=0.01,
+                                                    use_inotify=False)
+        web_app.controller.running_jobs = {job_id: None}
         request = Mock()
         request.method = 'GET'
-        request.path = '/get-log/data/76f8e58f-7fe5-4195-b926-cc5a69b057b2.err'
+        request.path = '/get-log/data/{}.err'.format(job_id)
+        request.args = {}
+        request.getHeader.return_value = None
+        request.notifyFinish.return_value = Deferred()
         service = GetLog(web_app)
         child = service.getChild(request.path, request)
 
         #-----------------------------------------------------------------------
         # Open fails
         #-----------------------------------------------------------------------
-        mopen = MagicMock()
-        d = Deferred()
-        request.finish.side_effect = lambda: d.callback(None)
-        with patch('builtins.open', mopen) as mock_open:
-            mock_open.side_effect = IOError()
-            ret = child.render(request)
-
-        yield d
+        ret = child.render(request)
         self.assertEqual(ret, NOT_DONE_YET)
         request.setResponseCode.assert_called_with(404)
+        request.finish.assert_called_once()
 
         #-----------------------------------------------------------------------
-        # Read throws an exception
+        # Follow the log of a running job
         #-----------------------------------------------------------------------
-        mopen = MagicMock()
-        request.mock_reset()
+        log_file = os.path.join(log_dir, job_id + '.err')
+        with open(log_file, 'wb') as f:
+            f.write(b'a')
+
+        request.reset_mock()
         d = Deferred()
         request.finish.side_effect = lambda: d.callback(None)
-        mfile = Mock()
-        mfile.read.side_effect = IOError()
-        with patch('builtins.open', mopen) as mock_open:
-            mock_open.return_value = mfile
-            child.render(request)
+        child.render(request)
+        request.write.assert_called_once_with(b'a')
+
+        with open(log_file, 'ab') as f:
+            f.write(b'b')
+        yield twisted_sleep(0.1)
+        request.write.assert_called_with(b'b')
+        request.finish.assert_not_called()
+
+        web_app.controller.running_jobs = {}
+        with open(log_file, 'ab') as f:
+            f.write(b'c')
+        yield d
+
+        data = b''.join([c[0][0] for c in request.write.call_args_list])
+        self.assertEqual(data, b'abc')
+        request.unregisterProducer.assert_called_once()
+        self.assertEqual(web_app.controller.log_watcher.callbacks, {})
+
+        #-----------------------------------------------------------------------
+        # Byte ranges
+        #-----------------------------------------------------------------------
+        with open(log_file, 'wb') as f:
+            f.write(b'line1\nline2\nline3\n')
+
+        def get_data():
+            return b''.join([c[0][0] for c in request.write.call_args_list])
+
+        request.reset_mock()
+        request.finish.side_effect = None
+        request.getHeader.return_value = 'bytes=6-10'
+        child.render(request)
+        request.setResponseCode.assert_called_once_with(206)
+        request.setHeader.assert_any_call('Content-Range', 'bytes 6-10/18')
+        request.setHeader.assert_any_call('Content-Length', '5')
+        self.assertEqual(get_data(), b'line2')
+        request.finish.assert_called_once()
+
+        request.reset_mock()
+        request.getHeader.return_value = 'bytes=100-'
+        child.render(request)
+        request.setResponseCode.assert_called_once_with(416)
+        request.setHeader.assert_any_call('Content-Range', 'bytes */18')
+        request.finish.assert_called_once()
+
+        #-----------------------------------------------------------------------
+        # Tail and since
+        #-----------------------------------------------------------------------
+        request.getHeader.return_value = None
+        request.reset_mock()
+        request.args = {b'tail': [b'2']}
+        child.render(request)
+        request.setHeader.assert_any_call('X-Log-Offset', '6')
+        self.assertEqual(get_data(), b'line2\nline3\n')
+
+        request.reset_mock()
+        request.args = {b'since': [b'12']}
+        child.render(request)
+        request.setHeader.assert_any_call('X-Log-Offset', '12')
+        self.assertEqual(get_data(), b'line3\n')
+
+        request.reset_mock()
+        request.args = {b'tail': [b'foo']}
+        child.render(request)
+        request.setResponseCode.assert_called_once_with(400)
+        request.finish.assert_called_once()
+
+        #-----------------------------------------------------------------------
+        # Compressed logs
+        #-----------------------------------------------------------------------
+        compress_log(log_file, 'gzip')
+        headers = {'accept-encoding': 'gzip'}
+        request.getHeader.side_effect = lambda name: headers.get(name)
+        request.reset_mock()
+        request.args = {}
+        child.render(request)
+        request.setHeader.assert_any_call('Content-Encoding', 'gzip')
+        self.assertEqual(gzip.decompress(get_data()),
+                         b'line1\nline2\nline3\n')
 
+        request.reset_mock()
+        d = Deferred()
+        request.finish.side_effect = lambda: d.callback(None)
+        request.args = {b'tail': [b'1']}
+        child.render(request)
         yield d
-        request.setResponseCode.assert_called_with(500)
+        self.assertEqual(get_data(), b'line3\n')
+        for c in request.setHeader.call_args_list:
+            self.assertNotEqual(c[0][0], 'Content-Encoding')
 
         #-----------------------------------------------------------------------
-        # Read log of a running job
+        # The compressed logs are positioned in a thread, but the response is
+        # only touched in the main one
         #-----------------------------------------------------------------------
-        mopen = MagicMock()
-        request.mock_reset()
+        threads = set()
+
+        def record_thread(*args):
+            threads.add(threading.current_thread())
+
+        headers = {'range': 'bytes=0-4'}
+        request.reset_mock()
+        d = Deferred()
+        request.finish.side_effect = lambda: d.callback(None)
+        request.setHeader.side_effect = record_thread
+        request.setResponseCode.side_effect = record_thread
+        request.args = {}
+        child.render(request)
+        yield d
+        request.setResponseCode.assert_called_once_with(206)
+        request.setHeader.assert_any_call('Content-Range', 'bytes 0-4/18')
+        self.assertEqual(get_data(), b'line1')
+
+        request.reset_mock()
         d = Deferred()
         request.finish.side_effect = lambda: d.callback(None)
-        mfile = Mock()
-        calls = [0]
-
-        def rd():
-            calls[0] += 1
-            if calls[0] == 1:
-                return b'a'
-            if calls[0] == 2:
-                return b''
-            if calls[0] == 3:
-                return b's'
-            web_app.controller.running_jobs = {}
-            return b''
-        mfile.read.side_effect = rd
-        with patch('builtins.open', mopen) as mock_open:
-            mock_open.return_value = mfile
-            child.render(request)
+        headers = {'range': 'bytes=100-'}
+        child.render(request)
+        yield d
+        request.setResponseCode.assert_called_once_with(416)
+        request.setHeader.assert_any_call('Content-Range', 'bytes */18')
+        self.assertEqual(threads, {threading.main_thread()})
+        shutil.rmtree(log_dir)
+
+    #---------------------------------------------------------------------------
+    def test_get_feed(self):
+        feed_dir = tempfile.mkdtemp()
+        job_id = str(uuid.uuid4())
+        feed_file = os.path.join(feed_dir, job_id + '.jl')
+        with open(feed_file, 'wb') as f:
+            f.write(b'{"a": 1}\n{"a": 2}\n')
+
+        feeds = {job_id: feed_file, 'foo': None}
+
+        def get_job_feed(job_id):
+            if job_id not in feeds:
+                raise ValueError('Job not found')
+            return feeds[job_id]
+
+        web_app = Mock()
+        web_app.controller.log_watcher = LogWatcher(poll_interval=0.01,
+                                                    use_inotify=False)
+        web_app.controller.running_jobs = {}
+        web_app.controller.get_job_feed.side_effect = get_job_feed
+        service = GetFeed(web_app)
+
+        def get_request(path, range_header=None):
+            request = Mock()
+            request.method = 'GET'
+            request.path = path
+            request.args = {}
+            request.getHeader.return_value = range_header
+            request.notifyFinish.return_value = Deferred()
+            return request
+
+        def get_data(request):
+            return b''.join([c[0][0] for c in request.write.call_args_list])
+
+        #-----------------------------------------------------------------------
+        # Unknown jobs and jobs without feeds
+        #-----------------------------------------------------------------------
+        for name in ['bar', 'foo']:
+            request = get_request('/get-feed/' + name)
+            child = service.getChild(request.path, request)
+            self.assertEqual(child.render(request), NOT_DONE_YET)
+            request.setResponseCode.assert_called_once_with(404)
+
+        #-----------------------------------------------------------------------
+        # Whole feeds and byte ranges
+        #-----------------------------------------------------------------------
+        request = get_request('/get-feed/{}.jl'.format(job_id))
+        child = service.getChild(request.path, request)
+        child.render(request)
+        request.setHeader.assert_any_call('Content-Type',
+                                          'application/x-ndjson')
+        request.setHeader.assert_any_call('Accept-Ranges', 'bytes')
+        self.assertEqual(get_data(request), b'{"a": 1}\n{"a": 2}\n')
+        request.finish.assert_called_once()
+
+        request = get_request('/get-feed/' + job_id, 'bytes=9-')
+        child.render(request)
+        request.setResponseCode.assert_called_once_with(206)
+        request.setHeader.assert_any_call('Content-Range', 'bytes 9-17/18')
+        self.assertEqual(get_data(request), b'{"a": 2}\n')
+
+        request = get_request('/get-feed/' + job_id, 'bytes=100-')
+        child.render(request)
+        request.setResponseCode.assert_called_once_with(416)
+        request.setHeader.assert_any_call('Content-Range', 'bytes */18')
+
+        #-----------------------------------------------------------------------
+        # Compressed feeds are sent as they are
+        #-----------------------------------------------------------------------
+        feeds[job_id] = compress_log(feed_file, 'gzip')
+        request = get_request('/get-feed/' + job_id)
+        child.render(request)
+        request.setHeader.assert_any_call('Content-Type', 'application/gzip')
+        self.assertEqual(gzip.decompress(get_data(request)),
+                         b'{"a": 1}\n{"a": 2}\n')
+        shutil.rmtree(feed_dir)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_search_logs(self):
+        log_dir = tempfile.mkdtemp()
+        web_app = Mock()
+        web_app.controller.get_jobs.return_value = [self.job1]
+        web_app.controller.get_completed_jobs.return_value = [self.job4]
+        logs = {}
+        for job in [self.job1, self.job4]:
+            path = os.path.join(log_dir, job.identifier + '.err')
+            with open(path, 'w') as f:
+                f.write('[foo] INFO: {}\n'.format(job.spider))
+                f.write('[foo] ERROR: {} failed\n'.format(job.spider))
+            logs[job.identifier] = (None, path)
+        web_app.controller.get_job_logs.side_effect = lambda x: logs[x]
+        service = SearchLogs(web_app)
+
+        def get_request(args):
+            request = Mock()
+            request.method = 'GET'
+            request.args = args
+            request.notifyFinish.return_value = Deferred()
+            d = Deferred()
+            request.finish.side_effect = lambda: d.callback(None)
+            return request, d
+
+        def get_data(request):
+            data = b''.join([c[0][0] for c in request.write.call_args_list])
+            return [json.loads(x) for x in data.decode('utf-8').splitlines()]
+
+        #-----------------------------------------------------------------------
+        # Search
+        #-----------------------------------------------------------------------
+        request, d = get_request({b'pattern': [b'toscrape']})
+        self.assertEqual(service.render(request), NOT_DONE_YET)
+        yield d
+        matches = get_data(request)
+        self.assertEqual(len(matches), 4)
+        self.assertEqual(matches[0]['log-type'], 'err')
+
+        request, d = get_request({b'level': [b'error'],
+                                  b'spider': [b'toscrape-css']})
+        service.render(request)
+        yield d
+        matches = get_data(request)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0]['identifier'], self.job4.identifier)
+        self.assertEqual(matches[0]['line'], 2)
+
+        request, d = get_request({b'pattern': [b'toscrape'],
+                                  b'limit': [b'1']})
+        service.render(request)
+        yield d
+        self.assertEqual(len(get_data(request)), 1)
 
+        request, d = get_request({b'pattern': [b'toscrape'],
+                                  b'log-type': [b'out']})
+        service.render(request)
         yield d
+        self.assertEqual(len(get_data(request)), 0)
+
+        request, d = get_request({b'pattern': [b'toscrape'],
+                                  b'since': [b'2100-01-01']})
+        service.render(request)
+        yield d
+        self.assertEqual(len(get_data(request)), 0)
+
+        #-----------------------------------------------------------------------
+        # Errors
+        #-----------------------------------------------------------------------
+        for args in [{}, {b'pattern': [b'(']}, {b'level': [b'foo']},
+                     {b'level': [b'error'], b'log-type': [b'foo']}]:
+            request, d = get_request(args)
+            data = json.loads(service.render(request))
+            self.assertEqual(data['status'], 'error')
+            request.setResponseCode.assert_called_once_with(400)
+
+        shutil.rmtree(log_dir)
+
+    #---------------------------------------------------------------------------
+    def test_event_stream(self):
+        web_app = self.web_app
+        ws_factory = WSFactory(controller=web_app.controller)
+        web_app.ws_factory = ws_factory
+        service = EventStream(web_app)
+
+        def get_request(args={}, last_id=None):
+            request = Mock()
+            request.method = 'GET'
+            request.args = args
+            request.getHeader.side_effect = \
+                lambda x: last_id if x == 'Last-Event-ID' else None
+            d = Deferred()
+            request.notifyFinish.return_value = d
+            self.assertEqual(service.render(request), NOT_DONE_YET)
+            return request, d
+
+        def get_events(request):
+            data = b''.join([c[0][0] for c in request.write.call_args_list])
+            request.write.reset_mock()
+            return [(event_id, event_type, json.loads(data))
+                    for event_id, event_type, data in
+                    parse_events(data.decode('utf-8').split('\n'))]
+
+        #-----------------------------------------------------------------------
+        # A new client gets the summaries first
+        #-----------------------------------------------------------------------
+        request, d = get_request()
+        events = get_events(request)
+        self.assertEqual([e[1] for e in events],
+                         ['DAEMON_STATUS', 'PROJECTS_STATUS', 'JOBS_STATUS',
+                          'SYNC'])
+        self.assertIsNone(events[0][0])
+        self.assertEqual(events[-1][0], '{}:0'.format(ws_factory.epoch))
+        self.assertTrue(events[-1][2]['full'])
+
+        ws_factory.broadcast(project_remove_msg('foo'))
+        events = get_events(request)
+        self.assertEqual(events, [('{}:1'.format(ws_factory.epoch),
+                                   'PROJECT_REMOVE',
+                                   {'type': 'PROJECT_REMOVE', 'name': 'foo',
+                                    'seq': 1})])
+        ws_factory.broadcast(project_remove_msg('bar'))
+
+        #-----------------------------------------------------------------------
+        # A resuming client gets only the messages it has missed
+        #-----------------------------------------------------------------------
+        request2, d2 = get_request(
+            {b'types': [b'PROJECT_REMOVE,JOBS_STATUS']},
+            '{}:1'.format(ws_factory.epoch))
+        events = get_events(request2)
+        self.assertEqual([e[1] for e in events], ['PROJECT_REMOVE', 'SYNC'])
+        self.assertEqual(events[0][2]['name'], 'bar')
+        self.assertFalse(events[1][2]['full'])
+
+        ws_factory.broadcast({'type': 'DAEMON_STATUS'})
+        self.assertEqual(get_events(request2), [])
+        self.assertEqual(len(get_events(request)), 2)
+
+        request3, d3 = get_request({b'last-event-id': [b'foo:1']})
+        events = get_events(request3)
+        self.assertTrue(events[-1][2]['full'])
+
+        #-----------------------------------------------------------------------
+        # The clients that go away are forgotten
+        #-----------------------------------------------------------------------
+        self.assertEqual(len(ws_factory.streams), 3)
+        for deferred in [d, d2, d3]:
+            deferred.callback(None)
+        self.assertEqual(len(ws_factory.streams), 0)
+
+        #-----------------------------------------------------------------------
+        # The events for a client that doesn't keep up are queued, the status
+        # summaries are coalesced, and the client is dropped when it falls
+        # too far behind
+        #-----------------------------------------------------------------------
+        ws_factory.queue_limit = 3
+        request, d = get_request()
+        get_events(request)
+        producer = request.registerProducer.call_args[0][0]
+        self.assertTrue(request.registerProducer.call_args[0][1])
+
+        producer.pauseProducing()
+        ws_factory.broadcast(project_remove_msg('foo'))
+        ws_factory.broadcast({'type': 'DAEMON_STATUS', 'foo': 1})
+        ws_factory.broadcast({'type': 'DAEMON_STATUS', 'foo': 2})
+        producer.keepalive.f()
+        request.write.assert_not_called()
+
+        producer.resumeProducing()
+        events = get_events(request)
+        self.assertEqual([e[1] for e in events],
+                         ['PROJECT_REMOVE', 'DAEMON_STATUS'])
+        self.assertEqual(events[1][2]['foo'], 2)
+
+        producer.pauseProducing()
+        for name in ['a', 'b', 'c']:
+            ws_factory.broadcast(project_remove_msg(name))
+        request.transport.abortConnection.assert_not_called()
+        ws_factory.broadcast(project_remove_msg('d'))
+        request.transport.abortConnection.assert_called_once()
+        self.assertEqual(ws_factory.clients_dropped, 1)
+        self.assertEqual(len(ws_factory.streams), 0)
+        producer.resumeProducing()
+        request.write.assert_not_called()
+        d.callback(None)
 
     #---------------------------------------------------------------------------
     def test_web_app(self):
         config = Mock()
         config.get_options.return_value = []
+        config.get_int.return_value = 1000
+        config.get_float.return_value = 0.1
+        config.get_bool.return_value = True
         controller = Mock()
         request = Mock()
         with patch('scrapy_do.webservice.get_data') as get_data:
@@ -5,18 +5,35 @@
 # Licensed under the 3-Clause BSD License, see the LICENSE file for details.
 #-------------------------------------------------------------------------------
 
+import tempfile
 import base64
+import shutil
+import json
+import os
 
+from autobahn.websocket.compress import PerMessageDeflateOffer
+from autobahn.websocket.compress import PerMessageDeflateOfferAccept
+from autobahn.websocket.protocol import WebSocketProtocol
 from twisted.internet.defer import Deferred, inlineCallbacks
+from twisted.internet.testing import StringTransport
 from scrapy_do.controller import Event as ControllerEvent
 from scrapy_do.controller import Project
-from scrapy_do.schedule import Job, Status, Actor
-from scrapy_do.websocket import WSFactory, WSProtocol
+from scrapy_do.schedule import Schedule, Job, Status, Actor
+from scrapy_do.websocket import WSFactory, WSProtocol, encode_message
+from scrapy_do.websocket import accept_deflate, compact_message
+from scrapy_do.websocket import job_changes_msg, Subscription
 from unittest.mock import Mock, patch
 from twisted.trial import unittest
 from datetime import datetime
+from scrapy_do.logs import LogWatcher
+from scrapy_do.utils import twisted_sleep
 from .utils import json_encode, make_deferred_func
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 
 #-------------------------------------------------------------------------------
 class WebSocketTests(unittest.TestCase):
@@ -40,21 +57,40 @@ class WebSocketTests(unittest.TestCase):
         controller.get_active_jobs.return_value = active_jobs
         completed_jobs = [Job(status=Status.CANCELED, actor=Actor.USER)]
         controller.get_completed_jobs.return_value = completed_jobs
-        controller.get_job_logs.return_value = (None, None)
         controller.schedule_job.return_value = 'foo'
+        controller.metrics.get_snapshot.return_value = {
+            'timestamp': 0, 'memory-usage': 10., 'cpu-usage': 1.,
+            'threads': 1, 'open-files': 10, 'host-cpu-usage': 5.,
+            'host-memory-usage': 50., 'load-average': [0., 0., 0.]
+        }
         factory = WSFactory(controller=controller)
         factory.protocol = WSProtocol
+        self.factory = factory
         self.protocol = factory.buildProtocol(None)
 
+    #---------------------------------------------------------------------------
+    def get_broadcasts(self, send_prepared):
+        msgs = [json.loads(c[0][0].payload.decode('utf-8'))
+                for c in send_prepared.call_args_list]
+        send_prepared.reset_mock()
+        return msgs
+
     #---------------------------------------------------------------------------
     def test_server_status(self):
         protocol = self.protocol
-        with patch.object(WSProtocol, "sendMessage"):
+        with patch.object(WSProtocol, "sendMessage"), \
+                patch.object(WSProtocol, "sendPreparedMessage") as prepared:
             protocol.onOpen()
             protocol.onMessage(None, None)
+            self.factory.on_controller_event(
+                ControllerEvent.DAEMON_STATUS_CHANGE, None)
+            msgs = self.get_broadcasts(prepared)
+            self.assertEqual([msg['type'] for msg in msgs], ['DAEMON_STATUS'])
+
             protocol.onClose(None, None, None)
-            protocol.on_controller_event(ControllerEvent.DAEMON_STATUS_CHANGE,
-                                         None)
+            self.factory.on_controller_event(
+                ControllerEvent.DAEMON_STATUS_CHANGE, None)
+            prepared.assert_not_called()
 
     #---------------------------------------------------------------------------
     def test_action_messages(self):
@@ -74,15 +110,23 @@ class WebSocketTests(unittest.TestCase):
     def test_project_handling(self):
         protocol = self.protocol
         controller = self.controller
-        with patch.object(WSProtocol, "sendMessage") as send_message:
+        with patch.object(WSProtocol, "sendMessage") as send_message, \
+                patch.object(WSProtocol, "sendPreparedMessage") as prepared:
             #-------------------------------------------------------------------
             # Test controller events
             #-------------------------------------------------------------------
+            protocol.onOpen()
             project = Project('project', None, ['spider1', 'spider2'])
-            protocol.on_controller_event(ControllerEvent.PROJECT_PUSH,
-                                         project)
-            protocol.on_controller_event(ControllerEvent.PROJECT_REMOVE,
-                                         'project')
+            self.factory.on_controller_event(ControllerEvent.PROJECT_PUSH,
+                                             project)
+            self.factory.on_controller_event(ControllerEvent.PROJECT_REMOVE,
+                                             'project')
+            msgs = self.get_broadcasts(prepared)
+            self.assertEqual([msg['type'] for msg in msgs],
+                             ['PROJECT_PUSH', 'PROJECTS_STATUS',
+                              'PROJECT_REMOVE', 'PROJECTS_STATUS'])
+            self.assertEqual(msgs[0]['spiders'], ['spider1', 'spider2'])
+            self.assertEqual(msgs[2]['name'], 'project')
 
             #-------------------------------------------------------------------
             # Test PROJECT_REMOVE_ACTION
@@ -140,18 +184,44 @@ class WebSocketTests(unittest.TestCase):
         #-----------------------------------------------------------------------
         # Test building of job dictionaries
         #-----------------------------------------------------------------------
-        controller.get_job_logs.return_value = ('/foo/bar', '/foo/bar')
         job = Job(status=Status.CANCELED, actor=Actor.USER)
         job_dict = protocol.process_job(job)
+        self.assertFalse(job_dict['outLog'])
+        self.assertFalse(job_dict['errLog'])
+
+        job.logs = {'err': 100}
+        job_dict = protocol.process_job(job)
+        self.assertFalse(job_dict['outLog'])
+        self.assertTrue(job_dict['errLog'])
+
+        job.status = Status.RUNNING
+        job_dict = protocol.process_job(job)
         self.assertTrue(job_dict['outLog'])
         self.assertTrue(job_dict['errLog'])
+        controller.get_job_logs.assert_not_called()
 
-        with patch.object(WSProtocol, "sendMessage") as send_message:
+        job = Job(status=Status.CANCELED, actor=Actor.USER,
+                  logs={'out': 10, 'err': 100})
+
+        def flush():
+            self.factory.flush_call.cancel()
+            self.factory.flush_job_changes()
+
+        with patch.object(WSProtocol, "sendMessage") as send_message, \
+                patch.object(WSProtocol, "sendPreparedMessage") as prepared:
             #-------------------------------------------------------------------
             # Test job events
             #-------------------------------------------------------------------
-            protocol.on_controller_event(ControllerEvent.JOB_UPDATE, job)
-            protocol.on_controller_event(ControllerEvent.JOB_REMOVE, 'foo')
+            protocol.onOpen()
+            self.factory.on_controller_event(ControllerEvent.JOB_UPDATE, job)
+            self.factory.on_controller_event(ControllerEvent.JOB_REMOVE, 'foo')
+            flush()
+            msgs = self.get_broadcasts(prepared)
+            self.assertEqual([msg['type'] for msg in msgs],
+                             ['JOB_BATCH_UPDATE', 'JOBS_STATUS'])
+            self.assertEqual(msgs[0]['jobs'][0]['identifier'], job.identifier)
+            self.assertTrue(msgs[0]['jobs'][0]['outLog'])
+            self.assertEqual(msgs[0]['removed'], ['foo'])
 
             #-------------------------------------------------------------------
             # Test job cancellation
@@ -202,5 +272,755 @@ class WebSocketTests(unittest.TestCase):
             data = json_encode(msg)
             protocol.onMessage(data, False)
 
+            msg['dependencies'] = 'foo'
+            send_message.reset_mock()
+            protocol.onMessage(json_encode(msg), False)
+            send_message.assert_called_once()
+            controller.schedule_job.reset_mock()
+            msg['dependencies'] = ['foo']
+            protocol.onMessage(json_encode(msg), False)
+            _, kwargs = controller.schedule_job.call_args
+            self.assertEqual(kwargs['dependencies'], ['foo'])
+
             controller.schedule_job.side_effect = ValueError('foo')
             protocol.onMessage(data, False)
+
+            #-------------------------------------------------------------------
+            # Test batch scheduling
+            #-------------------------------------------------------------------
+            job2 = Job(status=Status.PENDING, actor=Actor.USER)
+            self.factory.on_controller_event(
+                ControllerEvent.JOB_BATCH_UPDATE, [job, job2])
+            flush()
+            msgs = self.get_broadcasts(prepared)
+            self.assertEqual([j['identifier'] for j in msgs[0]['jobs']],
+                             [job.identifier, job2.identifier])
+
+            msg = {
+                'type': 'ACTION',
+                'action': 'JOBS_SCHEDULE',
+                'id': 'foo'
+            }
+            for jobs in [None, 'foo', [{'project': 'foo', 'spider': 'bar'}]]:
+                if jobs is not None:
+                    msg['jobs'] = jobs
+                send_message.reset_mock()
+                protocol.onMessage(json_encode(msg), False)
+                send_message.assert_called_once()
+
+            controller.schedule_jobs.side_effect = ValueError('foo')
+            protocol.onMessage(json_encode(msg), False)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_log_subscription(self):
+        log_dir = tempfile.mkdtemp()
+        controller = self.controller
+        controller.log_dir = log_dir
+        controller.log_watcher = LogWatcher(use_inotify=False)
+        controller.running_jobs = {'foo': None}
+        log_path = os.path.join(log_dir, 'foo.err')
+        with open(log_path, 'wb') as f:
+            f.write(b'abc')
+
+        factory = self.protocol.factory
+        protocol1 = self.protocol
+        protocol2 = factory.buildProtocol(None)
+
+        def subscribe(protocol, action='LOG_SUBSCRIBE', **kwargs):
+            msg = {'type': 'ACTION', 'action': action, 'id': 'x', **kwargs}
+            protocol.onMessage(json_encode(msg), False)
+
+        def get_messages(send_message):
+            return [json.loads(c[0][0].decode('utf-8'))
+                    for c in send_message.call_args_list]
+
+        with patch.object(WSProtocol, "sendMessage") as send_message:
+            #-------------------------------------------------------------------
+            # Errors
+            #-------------------------------------------------------------------
+            subscribe(protocol1)
+            subscribe(protocol1, jobId='foo', logType='foo')
+            subscribe(protocol1, jobId='bar', logType='err')
+            subscribe(protocol1, 'LOG_UNSUBSCRIBE', jobId='foo',
+                      logType='err')
+            for msg in get_messages(send_message):
+                self.assertEqual(msg['status'], 'ERROR')
+
+            #-------------------------------------------------------------------
+            # Two clients share a follower
+            #-------------------------------------------------------------------
+            send_message.reset_mock()
+            subscribe(protocol1, jobId='foo', logType='err')
+            subscribe(protocol2, jobId='foo', logType='err', offset=3)
+            subscribe(protocol2, jobId='foo', logType='err')
+            self.assertEqual(len(factory.log_followers), 1)
+            msgs = get_messages(send_message)
+            self.assertEqual(msgs[0]['status'], 'OK')
+            self.assertEqual(msgs[1]['type'], 'LOG_DATA')
+            self.assertEqual(msgs[1]['data'], 'abc')
+            self.assertEqual(msgs[2]['status'], 'OK')
+            self.assertEqual(msgs[3]['status'], 'ERROR')
+
+            send_message.reset_mock()
+            with open(log_path, 'ab') as f:
+                f.write(b'def')
+            controller.log_watcher.notify(log_path)
+            msgs = get_messages(send_message)
+            self.assertEqual(len(msgs), 2)
+            for msg in msgs:
+                self.assertEqual(msg['type'], 'LOG_DATA')
+                self.assertEqual(msg['offset'], 3)
+                self.assertEqual(msg['data'], 'def')
+
+            #-------------------------------------------------------------------
+            # Unsubscribe, disconnect, and finish
+            #-------------------------------------------------------------------
+            send_message.reset_mock()
+            subscribe(protocol2, 'LOG_UNSUBSCRIBE', jobId='foo',
+                      logType='err')
+            self.assertEqual(get_messages(send_message)[0]['status'], 'OK')
+            self.assertEqual(len(factory.log_followers), 1)
+
+            send_message.reset_mock()
+            controller.running_jobs = {}
+            controller.log_watcher.notify(log_path)
+            msgs = get_messages(send_message)
+            self.assertEqual(msgs[0]['type'], 'LOG_END')
+            self.assertEqual(factory.log_followers, {})
+            self.assertEqual(protocol1.log_subscriptions, {})
+
+            controller.running_jobs = {'foo': None}
+            subscribe(protocol1, jobId='foo', logType='err')
+            self.assertEqual(len(factory.log_followers), 1)
+            protocol1.onClose(None, None, None)
+            self.assertEqual(factory.log_followers, {})
+
+            #-------------------------------------------------------------------
+            # Completed job
+            #-------------------------------------------------------------------
+            controller.running_jobs = {}
+            d = Deferred()
+            send_message.reset_mock()
+            send_message.side_effect = lambda x, *args: \
+                d.callback(None) if b'LOG_END' in x else None
+            subscribe(protocol2, jobId='foo', logType='err', offset=2)
+            yield d
+            msgs = get_messages(send_message)
+            self.assertEqual(msgs[0]['status'], 'OK')
+            self.assertEqual(msgs[1]['data'], 'cdef')
+            self.assertEqual(msgs[2]['type'], 'LOG_END')
+            self.assertEqual(protocol2.log_subscriptions, {})
+
+        shutil.rmtree(log_dir)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_event_batching(self):
+        controller = self.controller
+        factory = WSFactory(controller=controller, batch_window=0.01)
+        factory.protocol = WSProtocol
+        protocols = [factory.buildProtocol(None) for _ in range(2)]
+        senders = []
+        for protocol in protocols:
+            patch.object(protocol, 'sendMessage').start()
+            sender = patch.object(protocol, 'sendPreparedMessage').start()
+            self.addCleanup(patch.stopall)
+            protocol.onOpen()
+            senders.append(sender)
+        controller.add_event_listener.assert_called_with(
+            factory.on_controller_event)
+
+        def get_messages(sender):
+            msgs = [json.loads(c[0][0].payload.decode('utf-8'))
+                    for c in sender.call_args_list]
+            sender.reset_mock()
+            return msgs
+
+        #-----------------------------------------------------------------------
+        # The job events are collapsed per job and sent together, the other
+        # events are sent right away
+        #-----------------------------------------------------------------------
+        job1 = Job(status=Status.PENDING, actor=Actor.USER)
+        job2 = Job(status=Status.PENDING, actor=Actor.USER)
+        for _ in range(100):
+            factory.on_controller_event(ControllerEvent.JOB_UPDATE, job1)
+        factory.on_controller_event(ControllerEvent.JOB_BATCH_UPDATE, [job2])
+        factory.on_controller_event(ControllerEvent.JOB_REMOVE,
+                                    job2.identifier)
+        factory.on_controller_event(ControllerEvent.JOB_REMOVE, 'foo')
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'bar')
+        for sender in senders:
+            msgs = get_messages(sender)
+            self.assertEqual([msg['type'] for msg in msgs],
+                             ['PROJECT_REMOVE', 'PROJECTS_STATUS'])
+
+        #-----------------------------------------------------------------------
+        # Every message is serialized once for all the clients
+        #-----------------------------------------------------------------------
+        with patch('scrapy_do.websocket.encode_message',
+                   wraps=encode_message) as encode:
+            yield twisted_sleep(0.05)
+            self.assertEqual(encode.call_count, 2)
+        self.assertIs(senders[0].call_args_list[0][0][0],
+                      senders[1].call_args_list[0][0][0])
+
+        for sender in senders:
+            msgs = get_messages(sender)
+            self.assertEqual([msg['type'] for msg in msgs],
+                             ['JOB_BATCH_UPDATE', 'JOBS_STATUS'])
+            self.assertEqual([job['identifier'] for job in msgs[0]['jobs']],
+                             [job1.identifier])
+            self.assertEqual(msgs[0]['removed'], [job2.identifier, 'foo'])
+
+        #-----------------------------------------------------------------------
+        # Pending changes are still flushed after the clients disconnect, so
+        # that they can be replayed when the clients come back
+        #-----------------------------------------------------------------------
+        seq = factory.seq
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, job1)
+        for protocol in protocols:
+            protocol.onClose(None, None, None)
+        self.assertEqual(len(factory.connections), 0)
+        yield twisted_sleep(0.05)
+        self.assertEqual(factory.seq, seq + 2)
+        for sender in senders:
+            self.assertEqual(sender.call_count, 0)
+        controller.remove_event_listener.assert_not_called()
+
+    #---------------------------------------------------------------------------
+    def test_resync(self):
+        controller = self.controller
+        factory = WSFactory(controller=controller, event_buffer_size=4)
+        factory.protocol = WSProtocol
+
+        def connect(since=None):
+            protocol = factory.buildProtocol(None)
+            request = Mock()
+            request.params = {'since': [since]} if since is not None else {}
+            request.protocols = []
+            protocol.onConnect(request)
+            sender = patch.object(protocol, 'sendMessage').start()
+            prepared = patch.object(protocol, 'sendPreparedMessage').start()
+            self.addCleanup(patch.stopall)
+            protocol.onOpen()
+            msgs = [json.loads(c[0][0].decode('utf-8'))
+                    for c in sender.call_args_list]
+            msgs += [json.loads(c[0][0].payload.decode('utf-8'))
+                     for c in prepared.call_args_list]
+            protocol.onClose(None, None, None)
+            return msgs
+
+        def types(msgs):
+            return [msg['type'] for msg in msgs]
+
+        #-----------------------------------------------------------------------
+        # A fresh client gets the full snapshot
+        #-----------------------------------------------------------------------
+        msgs = connect()
+        self.assertEqual(types(msgs)[-1], 'SYNC')
+        self.assertTrue(msgs[-1]['full'])
+        self.assertEqual(msgs[-1]['epoch'], factory.epoch)
+        self.assertEqual(msgs[-1]['seq'], 0)
+        self.assertIn('JOB_LIST', types(msgs))
+
+        #-----------------------------------------------------------------------
+        # A client that is up to date gets nothing but the sync message
+        #-----------------------------------------------------------------------
+        msgs = connect('{}:0'.format(factory.epoch))
+        self.assertEqual(types(msgs), ['SYNC'])
+        self.assertFalse(msgs[0]['full'])
+
+        #-----------------------------------------------------------------------
+        # A client that has missed some messages gets only these
+        #-----------------------------------------------------------------------
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'foo')
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'bar')
+        self.assertEqual(factory.seq, 4)
+        msgs = connect('{}:2'.format(factory.epoch))
+        self.assertEqual(types(msgs),
+                         ['SYNC', 'PROJECT_REMOVE', 'PROJECTS_STATUS'])
+        self.assertEqual(msgs[1]['name'], 'bar')
+        self.assertEqual(msgs[1]['seq'], 3)
+        self.assertEqual(msgs[2]['seq'], 4)
+        self.assertEqual(msgs[0]['seq'], 4)
+        self.assertFalse(msgs[0]['full'])
+
+        #-----------------------------------------------------------------------
+        # The buffer has rolled over, the epoch does not match, or the resume
+        # point is invalid
+        #-----------------------------------------------------------------------
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'baz')
+        self.assertEqual(factory.events[0][0], 3)
+        self.assertIsNone(factory.get_missed_events(factory.epoch, 1))
+        self.assertEqual(len(factory.get_missed_events(factory.epoch, 2)), 4)
+        self.assertIsNone(factory.get_missed_events(factory.epoch, 10))
+        self.assertIsNone(factory.get_missed_events('foo', 6))
+        for since in ['{}:1'.format(factory.epoch), 'foo:6', 'foo', 'foo:x']:
+            msgs = connect(since)
+            self.assertTrue(msgs[-1]['full'])
+            self.assertIn('JOB_LIST', types(msgs))
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_job_windows(self):
+        schedule = Schedule()
+        completed = [Job(status=Status.SUCCESSFUL, actor=Actor.USER,
+                         project='foo', spider='bar') for _ in range(5)]
+        active = Job(status=Status.RUNNING, actor=Actor.USER, project='foo',
+                     spider='bar')
+        schedule.add_jobs(completed + [active])
+
+        controller = self.controller
+        controller.get_jobs_window.side_effect = schedule.get_jobs_window
+        controller.get_active_jobs.return_value = [active]
+        controller.get_completed_jobs.side_effect = \
+            schedule.get_completed_jobs
+        factory = WSFactory(controller=controller, batch_window=0)
+        factory.protocol = WSProtocol
+
+        def connect(params):
+            protocol = factory.buildProtocol(None)
+            request = Mock()
+            request.params = params
+            request.protocols = []
+            protocol.onConnect(request)
+            sender = patch.object(protocol, 'sendMessage').start()
+            prepared = patch.object(protocol, 'sendPreparedMessage').start()
+            self.addCleanup(patch.stopall)
+            protocol.onOpen()
+            return protocol, sender, prepared
+
+        def get_messages(protocol):
+            msgs = [json.loads(c[0][0].decode('utf-8'))
+                    for c in protocol.sendMessage.call_args_list]
+            msgs += [json.loads(c[0][0].payload.decode('utf-8'))
+                     for c in protocol.sendPreparedMessage.call_args_list]
+            protocol.sendMessage.reset_mock()
+            protocol.sendPreparedMessage.reset_mock()
+            return msgs
+
+        def get_list(msgs, status):
+            return [msg for msg in msgs
+                    if msg['type'] == 'JOB_LIST' and msg['status'] == status]
+
+        def get_batches(msgs):
+            return [msg for msg in msgs if msg['type'] == 'JOB_BATCH_UPDATE']
+
+        #-----------------------------------------------------------------------
+        # A windowed client gets only the first page of the completed jobs
+        #-----------------------------------------------------------------------
+        windowed, _, _ = connect({'window': ['2']})
+        windowed2, _, _ = connect({'window': ['2']})
+        legacy, _, _ = connect({'window': ['foo']})
+        self.assertEqual(legacy.job_windows, {})
+
+        msgs = get_messages(windowed)
+        page = get_list(msgs, 'COMPLETED')[0]
+        self.assertEqual(len(page['jobs']), 2)
+        self.assertEqual(page['total'], 5)
+        self.assertEqual(page['offset'], 0)
+        self.assertEqual(len(get_list(msgs, 'ACTIVE')[0]['jobs']), 1)
+        msgs = get_messages(legacy)
+        self.assertEqual(len(get_list(msgs, 'COMPLETED')[0]['jobs']), 5)
+        get_messages(windowed2)
+
+        in_window = page['jobs'][0]['identifier']
+        in_window = [job for job in completed
+                     if job.identifier == in_window][0]
+        out_of_window = [job for job in completed
+                         if job.identifier not in
+                         windowed.job_windows['COMPLETED'].ids][0]
+
+        #-----------------------------------------------------------------------
+        # Changes inside and outside of the window
+        #-----------------------------------------------------------------------
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, in_window)
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, out_of_window)
+        yield twisted_sleep(0.01)
+
+        msgs = get_messages(windowed)
+        batches = get_batches(msgs)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([job['identifier'] for job in batches[0]['jobs']],
+                         [in_window.identifier])
+        self.assertEqual(batches[0]['removed'], [out_of_window.identifier])
+        self.assertNotIn('seq', batches[0])
+        self.assertEqual(get_list(msgs, 'COMPLETED'), [])
+        self.assertEqual(msgs[-1]['type'], 'JOBS_STATUS')
+
+        msgs = get_messages(legacy)
+        self.assertEqual(len(get_batches(msgs)[0]['jobs']), 2)
+        get_messages(windowed2)
+
+        #-----------------------------------------------------------------------
+        # Changes of the counts; the connections looking at the same window
+        # share the messages
+        #-----------------------------------------------------------------------
+        active.status = Status.SUCCESSFUL
+        schedule.commit_job(active)
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, active)
+        yield twisted_sleep(0.01)
+
+        sent = [c[0][0] for c in
+                windowed.sendPreparedMessage.call_args_list]
+        sent2 = [c[0][0] for c in
+                 windowed2.sendPreparedMessage.call_args_list]
+        self.assertEqual(len(sent), 3)
+        for prepared, prepared2 in zip(sent, sent2):
+            self.assertIs(prepared, prepared2)
+
+        msgs = get_messages(windowed)
+        self.assertEqual(get_batches(msgs)[0]['jobs'], [])
+        self.assertEqual(get_batches(msgs)[0]['removed'], [active.identifier])
+        page = get_list(msgs, 'COMPLETED')[0]
+        self.assertEqual(page['total'], 6)
+        self.assertEqual(windowed.job_windows['COMPLETED'].total, 6)
+        get_messages(windowed2)
+
+        schedule.remove_job(in_window.identifier)
+        factory.on_controller_event(ControllerEvent.JOB_REMOVE,
+                                    in_window.identifier)
+        yield twisted_sleep(0.01)
+        msgs = get_messages(windowed)
+        if in_window.identifier in set(job['identifier']
+                                       for job in page['jobs']):
+            self.assertEqual(get_batches(msgs), [])
+            page = get_list(msgs, 'COMPLETED')[0]
+            self.assertEqual(page['total'], 5)
+        else:
+            self.assertEqual(get_batches(msgs)[0]['removed'],
+                             [in_window.identifier])
+        get_messages(windowed2)
+
+        #-----------------------------------------------------------------------
+        # Moving the window
+        #-----------------------------------------------------------------------
+        def window(protocol, **kwargs):
+            msg = {'id': 'foo', 'type': 'ACTION', 'action': 'JOB_WINDOW'}
+            msg.update(kwargs)
+            protocol.onMessage(json.dumps(msg).encode('utf-8'), False)
+            return get_messages(protocol)
+
+        msgs = window(windowed, list='COMPLETED', offset=4, limit=2)
+        self.assertEqual(msgs[0]['status'], 'OK')
+        self.assertEqual(msgs[1]['offset'], 4)
+        self.assertEqual(len(msgs[1]['jobs']), 1)
+        self.assertEqual(windowed.job_windows['COMPLETED'].offset, 4)
+
+        msgs = window(windowed, list='ACTIVE', project='bar')
+        self.assertEqual(msgs[1]['total'], 0)
+        self.assertEqual(set(windowed.job_windows), {'ACTIVE', 'COMPLETED'})
+
+        for params in [{'list': 'foo'}, {'list': 'ACTIVE', 'limit': 0},
+                       {'list': 'ACTIVE', 'offset': -1},
+                       {'list': 'ACTIVE', 'limit': 'foo'},
+                       {'list': 'ACTIVE', 'sort': 'foo'}]:
+            msgs = window(windowed, **params)
+            self.assertEqual(msgs[0]['status'], 'ERROR')
+
+        #-----------------------------------------------------------------------
+        # A resuming windowed client is not replayed the job changes but is
+        # sent the lists anew
+        #-----------------------------------------------------------------------
+        since = '{}:0'.format(factory.epoch)
+        resumed, _, _ = connect({'window': ['2'], 'since': [since]})
+        msgs = get_messages(resumed)
+        self.assertEqual(get_batches(msgs), [])
+        self.assertIn('JOBS_STATUS', [msg['type'] for msg in msgs])
+        self.assertEqual(len(get_list(msgs, 'COMPLETED')[0]['jobs']), 2)
+        self.assertFalse([msg for msg in msgs if msg['type'] == 'SYNC'][0][
+            'full'])
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_backpressure(self):
+        factory = WSFactory(controller=self.controller, batch_window=0,
+                            queue_limit=5)
+        factory.setProtocolOptions(openHandshakeTimeout=0)
+        factory.protocol = WSProtocol
+        protocol = factory.buildProtocol(None)
+        transport = StringTransport()
+        protocol.makeConnection(transport)
+        protocol.state = WebSocketProtocol.STATE_OPEN
+        protocol.websocket_version = 13
+        protocol.onOpen()
+        self.assertIs(transport.producer, protocol)
+        self.assertTrue(transport.streaming)
+        transport.clear()
+
+        #-----------------------------------------------------------------------
+        # The messages are queued while the client doesn't keep up, the job
+        # and status changes are coalesced
+        #-----------------------------------------------------------------------
+        job = Job(status=Status.PENDING, actor=Actor.USER)
+        protocol.pauseProducing()
+        for _ in range(3):
+            factory.on_controller_event(ControllerEvent.JOB_UPDATE, job)
+            yield twisted_sleep(0.01)
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'foo')
+        self.assertEqual(transport.value(), b'')
+        self.assertEqual(len(protocol.outbound), 4)
+        self.assertEqual(factory.get_queue_depths(), {protocol.peer: 4})
+
+        protocol.resumeProducing()
+        data = transport.value()
+        self.assertEqual(data.count(job.identifier.encode('utf-8')), 1)
+        self.assertEqual(data.count(b'JOBS_STATUS'), 1)
+        self.assertEqual(data.count(b'PROJECT_REMOVE'), 1)
+        self.assertEqual(len(protocol.outbound), 0)
+        transport.clear()
+
+        #-----------------------------------------------------------------------
+        # The clients that fall too far behind are dropped
+        #-----------------------------------------------------------------------
+        protocol.pauseProducing()
+        for i in range(4):
+            factory.on_controller_event(ControllerEvent.PROJECT_REMOVE,
+                                        'foo{}'.format(i))
+        self.assertEqual(len(protocol.outbound), 5)
+        self.assertIn(protocol, factory.connections)
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'bar')
+        self.assertEqual(factory.clients_dropped, 1)
+        self.assertNotIn(protocol, factory.connections)
+        self.assertTrue(transport.disconnecting)
+        self.assertEqual(transport.value(), b'')
+
+    #---------------------------------------------------------------------------
+    def test_encodings(self):
+        if msgpack is None:
+            raise unittest.SkipTest('The msgpack module is not installed')
+
+        #-----------------------------------------------------------------------
+        # Compact job lists
+        #-----------------------------------------------------------------------
+        jobs = [Job(status=Status.PENDING, actor=Actor.USER, project='foo',
+                    spider='bar') for _ in range(3)]
+        msg = job_changes_msg(jobs, ['baz'])
+        decoded = msgpack.unpackb(encode_message(msg, 'msgpack'), raw=False)
+        fields = decoded['jobs']['fields']
+        rows = [dict(zip(fields, row)) for row in decoded['jobs']['rows']]
+        self.assertEqual(rows, json.loads(encode_message(msg))['jobs'])
+        self.assertEqual(decoded['removed'], ['baz'])
+        self.assertEqual(compact_message({'type': 'foo', 'jobs': []}),
+                         {'type': 'foo', 'jobs': []})
+
+        #-----------------------------------------------------------------------
+        # Negotiation
+        #-----------------------------------------------------------------------
+        factory = WSFactory(controller=self.controller)
+        factory.protocol = WSProtocol
+        self.assertIs(factory.perMessageCompressionAccept, accept_deflate)
+        self.assertIsInstance(accept_deflate([PerMessageDeflateOffer()]),
+                              PerMessageDeflateOfferAccept)
+        self.assertIsNone(accept_deflate([]))
+        factory2 = WSFactory(controller=self.controller, compression=False)
+        self.assertIsNot(factory2.perMessageCompressionAccept, accept_deflate)
+
+        def connect(protocols):
+            protocol = factory.buildProtocol(None)
+            request = Mock()
+            request.params = {}
+            request.protocols = protocols
+            subprotocol = protocol.onConnect(request)
+            patch.object(protocol, 'sendMessage').start()
+            patch.object(protocol, 'sendPreparedMessage').start()
+            self.addCleanup(patch.stopall)
+            protocol.onOpen()
+            return protocol, subprotocol
+
+        json_protocol, subprotocol = connect([])
+        self.assertIsNone(subprotocol)
+        self.assertEqual(json_protocol.encoding, 'json')
+        msgpack_protocol, subprotocol = connect(['foo', 'scrapy-do.msgpack',
+                                                 'scrapy-do.json'])
+        self.assertEqual(subprotocol, 'scrapy-do.msgpack')
+        self.assertEqual(msgpack_protocol.encoding, 'msgpack')
+        with patch('scrapy_do.websocket.msgpack', None):
+            protocol, subprotocol = connect(['scrapy-do.msgpack',
+                                             'scrapy-do.json'])
+            self.assertEqual(subprotocol, 'scrapy-do.json')
+            self.assertEqual(protocol.encoding, 'json')
+
+        #-----------------------------------------------------------------------
+        # Every client gets the messages in its encoding
+        #-----------------------------------------------------------------------
+        call = msgpack_protocol.sendMessage.call_args_list[0]
+        self.assertEqual(call[0][1], True)
+        msgpack.unpackb(call[0][0], raw=False)
+
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'foo')
+        prepared = json_protocol.sendPreparedMessage.call_args_list[0][0][0]
+        self.assertFalse(prepared.binary)
+        self.assertEqual(json.loads(prepared.payload.decode('utf-8'))['name'],
+                         'foo')
+        prepared = msgpack_protocol.sendPreparedMessage.call_args_list[0][0][0]
+        self.assertTrue(prepared.binary)
+        self.assertEqual(msgpack.unpackb(prepared.payload, raw=False)['name'],
+                         'foo')
+
+        missed = factory.get_missed_events(factory.epoch, 0,
+                                           encoding='msgpack')
+        self.assertEqual(len(missed), 2)
+        self.assertIs(missed[0], prepared)
+
+    #---------------------------------------------------------------------------
+    @inlineCallbacks
+    def test_subscriptions(self):
+        schedule = Schedule()
+        foo_running = Job(status=Status.RUNNING, actor=Actor.USER,
+                          project='foo', spider='spider')
+        bar_running = Job(status=Status.RUNNING, actor=Actor.USER,
+                          project='bar', spider='spider')
+        foo_done = Job(status=Status.SUCCESSFUL, actor=Actor.USER,
+                       project='foo', spider='spider')
+        schedule.add_jobs([foo_running, bar_running, foo_done])
+
+        controller = self.controller
+        controller.get_jobs_window.side_effect = schedule.get_jobs_window
+        controller.get_active_jobs.side_effect = schedule.get_active_jobs
+        controller.get_completed_jobs.side_effect = \
+            schedule.get_completed_jobs
+        factory = WSFactory(controller=controller, batch_window=0)
+        factory.protocol = WSProtocol
+
+        def connect(params):
+            protocol = factory.buildProtocol(None)
+            request = Mock()
+            request.params = params
+            request.protocols = []
+            protocol.onConnect(request)
+            patch.object(protocol, 'sendMessage').start()
+            patch.object(protocol, 'sendPreparedMessage').start()
+            self.addCleanup(patch.stopall)
+            protocol.onOpen()
+            get_messages(protocol)
+            return protocol
+
+        def get_messages(protocol):
+            msgs = [json.loads(c[0][0].decode('utf-8'))
+                    for c in protocol.sendMessage.call_args_list]
+            msgs += [json.loads(c[0][0].payload.decode('utf-8'))
+                     for c in protocol.sendPreparedMessage.call_args_list]
+            protocol.sendMessage.reset_mock()
+            protocol.sendPreparedMessage.reset_mock()
+            return msgs
+
+        def get_types(msgs):
+            return [msg['type'] for msg in msgs]
+
+        def get_batch(msgs):
+            batches = [msg for msg in msgs
+                       if msg['type'] == 'JOB_BATCH_UPDATE']
+            if not batches:
+                return None
+            return (sorted(job['identifier'] for job in batches[0]['jobs']),
+                    batches[0]['removed'])
+
+        def subscribe(protocol, **params):
+            params.update({'type': 'ACTION', 'id': 1, 'action': 'SUBSCRIBE'})
+            protocol.onMessage(json.dumps(params).encode('utf-8'), False)
+            msgs = get_messages(protocol)
+            self.assertEqual(msgs[0]['type'], 'ACTION_EXECUTED')
+            return msgs
+
+        #-----------------------------------------------------------------------
+        # Invalid subscriptions
+        #-----------------------------------------------------------------------
+        with self.assertRaises(ValueError):
+            Subscription(projects='foo')
+        with self.assertRaises(ValueError):
+            Subscription(statuses=['FOO'])
+        self.assertTrue(Subscription().is_everything)
+
+        firehose = connect({})
+        foo = connect({})
+        running = connect({})
+        counters = connect({})
+        msgs = subscribe(foo, projects=['foo'])
+        self.assertEqual(msgs[0]['status'], 'OK')
+        projects = [msg for msg in msgs if msg['type'] == 'PROJECT_LIST'][0]
+        self.assertEqual([prj['name'] for prj in projects['projects']],
+                         ['foo'])
+        listed = [job['identifier'] for msg in msgs
+                  if msg['type'] == 'JOB_LIST' for job in msg['jobs']]
+        self.assertEqual(sorted(listed), sorted([foo_running.identifier,
+                                                 foo_done.identifier]))
+        subscribe(running, statuses=['RUNNING'])
+        msgs = subscribe(counters, countersOnly=True)
+        self.assertEqual(get_types(msgs), ['ACTION_EXECUTED'])
+        msgs = subscribe(firehose, projects=['foo'], statuses=['FOO'])
+        self.assertEqual(msgs[0]['status'], 'ERROR')
+
+        #-----------------------------------------------------------------------
+        # The index
+        #-----------------------------------------------------------------------
+        self.assertEqual(factory.unsubscribed, {firehose})
+        self.assertEqual(factory.job_routes[('foo', None)], {foo})
+        self.assertEqual(factory.job_routes[(None, Status.RUNNING)],
+                         {running})
+        self.assertEqual(factory.project_routes[None], {running})
+        self.assertNotIn(counters, factory.job_subscribers.get(
+            foo_running.identifier, set()))
+
+        #-----------------------------------------------------------------------
+        # The job events are routed to the subscribers only
+        #-----------------------------------------------------------------------
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, foo_running)
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, bar_running)
+        yield twisted_sleep(0.01)
+        self.assertEqual(get_batch(get_messages(firehose)),
+                         (sorted([foo_running.identifier,
+                                  bar_running.identifier]), []))
+        self.assertEqual(get_batch(get_messages(foo)),
+                         ([foo_running.identifier], []))
+        self.assertEqual(get_batch(get_messages(running)),
+                         (sorted([foo_running.identifier,
+                                  bar_running.identifier]), []))
+        msgs = get_messages(counters)
+        self.assertEqual(get_types(msgs), ['JOBS_STATUS'])
+
+        #-----------------------------------------------------------------------
+        # The jobs that stop matching a subscription are removed
+        #-----------------------------------------------------------------------
+        bar_running.status = Status.SUCCESSFUL
+        factory.on_controller_event(ControllerEvent.JOB_UPDATE, bar_running)
+        yield twisted_sleep(0.01)
+        self.assertIsNone(get_batch(get_messages(foo)))
+        self.assertEqual(get_batch(get_messages(running)),
+                         ([], [bar_running.identifier]))
+        self.assertEqual(get_batch(get_messages(firehose)),
+                         ([bar_running.identifier], []))
+
+        factory.on_controller_event(ControllerEvent.JOB_REMOVE,
+                                    foo_running.identifier)
+        yield twisted_sleep(0.01)
+        self.assertEqual(get_batch(get_messages(foo)),
+                         ([], [foo_running.identifier]))
+        self.assertEqual(get_batch(get_messages(running)),
+                         ([], [foo_running.identifier]))
+        self.assertNotIn(foo_running.identifier, factory.job_subscribers)
+        get_messages(firehose)
+        get_messages(counters)
+
+        #-----------------------------------------------------------------------
+        # Project events
+        #-----------------------------------------------------------------------
+        factory.on_controller_event(ControllerEvent.PROJECT_REMOVE, 'bar')
+        self.assertIn('PROJECT_REMOVE', get_types(get_messages(firehose)))
+        self.assertIn('PROJECT_REMOVE', get_types(get_messages(running)))
+        self.assertEqual(get_types(get_messages(foo)), ['PROJECTS_STATUS'])
+        self.assertEqual(get_types(get_messages(counters)),
+                         ['PROJECTS_STATUS'])
+
+        #-----------------------------------------------------------------------
+        # Subscribing to everything again and disconnecting clean up the
+        # index
+        #-----------------------------------------------------------------------
+        subscribe(foo)
+        self.assertIn(foo, factory.unsubscribed)
+        self.assertNotIn(('foo', None), factory.job_routes)
+        self.assertNotIn(foo_done.identifier, factory.job_subscribers)
+        running.onClose(True, None, None)
+        self.assertEqual(dict(factory.job_routes), {})
+        self.assertEqual(factory.job_subscribers, {})
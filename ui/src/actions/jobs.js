@@ -8,6 +8,8 @@
 export const JOB_LIST_SET = 'JOB_LIST_SET';
 export const JOB_UPDATE = 'JOB_UPDATE';
 export const JOB_REMOVE = 'JOB_REMOVE';
+export const JOB_BATCH_UPDATE = 'JOB_BATCH_UPDATE';
+export const JOB_WINDOW_SET = 'JOB_WINDOW_SET';
 
 export function jobListSet(status, jobs) {
   return {
@@ -30,3 +32,21 @@ export function jobRemove(jobId) {
     jobId
   };
 }
+
+export function jobBatchUpdate(jobs, removed) {
+  return {
+    type: JOB_BATCH_UPDATE,
+    jobs,
+    removed
+  };
+}
+
+export function jobWindowSet(status, offset, limit, total) {
+  return {
+    type: JOB_WINDOW_SET,
+    status,
+    offset,
+    limit,
+    total
+  };
+}
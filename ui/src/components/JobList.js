@@ -14,6 +14,7 @@ import Card from 'react-bootstrap/Card';
 import sortBy from 'sort-by';
 
 import { BACKEND_OPENED } from '../actions/backend';
+import { jobWindow } from '../utils/backendActions';
 import { capitalizeFirst } from '../utils/helpers';
 
 import JobListItem from './JobListItem';
@@ -23,6 +24,15 @@ import ScheduleDialog from './ScheduleDialog';
 // Job list
 //------------------------------------------------------------------------------
 class JobList extends Component {
+  //----------------------------------------------------------------------------
+  // Move the window of the list
+  //----------------------------------------------------------------------------
+  moveWindow = (offset) => {
+    const status = this.props.match.params.status.toUpperCase();
+    jobWindow(status, offset, this.props.listWindow.limit)
+      .catch(() => {});
+  }
+
   //----------------------------------------------------------------------------
   // Render
   //----------------------------------------------------------------------------
@@ -72,6 +82,38 @@ class JobList extends Component {
     if(status === 'completed')
       scheduleButton = null;
 
+    //--------------------------------------------------------------------------
+    // Pager, if the server sends only a window of the list
+    //--------------------------------------------------------------------------
+    let pager = null;
+    const listWindow = this.props.listWindow;
+    if(listWindow && listWindow.total > listWindow.limit) {
+      const { offset, limit, total } = listWindow;
+      const first = Math.min(offset + 1, total);
+      const last = Math.min(offset + limit, total);
+      pager = (
+        <div className='control-button-container'>
+          <Button
+            variant="outline-secondary"
+            size="sm"
+            disabled={!this.props.connected || offset === 0}
+            onClick={() => this.moveWindow(Math.max(offset - limit, 0))}
+          >
+            Previous
+          </Button>
+          {` ${first}-${last} of ${total} `}
+          <Button
+            variant="outline-secondary"
+            size="sm"
+            disabled={!this.props.connected || offset + limit >= total}
+            onClick={() => this.moveWindow(offset + limit)}
+          >
+            Next
+          </Button>
+        </div>
+      );
+    }
+
     //--------------------------------------------------------------------------
     // The container
     //--------------------------------------------------------------------------
@@ -85,6 +127,7 @@ class JobList extends Component {
         <div className='content-container'>
           {list}
         </div>
+        {pager}
       </div>
     );
   }
@@ -102,8 +145,12 @@ function mapStateToProps(state, ownProps) {
       .sort(sortBy('-timestamp'))
       .map(obj => obj.identifier);
   }
+  let listWindow = null;
+  if(state.jobs.windows && jobStatus in state.jobs.windows)
+    listWindow = state.jobs.windows[jobStatus];
   return {
     jobs,
+    listWindow,
     connected: state.backend.status === BACKEND_OPENED
   };
 }
@@ -32,6 +32,7 @@ const statusToLabel = (status) => {
   switch(status) {
   case 'SCHEDULED': return 'primary';
   case 'PENDING': return 'warning';
+  case 'WAITING': return 'info';
   case 'RUNNING': return 'success';
   case 'CANCELED': return 'warning';
   case 'SUCCESSFUL': return 'success';
@@ -5,7 +5,9 @@
 // Licensed under the 3-Clause BSD License, see the LICENSE file for details.
 //------------------------------------------------------------------------------
 
-import { JOB_LIST_SET, JOB_UPDATE, JOB_REMOVE } from '../actions/jobs';
+import {
+  JOB_LIST_SET, JOB_UPDATE, JOB_REMOVE, JOB_BATCH_UPDATE, JOB_WINDOW_SET
+} from '../actions/jobs';
 
 const jobsState = {};
 
@@ -19,7 +21,8 @@ function filterJob(state, jobId) {
 }
 
 function statusToListName(status) {
-  if(status === 'SCHEDULED' || status === 'PENDING' || status === 'RUNNING')
+  if(status === 'SCHEDULED' || status === 'PENDING' || status === 'RUNNING' ||
+     status === 'WAITING')
     return 'ACTIVE';
   return 'COMPLETED';
 }
@@ -46,6 +49,27 @@ export function jobsReducer(state = jobsState, action) {
     newState[listName][action.job.identifier] = action.job;
     return newState;
 
+  case JOB_BATCH_UPDATE:
+    let updatedState = action.jobs.reduce((acc, job) => {
+      let batchState = filterJob(acc, job.identifier);
+      batchState[statusToListName(job.status)][job.identifier] = job;
+      return batchState;
+    }, state);
+    return (action.removed || []).reduce(filterJob, updatedState);
+
+  case JOB_WINDOW_SET:
+    return {
+      ...state,
+      windows: {
+        ...state.windows,
+        [action.status]: {
+          offset: action.offset,
+          limit: action.limit,
+          total: action.total
+        }
+      }
+    };
+
   default:
     return state;
   }
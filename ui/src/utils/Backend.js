@@ -21,6 +21,7 @@ export class Backend {
   static COUNTDOWN = 4;
 
   static REMOVE_LISTENER = 0;
+  static WINDOW_SIZE = 100;
 
   //----------------------------------------------------------------------------
   // Constructor
@@ -37,6 +38,8 @@ export class Backend {
     this.countdownTimer = null;
     this.countdown = 0;
     this.nextTry = 2;
+    this.epoch = null;
+    this.seq = 0;
     this.eventListeners = new Set();
     this.connect();
   }
@@ -59,7 +62,14 @@ export class Backend {
     //--------------------------------------------------------------------------
     this.dispatchEvent(Backend.CONNECTING, null);
 
-    this.ws = new WebSocket(this.wsUrl);
+    //--------------------------------------------------------------------------
+    // Ask only for the first page of the completed jobs and, if we have seen
+    // the daemon's messages before, only for the ones we have missed
+    //--------------------------------------------------------------------------
+    let url = `${this.wsUrl}?window=${Backend.WINDOW_SIZE}`;
+    if(this.epoch !== null)
+      url += `&since=${this.epoch}:${this.seq}`;
+    this.ws = new WebSocket(url);
 
     //--------------------------------------------------------------------------
     // On open
@@ -74,6 +84,10 @@ export class Backend {
     //--------------------------------------------------------------------------
     this.ws.onmessage = (evt) => {
       const message = JSON.parse(evt.data);
+      if(message.type === 'SYNC')
+        this.epoch = message.epoch;
+      if(message.seq !== undefined)
+        this.seq = message.seq;
       this.dispatchEvent(Backend.MSG_RECEIVED, message);
     };
 
@@ -50,3 +50,29 @@ export function jobSchedule(project, spider, schedule, description, payload) {
     payload
   });
 }
+
+//------------------------------------------------------------------------------
+// Show a page of a job list
+//------------------------------------------------------------------------------
+export function jobWindow(list, offset, limit) {
+  return backend.sendMessage({
+    action: 'JOB_WINDOW',
+    list,
+    offset,
+    limit
+  });
+}
+
+//------------------------------------------------------------------------------
+// Subscribe to the events of some projects or of the jobs in some statuses;
+// null means all of them
+//------------------------------------------------------------------------------
+export function subscribe(projects = null, statuses = null,
+                          countersOnly = false) {
+  return backend.sendMessage({
+    action: 'SUBSCRIBE',
+    projects,
+    statuses,
+    countersOnly
+  });
+}
@@ -13,7 +13,9 @@ import {
 import {
   projectListSet, projectPush, projectRemove
 } from '../actions/projects';
-import { jobListSet, jobUpdate, jobRemove } from '../actions/jobs';
+import {
+  jobListSet, jobUpdate, jobRemove, jobBatchUpdate, jobWindowSet
+} from '../actions/jobs';
 
 //------------------------------------------------------------------------------
 // Make backend events change the state of the stare
@@ -43,6 +45,9 @@ export const messageStoreEvent = (event, data) => {
     break;
   case 'JOB_LIST':
     store.dispatch(jobListSet(data.status, data.jobs));
+    if('total' in data)
+      store.dispatch(jobWindowSet(data.status, data.offset, data.limit,
+                                  data.total));
     break;
   case 'JOB_UPDATE':
     store.dispatch(jobUpdate(data.job));
@@ -50,6 +55,9 @@ export const messageStoreEvent = (event, data) => {
   case 'JOB_REMOVE':
     store.dispatch(jobRemove(data.jobId));
     break;
+  case 'JOB_BATCH_UPDATE':
+    store.dispatch(jobBatchUpdate(data.jobs, data.removed));
+    break;
 
   default:
     break;